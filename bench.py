@@ -0,0 +1,940 @@
+import argparse
+import contextlib
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Set
+from tabulate import tabulate
+from checkpoint import write_checkpoint
+from commands import compile_lines, parse_command
+from events import BufferedSink, EventSink, NullSink
+from stats import ABORT_CYCLE, ABORT_DANGEROUS_STRUCTURE, Stats
+from utils import (
+    Placement,
+    Site,
+    TransactionManager,
+    CONFLICT_INDEXES,
+    REPLICATION_RULES,
+    VALIDATION_ENGINES,
+)
+from wal import WriteAheadLog
+from workload import generate_workload
+
+# Workload scenarios for the "workload" benchmark: generate_workload
+# arguments on top of its defaults
+SCENARIOS: Dict[str, Dict] = {
+    "baseline": {},
+    "read-heavy": {"read_ratio": 0.9, "read_only_share": 0.5},
+    "write-heavy": {"read_ratio": 0.1, "read_only_share": 0.0},
+    "hot-keys": {"zipf_skew": 1.2},
+    "high-concurrency": {"concurrency": 100},
+    "failures": {"fail_rate": 0.01, "downtime": 100},
+}
+
+
+def bench_commit_write(
+    history_sizes: List[int], commits: int, repeat: int
+) -> List[List[float]]:
+    """
+    Measure the cost of Site.commit_write as a variable's history grows.
+
+    For each history size, a fresh site is pre-filled with that many
+    versions of a replicated variable, then timed while committing a fixed
+    number of further writes with increasing commit times.
+
+    Args:
+        history_sizes: Number of versions to pre-fill before timing
+        commits: Number of timed commits per measurement
+        repeat: Number of measurements per size; the fastest one is kept
+
+    Returns:
+        One row per history size: [history size, microseconds per commit]
+
+    Side effects:
+        None
+    """
+    rows = []
+    for size in history_sizes:
+        best = float("inf")
+        for _ in range(repeat):
+            site = Site(1)
+            for t in range(1, size + 1):
+                site.commit_write(2, t, 1, t)
+            start = time.perf_counter()
+            for t in range(size + 1, size + commits + 1):
+                site.commit_write(2, t, 1, t)
+            best = min(best, time.perf_counter() - start)
+        rows.append([size, best / commits * 1e6])
+    return rows
+
+
+def generate_trace(path: str, lines: int, seed: int = 0):
+    """
+    Write a synthetic command trace for parser benchmarks.
+
+    Transactions are begun, issue a few reads and writes, and end; site
+    failures, recoveries, comments and dumps are sprinkled in so that every
+    command form appears.
+
+    Args:
+        path: File to write the trace to
+        lines: Number of lines to write
+        seed: Seed for the random number generator
+
+    Returns:
+        None
+
+    Side effects:
+        - Creates or overwrites the file at path
+    """
+    rng = random.Random(seed)
+    with open(path, "w") as out:
+        written = 0
+        tid = 0
+        while written < lines:
+            tid += 1
+            read_only = rng.random() < 0.2
+            block = [f"beginRO(T{tid})" if read_only else f"begin(T{tid})"]
+            for _ in range(rng.randint(1, 6)):
+                var = rng.randint(1, 20)
+                if read_only or rng.random() < 0.5:
+                    block.append(f"R(T{tid},x{var})")
+                else:
+                    block.append(f"W(T{tid}, x{var}, {rng.randint(-999, 9999)})")
+            block.append(f"end(T{tid})")
+            roll = rng.random()
+            if roll < 0.02:
+                block.append(f"fail({rng.randint(1, 10)})")
+            elif roll < 0.04:
+                block.append(f"recover({rng.randint(1, 10)}) // back up")
+            elif roll < 0.05:
+                block.append("dump()")
+            block = block[: lines - written]
+            out.write("\n".join(block) + "\n")
+            written += len(block)
+
+
+def bench_parse(lines: int, repeat: int) -> List[List[float]]:
+    """
+    Measure command parsing throughput on a generated trace.
+
+    The trace is written to a temporary file once. Each measurement then
+    reads it line by line, with and without parsing, so the cost of
+    parse_command can be separated from plain file iteration.
+
+    Args:
+        lines: Number of lines in the generated trace
+        repeat: Number of measurements per mode; the fastest one is kept
+
+    Returns:
+        One row per mode: [mode, seconds, lines per second, ns per line]
+
+    Side effects:
+        - Creates and removes a temporary file
+    """
+
+    def read_only(path):
+        with open(path) as trace:
+            for _ in trace:
+                pass
+
+    def read_and_parse(path):
+        parse = parse_command
+        with open(path) as trace:
+            for line in trace:
+                parse(line)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trace.txt")
+        generate_trace(path, lines)
+        for mode, run in (("read", read_only), ("read + parse", read_and_parse)):
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run(path)
+                best = min(best, time.perf_counter() - start)
+            rows.append([mode, best, lines / best, best / lines * 1e9])
+    return rows
+
+
+def bench_sinks(lines: int, repeat: int) -> List[List[float]]:
+    """
+    Measure end-to-end replay time with each event sink.
+
+    A generated trace is parsed once; each measurement then replays the
+    parsed commands through a fresh TransactionManager. Output goes to
+    os.devnull, so the numbers reflect formatting and write-call overhead
+    rather than terminal speed.
+
+    Args:
+        lines: Number of lines in the generated trace
+        repeat: Number of measurements per sink; the fastest one is kept
+
+    Returns:
+        One row per sink: [sink, seconds, commands per second]
+
+    Side effects:
+        - Creates and removes a temporary file
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trace.txt")
+        generate_trace(path, lines)
+        with open(path) as trace:
+            commands = list(compile_lines(trace, []))
+
+    rows = []
+    with open(os.devnull, "w") as devnull:
+        sinks = (
+            ("print", lambda: EventSink()),
+            ("buffered", lambda: BufferedSink(devnull)),
+            ("buffered --quiet", lambda: BufferedSink(devnull, quiet=True)),
+            ("null", lambda: NullSink()),
+        )
+        for name, make_sink in sinks:
+            best = float("inf")
+            for _ in range(repeat):
+                sink = make_sink()
+                tm = TransactionManager(sink=sink)
+                execute = tm.execute
+                with contextlib.redirect_stdout(devnull):
+                    start = time.perf_counter()
+                    for command in commands:
+                        execute(command)
+                    sink.flush()
+                    best = min(best, time.perf_counter() - start)
+            rows.append([name, best, len(commands) / best])
+    return rows
+
+
+class CountingSink(NullSink):
+    """
+    Null sink that records which transactions committed or aborted.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.commits: Set[int] = set()
+        self.aborts: Set[int] = set()
+
+    def commit(self, tid: int):
+        self.commits.add(tid)
+
+    def abort(self, tid: int, reason: Optional[str] = None):
+        self.aborts.add(tid)
+
+
+def bench_workload(
+    scenarios: List[str], transactions: int, repeat: int
+) -> List[List[float]]:
+    """
+    Run generated workloads through a TransactionManager and report rates.
+
+    Each scenario's script is generated and parsed before timing. The timed
+    runs use a sink that only counts outcomes; a separate run under
+    tracemalloc measures peak memory, so tracing does not skew the timings.
+
+    Args:
+        scenarios: Names from SCENARIOS to run
+        transactions: Number of transactions per scenario
+        repeat: Number of timed runs per scenario; the fastest one is kept
+
+    Returns:
+        One row per scenario: [name, commands, commands per second,
+        commit %, abort %, peak MiB]
+
+    Side effects:
+        - Starts and stops tracemalloc
+    """
+    rows = []
+    for name in scenarios:
+        script = generate_workload(transactions=transactions, **SCENARIOS[name])
+        commands = list(compile_lines(script, []))
+
+        best = float("inf")
+        for _ in range(repeat):
+            sink = CountingSink()
+            tm = TransactionManager(sink=sink)
+            execute = tm.execute
+            start = time.perf_counter()
+            for command in commands:
+                execute(command)
+            best = min(best, time.perf_counter() - start)
+
+        tracemalloc.start()
+        tm = TransactionManager(sink=NullSink())
+        for command in commands:
+            tm.execute(command)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        rows.append(
+            [
+                name,
+                len(commands),
+                len(commands) / best,
+                100.0 * len(sink.commits) / transactions,
+                100.0 * len(sink.aborts) / transactions,
+                peak / 2**20,
+            ]
+        )
+    return rows
+
+
+def bench_scale(
+    configs: List[str], replication: str, transactions: int, fail_rate: float
+) -> List[List]:
+    """
+    Run one generated workload per cluster configuration.
+
+    Placement and TransactionManager construction and the workload are
+    timed in one run; a separate run under tracemalloc measures the peak
+    memory of building the cluster and running the workload.
+
+    Args:
+        configs: Configurations as "SITESxVARIABLES", e.g. "100x100000"
+        replication: Name of the replication rule (see REPLICATION_RULES)
+        transactions: Number of transactions per configuration
+        fail_rate: Probability of a site failure between steps
+
+    Returns:
+        One row per configuration: [sites, variables, placement ms,
+        TransactionManager ms, commands, commands per second, commit %,
+        peak MiB]
+
+    Side effects:
+        - Starts and stops tracemalloc
+    """
+    rows = []
+    for config in configs:
+        sites, _, variables = config.partition("x")
+        sites, variables = int(sites), int(variables)
+        commands = list(
+            compile_lines(
+                generate_workload(
+                    transactions=transactions,
+                    variables=variables,
+                    sites=sites,
+                    fail_rate=fail_rate,
+                ),
+                [],
+            )
+        )
+
+        rule = REPLICATION_RULES[replication]
+        start = time.perf_counter()
+        placement = Placement(sites, variables, rule)
+        placed = time.perf_counter()
+        sink = CountingSink()
+        tm = TransactionManager(sink=sink, placement=placement)
+        built = time.perf_counter()
+        execute = tm.execute
+        for command in commands:
+            execute(command)
+        elapsed = time.perf_counter() - built
+
+        tracemalloc.start()
+        tm = TransactionManager(
+            sink=NullSink(), placement=Placement(sites, variables, rule)
+        )
+        for command in commands:
+            tm.execute(command)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        rows.append(
+            [
+                sites,
+                variables,
+                (placed - start) * 1e3,
+                (built - placed) * 1e3,
+                len(commands),
+                len(commands) / elapsed,
+                100.0 * len(sink.commits) / transactions,
+                peak / 2**20,
+            ]
+        )
+    return rows
+
+
+def bench_conflicts(
+    concurrencies: List[int],
+    variable_counts: List[int],
+    transactions: int,
+    ops: int,
+    repeat: int,
+) -> List[List]:
+    """
+    Compare the conflict index implementations as concurrency grows.
+
+    For every concurrency and variable count, one workload is generated and
+    run with each of CONFLICT_INDEXES. The timed runs only count outcomes; a
+    separate instrumented run measures the mean latency of commit
+    validation and of site failures, the two places the implementations
+    differ most.
+
+    Args:
+        concurrencies: Numbers of transactions open at the same time
+        variable_counts: Numbers of variables to spread the workload over
+        transactions: Number of transactions per workload
+        ops: Mean number of reads and writes per transaction
+        repeat: Number of timed runs per implementation; the fastest is kept
+
+    Returns:
+        One row per workload and implementation: [concurrency, variables,
+        implementation, commands per second, mean validation us, mean fail
+        us, commit %]
+
+    Side effects:
+        None
+    """
+    rows = []
+    for variables in variable_counts:
+        placement = Placement(variables=variables)
+        for concurrency in concurrencies:
+            commands = list(
+                compile_lines(
+                    generate_workload(
+                        transactions=transactions,
+                        concurrency=concurrency,
+                        ops_per_transaction=ops,
+                        variables=variables,
+                        fail_rate=0.002,
+                    ),
+                    [],
+                )
+            )
+            for name in CONFLICT_INDEXES:
+                best = float("inf")
+                for _ in range(repeat):
+                    sink = CountingSink()
+                    tm = TransactionManager(
+                        sink=sink, placement=placement, conflicts=name
+                    )
+                    execute = tm.execute
+                    start = time.perf_counter()
+                    for command in commands:
+                        execute(command)
+                    best = min(best, time.perf_counter() - start)
+
+                tm = TransactionManager(
+                    sink=NullSink(), stats=Stats(), placement=placement, conflicts=name
+                )
+                for command in commands:
+                    tm.execute(command)
+                latency = tm.stats()["latency"]
+                rows.append(
+                    [
+                        concurrency,
+                        variables,
+                        name,
+                        len(commands) / best,
+                        latency["commit validation"]["mean_us"],
+                        latency["fail"]["mean_us"],
+                        100.0 * len(sink.commits) / transactions,
+                    ]
+                )
+    return rows
+
+
+def bench_engines(
+    scenarios: List[str], concurrencies: List[int], transactions: int, repeat: int
+) -> List[List]:
+    """
+    Compare the commit validation engines on generated workloads.
+
+    Every scenario is generated once per concurrency and run with each of
+    VALIDATION_ENGINES. The timed runs only count outcomes; a separate
+    instrumented run measures the mean latency of reads, writes and commit
+    validation (the ssi engine moves its work from validation to reads and
+    writes) and counts the aborts by reason.
+
+    Args:
+        scenarios: Names from SCENARIOS to run
+        concurrencies: Numbers of transactions open at the same time,
+            overriding the scenario's own
+        transactions: Number of transactions per workload
+        repeat: Number of timed runs per engine; the fastest is kept
+
+    Returns:
+        One row per workload and engine: [scenario, concurrency, engine,
+        commands per second, mean read us, mean write us, mean validation
+        us, commit %, % aborted for serializability (cycle or dangerous
+        structure)]
+
+    Side effects:
+        None
+    """
+    rows = []
+    for name in scenarios:
+        for concurrency in concurrencies:
+            options = dict(SCENARIOS[name], concurrency=concurrency)
+            commands = list(
+                compile_lines(
+                    generate_workload(transactions=transactions, **options), []
+                )
+            )
+            for engine in VALIDATION_ENGINES:
+                best = float("inf")
+                for _ in range(repeat):
+                    sink = CountingSink()
+                    tm = TransactionManager(sink=sink, engine=engine)
+                    execute = tm.execute
+                    start = time.perf_counter()
+                    for command in commands:
+                        execute(command)
+                    best = min(best, time.perf_counter() - start)
+
+                tm = TransactionManager(sink=NullSink(), stats=Stats(), engine=engine)
+                for command in commands:
+                    tm.execute(command)
+                snapshot = tm.stats()
+                latency = snapshot["latency"]
+                aborts = snapshot["aborts"]
+                rows.append(
+                    [
+                        name,
+                        concurrency,
+                        engine,
+                        len(commands) / best,
+                        latency["read"]["mean_us"],
+                        latency["write"]["mean_us"],
+                        latency["commit validation"]["mean_us"],
+                        100.0 * len(sink.commits) / transactions,
+                        100.0
+                        * (aborts[ABORT_CYCLE] + aborts[ABORT_DANGEROUS_STRUCTURE])
+                        / transactions,
+                    ]
+                )
+    return rows
+
+
+def bench_wal(
+    transactions: int, group_sizes: List[int], repeat: int
+) -> List[List[float]]:
+    """
+    Measure commit throughput with the write-ahead log off and on.
+
+    A write-heavy generated workload is replayed once without a log and
+    once per group size with a fresh log in a temporary directory. Only
+    acknowledged commits are counted: with a log, the sink hears of a
+    commit after its group's fsync, and the timed run ends with close(),
+    which syncs and acknowledges the last partial group.
+
+    Args:
+        transactions: Number of transactions in the workload
+        group_sizes: Group commit sizes to try (1 = fsync every commit)
+        repeat: Number of measurements per mode; the fastest one is kept
+
+    Returns:
+        One row per mode: [mode, seconds, acknowledged durable commits per
+        second, fsyncs]
+
+    Side effects:
+        - Creates and removes temporary log directories
+    """
+    script = generate_workload(
+        transactions=transactions, read_ratio=0.2, read_only_share=0.0
+    )
+    commands = list(compile_lines(script, []))
+
+    rows = []
+    for group_size in [0] + group_sizes:
+        best = float("inf")
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as tmp:
+                wal = None
+                if group_size:
+                    wal = WriteAheadLog(
+                        tmp, list(range(1, 11)), group_size, group_window=1.0
+                    )
+                sink = CountingSink()
+                tm = TransactionManager(sink=sink, wal=wal)
+                execute = tm.execute
+                start = time.perf_counter()
+                for command in commands:
+                    execute(command)
+                tm.close()
+                best = min(best, time.perf_counter() - start)
+        mode = f"group of {group_size}" if group_size else "off"
+        rows.append([mode, best, len(sink.commits) / best, wal.syncs if wal else 0])
+    return rows
+
+
+def bench_checkpoint(transactions: int, repeat: int) -> List[List]:
+    """
+    Measure startup cost: initial state, full log replay and checkpoint load.
+
+    A write-heavy generated workload is run with a write-ahead log, and its
+    final state is saved to a checkpoint. Transaction managers are then
+    created from scratch, by replaying the whole log, and by loading the
+    checkpoint.
+
+    Args:
+        transactions: Number of transactions in the workload
+        repeat: Number of measurements per mode; the fastest one is kept
+
+    Returns:
+        One row per mode: [mode, milliseconds, bytes read]
+
+    Side effects:
+        - Creates and removes a temporary directory
+    """
+    script = generate_workload(
+        transactions=transactions, read_ratio=0.2, read_only_share=0.0
+    )
+    site_ids = list(range(1, 11))
+    with tempfile.TemporaryDirectory() as tmp:
+        log_dir = os.path.join(tmp, "wal")
+        path = os.path.join(tmp, "checkpoint")
+        tm = TransactionManager(
+            sink=NullSink(), wal=WriteAheadLog(log_dir, site_ids, group_size=1024)
+        )
+        for command in compile_lines(script, []):
+            tm.execute(command)
+        tm.close()
+        write_checkpoint(path, tm.sites, tm.global_time)
+        log_bytes = sum(
+            os.path.getsize(os.path.join(log_dir, name))
+            for name in os.listdir(log_dir)
+        )
+
+        modes = [
+            ("initial state", lambda: TransactionManager(sink=NullSink()), 0),
+            (
+                "full log replay",
+                lambda: TransactionManager(
+                    sink=NullSink(), wal=WriteAheadLog(log_dir, site_ids)
+                ),
+                log_bytes,
+            ),
+            (
+                "checkpoint load",
+                lambda: TransactionManager(sink=NullSink(), checkpoint=path),
+                os.path.getsize(path),
+            ),
+        ]
+        rows = []
+        for mode, create, size in modes:
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                restored = create()
+                best = min(best, time.perf_counter() - start)
+                restored.close()
+            rows.append([mode, best * 1e3, size])
+    return rows
+
+
+def parse_args():
+    """
+    Parse command-line arguments for the benchmark runner.
+
+    Returns:
+        argparse.Namespace: Parsed arguments containing the selected
+        benchmark and its parameters
+
+    Side effects:
+        - May exit the program if invalid arguments are provided (handled by argparse)
+    """
+    parser = argparse.ArgumentParser(description="RepCRec micro-benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    commit = subparsers.add_parser(
+        "commit", help="Site.commit_write cost versus version history length"
+    )
+    commit.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000, 10000, 100000],
+        help="History lengths to pre-fill before timing",
+    )
+    commit.add_argument(
+        "--commits", type=int, default=10000, help="Timed commits per size"
+    )
+    commit.add_argument(
+        "--repeat", type=int, default=3, help="Measurements per size (best kept)"
+    )
+
+    parse = subparsers.add_parser(
+        "parse", help="Command parser throughput on a generated trace"
+    )
+    parse.add_argument(
+        "--lines", type=int, default=2000000, help="Lines in the generated trace"
+    )
+    parse.add_argument(
+        "--repeat", type=int, default=3, help="Measurements per mode (best kept)"
+    )
+
+    sinks = subparsers.add_parser(
+        "sinks", help="Replay time with each TransactionManager event sink"
+    )
+    sinks.add_argument(
+        "--lines", type=int, default=500000, help="Lines in the generated trace"
+    )
+    sinks.add_argument(
+        "--repeat", type=int, default=3, help="Measurements per sink (best kept)"
+    )
+
+    workload = subparsers.add_parser(
+        "workload", help="Throughput and outcomes of generated workloads"
+    )
+    workload.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=list(SCENARIOS),
+        default=list(SCENARIOS),
+        help="Scenarios to run (default: all)",
+    )
+    workload.add_argument(
+        "--transactions",
+        type=int,
+        default=20000,
+        help="Transactions per scenario",
+    )
+    workload.add_argument(
+        "--repeat", type=int, default=3, help="Timed runs per scenario (best kept)"
+    )
+
+    scale = subparsers.add_parser(
+        "scale", help="Workload throughput and memory as the cluster grows"
+    )
+    scale.add_argument(
+        "--configs",
+        nargs="+",
+        default=["10x20", "10x1000", "100x1000", "100x100000"],
+        help="Cluster configurations as SITESxVARIABLES",
+    )
+    scale.add_argument(
+        "--replication",
+        choices=sorted(REPLICATION_RULES),
+        default="even",
+        help="Replication rule (default: even)",
+    )
+    scale.add_argument(
+        "--transactions", type=int, default=2000, help="Transactions per config"
+    )
+    scale.add_argument(
+        "--fail-rate", type=float, default=0.001, help="Site failures per step"
+    )
+
+    conflicts = subparsers.add_parser(
+        "conflicts",
+        help="Per-variable indexes versus bitmask read/write sets",
+    )
+    conflicts.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 10, 50, 100, 200],
+        help="Transactions open at the same time",
+    )
+    conflicts.add_argument(
+        "--variables",
+        type=int,
+        nargs="+",
+        default=[20, 1000],
+        help="Variable counts to spread the workload over",
+    )
+    conflicts.add_argument(
+        "--transactions", type=int, default=5000, help="Transactions per workload"
+    )
+    conflicts.add_argument(
+        "--ops", type=int, default=8, help="Mean operations per transaction"
+    )
+    conflicts.add_argument(
+        "--repeat", type=int, default=3, help="Timed runs per index (best kept)"
+    )
+
+    engines = subparsers.add_parser(
+        "engines",
+        help="Serialization graph cycle search versus SSI dangerous structures",
+    )
+    engines.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=list(SCENARIOS),
+        default=["baseline", "read-heavy", "write-heavy", "hot-keys"],
+        help="Scenarios to run",
+    )
+    engines.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[10, 100],
+        help="Transactions open at the same time",
+    )
+    engines.add_argument(
+        "--transactions", type=int, default=5000, help="Transactions per workload"
+    )
+    engines.add_argument(
+        "--repeat", type=int, default=3, help="Timed runs per engine (best kept)"
+    )
+
+    wal = subparsers.add_parser(
+        "wal", help="Commit throughput with the write-ahead log off and on"
+    )
+    wal.add_argument(
+        "--transactions", type=int, default=5000, help="Transactions to run"
+    )
+    wal.add_argument(
+        "--group-sizes",
+        type=int,
+        nargs="+",
+        default=[1, 8, 64],
+        help="Group commit sizes to try (1 = fsync every commit)",
+    )
+    wal.add_argument(
+        "--repeat", type=int, default=3, help="Measurements per mode (best kept)"
+    )
+
+    checkpoint = subparsers.add_parser(
+        "checkpoint",
+        help="Startup cost from the initial state, a full log and a checkpoint",
+    )
+    checkpoint.add_argument(
+        "--transactions", type=int, default=20000, help="Transactions to run first"
+    )
+    checkpoint.add_argument(
+        "--repeat", type=int, default=5, help="Measurements per mode (best kept)"
+    )
+    return parser.parse_args()
+
+
+def main():
+    """
+    Main entry point for the benchmark runner.
+
+    Returns:
+        None
+
+    Side effects:
+        - Runs the selected benchmark and prints a result table to stdout
+    """
+    args = parse_args()
+    if args.benchmark == "commit":
+        rows = bench_commit_write(args.sizes, args.commits, args.repeat)
+        print(tabulate(rows, headers=["History length", "us/commit"], floatfmt=".3f"))
+    elif args.benchmark == "parse":
+        rows = bench_parse(args.lines, args.repeat)
+        print(
+            tabulate(
+                rows,
+                headers=["Mode", "Seconds", "Lines/s", "ns/line"],
+                floatfmt=(None, ".3f", ",.0f", ".1f"),
+            )
+        )
+    elif args.benchmark == "workload":
+        rows = bench_workload(args.scenarios, args.transactions, args.repeat)
+        print(
+            tabulate(
+                rows,
+                headers=[
+                    "Scenario",
+                    "Commands",
+                    "Commands/s",
+                    "Commit %",
+                    "Abort %",
+                    "Peak MiB",
+                ],
+                floatfmt=(None, None, ",.0f", ".1f", ".1f", ".2f"),
+            )
+        )
+    elif args.benchmark == "scale":
+        rows = bench_scale(
+            args.configs, args.replication, args.transactions, args.fail_rate
+        )
+        print(
+            tabulate(
+                rows,
+                headers=[
+                    "Sites",
+                    "Variables",
+                    "Placement ms",
+                    "Manager ms",
+                    "Commands",
+                    "Commands/s",
+                    "Commit %",
+                    "Peak MiB",
+                ],
+                floatfmt=(None, None, ".2f", ".2f", None, ",.0f", ".1f", ".2f"),
+            )
+        )
+    elif args.benchmark == "conflicts":
+        rows = bench_conflicts(
+            args.concurrency,
+            args.variables,
+            args.transactions,
+            args.ops,
+            args.repeat,
+        )
+        print(
+            tabulate(
+                rows,
+                headers=[
+                    "Concurrency",
+                    "Variables",
+                    "Index",
+                    "Commands/s",
+                    "Validation us",
+                    "Fail us",
+                    "Commit %",
+                ],
+                floatfmt=(None, None, None, ",.0f", ".2f", ".2f", ".1f"),
+            )
+        )
+    elif args.benchmark == "engines":
+        rows = bench_engines(
+            args.scenarios, args.concurrency, args.transactions, args.repeat
+        )
+        print(
+            tabulate(
+                rows,
+                headers=[
+                    "Scenario",
+                    "Concurrency",
+                    "Engine",
+                    "Commands/s",
+                    "Read us",
+                    "Write us",
+                    "Validation us",
+                    "Commit %",
+                    "Serialization abort %",
+                ],
+                floatfmt=(None, None, None, ",.0f", ".2f", ".2f", ".2f", ".1f", ".1f"),
+            )
+        )
+    elif args.benchmark == "wal":
+        rows = bench_wal(args.transactions, args.group_sizes, args.repeat)
+        print(
+            tabulate(
+                rows,
+                headers=["Log", "Seconds", "Acknowledged commits/s", "fsyncs"],
+                floatfmt=(None, ".3f", ",.0f"),
+            )
+        )
+    elif args.benchmark == "checkpoint":
+        rows = bench_checkpoint(args.transactions, args.repeat)
+        print(
+            tabulate(
+                rows,
+                headers=["Startup", "ms", "Bytes read"],
+                floatfmt=(None, ".2f", ","),
+            )
+        )
+    elif args.benchmark == "sinks":
+        rows = bench_sinks(args.lines, args.repeat)
+        print(
+            tabulate(
+                rows,
+                headers=["Sink", "Seconds", "Commands/s"],
+                floatfmt=(None, ".3f", ",.0f"),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from utils import Site
+
+# Checkpoint layout (little-endian):
+#   header: magic, global time, highest transaction number, site count
+#   per site: site ID, up flag, last fail time, last recover time,
+#             variable count
+#   per variable written at the site: variable number, version count, then
+#             the commit times (float64), values (int64) and writer
+#             transaction numbers (uint32) of its versions as three packed
+#             arrays
+CHECKPOINT_MAGIC = b"RCK2"
+_HEADER = struct.Struct("<4sdII")
+_SITE = struct.Struct("<IBddI")
+_VARIABLE = struct.Struct("<II")
+# Arrays of a one-version history, read as one record
+_INITIAL = struct.Struct("<dqI")
+
+# Arrays are stored little-endian; swap on big-endian machines
+_SWAP = sys.byteorder != "little"
+
+
+def _packed(values: array) -> bytes:
+    """
+    Little-endian bytes of an array.
+
+    Args:
+        values: Array to serialize
+
+    Returns:
+        The array's contents as little-endian bytes
+
+    Side effects:
+        None
+    """
+    if _SWAP:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpacked(typecode: str, data: memoryview) -> array:
+    """
+    Array from little-endian bytes.
+
+    Args:
+        typecode: Array type code ("d", "q" or "I")
+        data: Little-endian bytes of the array
+
+    Returns:
+        The array
+
+    Side effects:
+        None
+    """
+    values = array(typecode)
+    values.frombytes(data)
+    if _SWAP:
+        values.byteswap()
+    return values
+
+
+def write_checkpoint(path: str, sites: Dict[int, "Site"], global_time: float):
+    """
+    Save every site's committed state to a checkpoint file.
+
+    Only the variables written at each site are saved; the others are in
+    their initial state.
+
+    The file is written next to its final path, fsynced, and then renamed
+    over it, so a crash never leaves a half-written checkpoint behind.
+
+    Args:
+        path: File to write
+        sites: Sites by ID
+        global_time: Current global time of the transaction manager
+
+    Returns:
+        None
+
+    Side effects:
+        - Creates or replaces the file at path
+    """
+    chunks = []
+    last_tid = 0
+    for site_id in sorted(sites):
+        site = sites[site_id]
+        chunks.append(
+            _SITE.pack(
+                site_id,
+                site.is_up,
+                site.last_fail_time,
+                site.last_recover_time,
+                len(site.version_history),
+            )
+        )
+        for var, history in site.version_history.items():
+            if history.writers:
+                last_tid = max(last_tid, max(history.writers))
+            chunks.append(_VARIABLE.pack(var, len(history)))
+            chunks.append(_packed(history.commit_times))
+            chunks.append(_packed(history.values))
+            chunks.append(_packed(history.writers))
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as out:
+        out.write(_HEADER.pack(CHECKPOINT_MAGIC, global_time, last_tid, len(sites)))
+        out.writelines(chunks)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(temporary, path)
+
+
+def load_checkpoint(path: str, sites: Dict[int, "Site"]) -> Tuple[float, int]:
+    """
+    Restore sites from a checkpoint file.
+
+    The file is memory-mapped and each version history is copied straight
+    from the mapping into its typed arrays. Variables a site does not host,
+    and histories holding only the initial version, are skipped: the site
+    reads those from its placement's shared initial histories.
+
+    Args:
+        path: Checkpoint written by write_checkpoint
+        sites: Sites by ID; every site in the checkpoint must exist, and its
+            state is replaced
+
+    Returns:
+        (global time, highest transaction number) at the time of the
+        checkpoint
+
+    Side effects:
+        - Replaces the version histories, current values, up/down state
+          and fail/recover times of the sites
+
+    Raises:
+        ValueError: If the file is not a checkpoint, or holds a site that
+            does not exist
+    """
+    # Imported here: utils imports this module
+    from utils import VersionHistory
+
+    with open(path, "rb") as source:
+        mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    try:
+        if len(mapped) < _HEADER.size:
+            raise ValueError(f"{path} is not a checkpoint")
+        magic, global_time, last_tid, site_count = _HEADER.unpack_from(mapped, 0)
+        if magic != CHECKPOINT_MAGIC:
+            raise ValueError(f"{path} is not a checkpoint")
+        offset = _HEADER.size
+        for _ in range(site_count):
+            site_id, is_up, last_fail, last_recover, var_count = _SITE.unpack_from(
+                mapped, offset
+            )
+            offset += _SITE.size
+            site = sites.get(site_id)
+            if site is None:
+                raise ValueError(f"{path} holds site {site_id}, which does not exist")
+            placement = site.placement
+            site.is_up = bool(is_up)
+            site.last_fail_time = last_fail
+            site.last_recover_time = last_recover
+            site.version_history = {}
+            site.variables = {}
+            for _ in range(var_count):
+                var_num, count = _VARIABLE.unpack_from(mapped, offset)
+                offset += _VARIABLE.size
+                if (
+                    var_num > placement.variable_count
+                    or not placement.hosts(site_id, var_num)
+                    or count == 1
+                    and _INITIAL.unpack_from(mapped, offset)
+                    == (0.0, placement.initial_value(var_num), 0)
+                ):
+                    offset += _INITIAL.size * count
+                    continue
+                history = VersionHistory()
+                history.commit_times = _unpacked("d", view[offset : offset + 8 * count])
+                offset += 8 * count
+                history.values = _unpacked("q", view[offset : offset + 8 * count])
+                offset += 8 * count
+                history.writers = _unpacked("I", view[offset : offset + 4 * count])
+                offset += 4 * count
+                site.version_history[var_num] = history
+                site.variables[var_num] = history.values[-1]
+    finally:
+        view.release()
+        mapped.close()
+    return global_time, last_tid
@@ -0,0 +1,299 @@
+import mmap
+import os
+import re
+import struct
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Opcodes of the command language, in the order of TransactionManager's
+# dispatch table
+OP_BEGIN = 0
+OP_BEGIN_RO = 1
+OP_READ = 2
+OP_WRITE = 3
+OP_END = 4
+OP_FAIL = 5
+OP_RECOVER = 6
+OP_DUMP = 7
+
+# Not a command: a "// Test" marker line. Its site field indexes the list of
+# marker texts.
+OP_MARK = 8
+
+# Parsed command: (opcode, tid, var, value, site). Fields an opcode does not
+# use are 0.
+Command = Tuple[int, int, int, int, int]
+
+# Range of a written value: a trace record's value field and the value
+# arrays of a version history are 64-bit signed
+MIN_VALUE = -(2**63)
+MAX_VALUE = 2**63 - 1
+
+COMMAND_NAMES = ("begin", "beginRO", "R", "W", "end", "fail", "recover", "dump")
+
+_OPCODES = {name.lower(): opcode for opcode, name in enumerate(COMMAND_NAMES)}
+
+# Which of (tid, var, value, site) each opcode requires; every other field
+# must be absent
+_SHAPES = (
+    (True, False, False, False),
+    (True, False, False, False),
+    (True, True, False, False),
+    (True, True, True, False),
+    (True, False, False, False),
+    (False, False, False, True),
+    (False, False, False, True),
+    (False, False, False, False),
+)
+
+# One pass over the line: the command name, then either a parenthesised
+# argument list or the legacy "begin T1" form, then an optional comment.
+# Alternatives that share a prefix ("beginro"/"begin", "recover"/"r") list
+# the longer name first.
+_COMMAND = re.compile(
+    r"\s*(beginro|begin|end|fail|recover|dump|r|w)"
+    r"(?:\s*\(\s*(?:t(\d+)|(\d+))?"
+    r"(?:\s*,\s*x(\d+))?"
+    r"(?:\s*,\s*(-?\d+))?"
+    r"\s*\)"
+    r"|\s+t(\d+))"
+    r"\s*(?://.*)?$",
+    re.IGNORECASE,
+)
+
+
+def parse_command(line: str) -> Optional[Command]:
+    """
+    Parse a single line of the command language into a command tuple.
+
+    Supported commands (names are case-insensitive):
+        - begin(T1) or begin T1: Start a read-write transaction
+        - beginRO(T1) or beginRO T1: Start a read-only transaction
+        - R(T1,x2): Read variable x2 in transaction T1
+        - W(T1,x2,100): Write value 100 to variable x2 in transaction T1
+        - end(T1): End/commit transaction T1
+        - fail(1): Fail site 1
+        - recover(1): Recover site 1
+        - dump(): Dump current state of all sites
+
+    Args:
+        line: A string containing a single command, optionally followed by
+            a // comment
+
+    Returns:
+        The command as (opcode, tid, var, value, site) with the transaction
+        and variable numbers as ints (T1 -> 1, x2 -> 2), or None if the line
+        is blank, a comment, or not a well-formed command
+
+    Side effects:
+        None
+    """
+    match = _COMMAND.match(line)
+    if match is None:
+        return None
+    name, tid, site, var, value, bare_tid = match.groups()
+    opcode = _OPCODES[name.lower()]
+    if bare_tid is not None:
+        if opcode > OP_BEGIN_RO:
+            return None
+        tid = bare_tid
+    needs_tid, needs_var, needs_value, needs_site = _SHAPES[opcode]
+    if (
+        (tid is not None) != needs_tid
+        or (var is not None) != needs_var
+        or (value is not None) != needs_value
+        or (site is not None) != needs_site
+    ):
+        return None
+    return (
+        opcode,
+        int(tid) if needs_tid else 0,
+        int(var) if needs_var else 0,
+        int(value) if needs_value else 0,
+        int(site) if needs_site else 0,
+    )
+
+
+# Compiled trace layout: a header, fixed-width records, then the marker texts.
+# The header holds the magic, the record count and the byte offset of the
+# marker table; each marker is a length-prefixed UTF-8 string.
+TRACE_MAGIC = b"RCB1"
+_HEADER = struct.Struct("<4sQQ")
+_RECORD = struct.Struct("<BIIqI")
+_MARKER_LENGTH = struct.Struct("<I")
+
+# Largest number a record's tid, var and site fields hold
+_MAX_NUMBER = 2**32 - 1
+
+
+def compile_lines(
+    lines: Iterable[str], markers: List[str], check_range: bool = False
+) -> Iterator[Command]:
+    """
+    Turn the lines of a text script into a stream of command tuples.
+
+    "// Test" marker lines become OP_MARK tuples whose site field is the
+    marker's index in markers; blank lines, other comments and malformed
+    commands are dropped. With check_range, commands whose numbers do not
+    fit a trace record are rejected, so a script that compiles can always be
+    written; otherwise they are passed on for the transaction manager to
+    reject one command at a time.
+
+    Args:
+        lines: Lines of the script, with or without trailing newlines
+        markers: List that receives the text of each marker line, appended
+            before the corresponding OP_MARK tuple is yielded
+        check_range: Reject numbers a trace record cannot hold (default:
+            False)
+
+    Returns:
+        An iterator over the command tuples in script order
+
+    Side effects:
+        - Appends to markers
+
+    Raises:
+        ValueError: With check_range, if a command's transaction, variable
+            or site number is not below 2**32 or its value is outside the
+            64-bit signed range; the message names the line
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line.startswith("// Test"):
+            markers.append(line)
+            yield (OP_MARK, 0, 0, 0, len(markers) - 1)
+            continue
+        command = parse_command(line)
+        if command is None:
+            continue
+        _, tid, var, value, site = command
+        if check_range and (
+            max(tid, var, site) > _MAX_NUMBER or not MIN_VALUE <= value <= MAX_VALUE
+        ):
+            raise ValueError(f"line {number}: number out of range in {line!r}")
+        yield command
+
+
+def write_trace(path: str, commands: Iterable[Command], markers: List[str]) -> int:
+    """
+    Write a compiled binary trace.
+
+    The trace is written to a temporary file next to path and renamed over
+    it once complete, so a failure never leaves a partial trace behind.
+
+    Args:
+        path: File to write the trace to
+        commands: Command tuples, typically from compile_lines with
+            check_range
+        markers: Marker texts referenced by OP_MARK tuples; read only after
+            commands is exhausted, so it may be filled while iterating
+
+    Returns:
+        Number of records written
+
+    Side effects:
+        - Creates or overwrites the file at path, via a temporary file that
+          is removed if writing fails
+
+    Raises:
+        ValueError: If a command does not fit a trace record (see
+            compile_lines), or compile_lines rejects a line
+    """
+    count = 0
+    partial = path + ".partial"
+    try:
+        with open(partial, "wb") as out:
+            out.write(_HEADER.pack(TRACE_MAGIC, 0, 0))
+            pack = _RECORD.pack
+            for command in commands:
+                try:
+                    out.write(pack(*command))
+                except struct.error:
+                    raise ValueError(
+                        f"command {count + 1} does not fit a trace record: "
+                        f"{command}"
+                    ) from None
+                count += 1
+            marker_offset = out.tell()
+            for marker in markers:
+                data = marker.encode("utf-8")
+                out.write(_MARKER_LENGTH.pack(len(data)))
+                out.write(data)
+            out.seek(0)
+            out.write(_HEADER.pack(TRACE_MAGIC, count, marker_offset))
+        os.replace(partial, path)
+    except BaseException:
+        try:
+            os.remove(partial)
+        except FileNotFoundError:
+            pass
+        raise
+    return count
+
+
+def read_trace(path: str) -> Tuple[List[str], Iterator[Command]]:
+    """
+    Open a compiled binary trace for replay.
+
+    The file is memory-mapped and its records are unpacked in place, so
+    replay allocates no per-command strings. The mapping is released once
+    the returned iterator is exhausted or closed.
+
+    Args:
+        path: Compiled trace written by write_trace
+
+    Returns:
+        A (markers, commands) pair: the marker texts referenced by OP_MARK
+        tuples, and an iterator over the command tuples in script order
+
+    Side effects:
+        - Opens and memory-maps the file at path
+
+    Raises:
+        ValueError: If the file is not a compiled trace
+    """
+    with open(path, "rb") as trace:
+        mapped = mmap.mmap(trace.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if len(mapped) < _HEADER.size:
+            raise ValueError(f"{path} is not a compiled trace")
+        magic, count, marker_offset = _HEADER.unpack_from(mapped, 0)
+        end = _HEADER.size + count * _RECORD.size
+        if magic != TRACE_MAGIC or end != marker_offset or end > len(mapped):
+            raise ValueError(f"{path} is not a compiled trace")
+        markers = []
+        offset = marker_offset
+        while offset < len(mapped):
+            (length,) = _MARKER_LENGTH.unpack_from(mapped, offset)
+            offset += _MARKER_LENGTH.size
+            markers.append(mapped[offset : offset + length].decode("utf-8"))
+            offset += length
+    except Exception:
+        mapped.close()
+        raise
+    return markers, _replay_records(mapped, _HEADER.size, end)
+
+
+def _replay_records(mapped: mmap.mmap, start: int, end: int) -> Iterator[Command]:
+    """
+    Yield the records of a mapped trace, then release the mapping.
+
+    Args:
+        mapped: Memory map of the trace file
+        start: Byte offset of the first record
+        end: Byte offset just past the last record
+
+    Returns:
+        An iterator over the command tuples
+
+    Side effects:
+        - Closes mapped when exhausted or closed
+    """
+    view = memoryview(mapped)[start:end]
+    records = _RECORD.iter_unpack(view)
+    try:
+        yield from records
+    finally:
+        # The unpack iterator holds a buffer export that blocks close()
+        del records
+        view.release()
+        mapped.close()
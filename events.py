@@ -0,0 +1,382 @@
+import sys
+from typing import Dict, List, Optional, TextIO, TYPE_CHECKING
+from tabulate import tabulate
+
+if TYPE_CHECKING:
+    from utils import Site
+
+# Why an operation has to wait, as reported to EventSink.wait
+WAIT_QUEUED = "queued"
+WAIT_NO_WRITE_SITE = "no-write-site"
+WAIT_SITE_DOWN = "site-down"
+WAIT_NO_VERSION = "no-version"
+
+
+class EventSink:
+    """
+    Receives the events a TransactionManager reports and writes them out.
+
+    The transaction manager hands over raw values, with transactions and
+    variables as numbers (3 for T3, 12 for x12); all message formatting,
+    names included, happens here, so a sink that ignores an event also
+    skips its formatting.
+    This base class prints every line with print(), which keeps the output
+    in step with anything else written to sys.stdout. In quiet mode only
+    commits, aborts, dumps and notes are written.
+    """
+
+    def __init__(self, quiet: bool = False):
+        """
+        Create a sink.
+
+        Args:
+            quiet: Only write commits, aborts, dumps and notes
+
+        Side effects:
+            - Initializes instance variables for the sink
+        """
+        self.quiet = quiet
+
+    def emit(self, text: str):
+        """
+        Write one formatted line (or block of lines).
+
+        Args:
+            text: Output without a trailing newline
+
+        Returns:
+            None
+
+        Side effects:
+            - Prints text to stdout
+        """
+        print(text)
+
+    def flush(self):
+        """
+        Write out anything the sink is still holding.
+
+        Returns:
+            None
+
+        Side effects:
+            None for this sink; buffering sinks write their buffer
+        """
+
+    def note(self, text: str):
+        """
+        Write a free-form line, such as a test marker, in every mode.
+
+        Args:
+            text: Line to write
+
+        Returns:
+            None
+
+        Side effects:
+            - Emits text
+        """
+        self.emit(text)
+
+    def begin(self, tid: int, read_only: bool):
+        """
+        Report the start of a transaction.
+
+        Args:
+            tid: Transaction number
+            read_only: Whether it was started with beginRO
+
+        Returns:
+            None
+
+        Side effects:
+            - Emits "begin T1" or "beginRO T1" unless quiet
+        """
+        if self.quiet:
+            return
+        self.emit(f"beginRO T{tid}" if read_only else f"begin T{tid}")
+
+    def read(self, tid: int, var: int, value: int, site_id: Optional[int]):
+        """
+        Report a successful read.
+
+        Args:
+            tid: Transaction number
+            var: Number of the variable read
+            value: Value returned
+            site_id: Site that served the read, or None for the
+                transaction's own write cache
+
+        Returns:
+            None
+
+        Side effects:
+            - Emits the read message unless quiet
+        """
+        if self.quiet:
+            return
+        if site_id is None:
+            self.emit(f"T{tid} reads x{var}: {value} [from write cache]")
+        else:
+            self.emit(f"T{tid} reads x{var}: {value} [from site {site_id}]")
+
+    def write(self, tid: int, var: int, value: int, site_ids: List[int]):
+        """
+        Report a buffered write.
+
+        Args:
+            tid: Transaction number
+            var: Number of the variable written
+            value: Value written
+            site_ids: Sites the write will be applied to at commit
+
+        Returns:
+            None
+
+        Side effects:
+            - Emits the write message unless quiet
+        """
+        if self.quiet:
+            return
+        sites = ", ".join(map(str, site_ids))
+        self.emit(f"T{tid} writes x{var}: {value} [to sites {sites}]")
+
+    def wait(self, tid: int, var: int, reason: str, site_id: int = 0):
+        """
+        Report that an operation was parked.
+
+        Args:
+            tid: Transaction number
+            var: Number of the variable the operation touches
+            reason: One of the WAIT_* constants
+            site_id: Site being waited for (WAIT_SITE_DOWN only)
+
+        Returns:
+            None
+
+        Side effects:
+            - Emits the wait message unless quiet
+        """
+        if self.quiet:
+            return
+        if reason == WAIT_QUEUED:
+            self.emit(f"T{tid} waits - queued behind its blocked operation")
+        elif reason == WAIT_NO_WRITE_SITE:
+            self.emit(f"T{tid} waits - no available sites for writing x{var}")
+        elif reason == WAIT_SITE_DOWN:
+            self.emit(f"T{tid} waits for site {site_id} to recover (contains x{var})")
+        else:
+            self.emit(f"T{tid} waits - no available version of x{var} at any site")
+
+    def commit(self, tid: int):
+        """
+        Report a commit.
+
+        Args:
+            tid: Transaction number
+
+        Returns:
+            None
+
+        Side effects:
+            - Emits "T1 commits"
+        """
+        self.emit(f"T{tid} commits")
+
+    def abort(self, tid: int, reason: Optional[str] = None):
+        """
+        Report an abort.
+
+        Args:
+            tid: Transaction number
+            reason: Optional explanation, written as "T1 aborts due to ..."
+
+        Returns:
+            None
+
+        Side effects:
+            - Emits the abort message
+        """
+        if reason is None:
+            self.emit(f"T{tid} aborts")
+        else:
+            self.emit(f"T{tid} aborts due to {reason}")
+
+    def site_failed(self, site_id: int):
+        """
+        Report a site failure.
+
+        Args:
+            site_id: Site that failed
+
+        Returns:
+            None
+
+        Side effects:
+            - Emits "Site N fails" unless quiet
+        """
+        if not self.quiet:
+            self.emit(f"Site {site_id} fails")
+
+    def site_recovered(self, site_id: int):
+        """
+        Report a site recovery.
+
+        Args:
+            site_id: Site that recovered
+
+        Returns:
+            None
+
+        Side effects:
+            - Emits "Site N recovers" unless quiet
+        """
+        if not self.quiet:
+            self.emit(f"Site {site_id} recovers")
+
+    def dump(self, sites: Dict[int, "Site"]):
+        """
+        Write the committed state of every site as a grid table.
+
+        Shows which sites are UP or DOWN and the value of each variable
+        at each site.
+
+        Args:
+            sites: Sites by ID
+
+        Returns:
+            None
+
+        Side effects:
+            - Emits the table formatted by the tabulate library
+        """
+        active_sites = [site for site in sites.values() if site.is_up]
+        all_vars = sorted(
+            {var.split(":")[0] for site in active_sites for var in site.dump()},
+            key=lambda x: int(x[1:]),
+        )
+
+        headers = ["Site", "Status"] + all_vars
+        table_data = []
+
+        for site_id in sorted(sites.keys()):
+            site = sites[site_id]
+            if not site.is_up:
+                table_data.append([site_id, "DOWN"] + ["" for _ in all_vars])
+                continue
+
+            var_dict = {
+                var.split(":")[0]: var.split(":")[1].strip() for var in site.dump()
+            }
+            row = [site_id, "UP"]
+            row.extend(var_dict.get(var, "") for var in all_vars)
+            table_data.append(row)
+
+        self.emit(tabulate(table_data, headers=headers, tablefmt="grid"))
+
+
+class BufferedSink(EventSink):
+    """
+    Event sink that collects lines and writes them to a stream in batches.
+
+    Large replays spend most of their time in per-line writes to stdout;
+    batching turns thousands of them into one. Call flush() when done.
+    """
+
+    def __init__(
+        self,
+        stream: Optional[TextIO] = None,
+        quiet: bool = False,
+        buffer_lines: int = 4096,
+    ):
+        """
+        Create a buffered sink.
+
+        Args:
+            stream: Stream to write to (default: sys.stdout at creation time)
+            quiet: Only write commits, aborts, dumps and notes
+            buffer_lines: Number of lines to hold before writing them out
+
+        Side effects:
+            - Initializes instance variables for the sink
+        """
+        super().__init__(quiet)
+        self.stream = sys.stdout if stream is None else stream
+        self.buffer_lines = buffer_lines
+        self.lines: List[str] = []
+
+    def emit(self, text: str):
+        """
+        Buffer one formatted line, writing the buffer out when it is full.
+
+        Args:
+            text: Output without a trailing newline
+
+        Returns:
+            None
+
+        Side effects:
+            - Appends to self.lines; may write to self.stream
+        """
+        self.lines.append(text)
+        if len(self.lines) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        """
+        Write all buffered lines to the stream.
+
+        Returns:
+            None
+
+        Side effects:
+            - Writes to and flushes self.stream
+            - Empties self.lines
+        """
+        if self.lines:
+            self.lines.append("")
+            self.stream.write("\n".join(self.lines))
+            self.lines.clear()
+        self.stream.flush()
+
+
+class NullSink(EventSink):
+    """
+    Event sink that discards every event without formatting it.
+
+    For benchmarks, where the cost of producing output would otherwise
+    dominate the cost of the transaction processing being measured.
+    """
+
+    def emit(self, text: str):
+        pass
+
+    def note(self, text: str):
+        pass
+
+    def begin(self, tid: int, read_only: bool):
+        pass
+
+    def read(self, tid: int, var: int, value: int, site_id: Optional[int]):
+        pass
+
+    def write(self, tid: int, var: int, value: int, site_ids: List[int]):
+        pass
+
+    def wait(self, tid: int, var: int, reason: str, site_id: int = 0):
+        pass
+
+    def commit(self, tid: int):
+        pass
+
+    def abort(self, tid: int, reason: Optional[str] = None):
+        pass
+
+    def site_failed(self, site_id: int):
+        pass
+
+    def site_recovered(self, site_id: int):
+        pass
+
+    def dump(self, sites: Dict[int, "Site"]):
+        pass
@@ -0,0 +1,239 @@
+import argparse
+import asyncio
+import time
+from typing import List, Optional
+from tabulate import tabulate
+from server import END_OF_REPLY, TransactionServer
+from workload import generate_workload
+
+
+async def run_client(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    script: List[str],
+    latencies: List[float],
+):
+    """
+    Send a script one command at a time, timing each reply.
+
+    Args:
+        reader: Stream of reply lines from the server
+        writer: Stream to send commands on
+        script: Command lines to send
+        latencies: List that receives each command's round-trip time in
+            seconds
+
+    Returns:
+        None
+
+    Side effects:
+        - Sends commands to the server and consumes its replies
+        - Appends to latencies
+        - Closes the connection when done
+    """
+    clock = time.perf_counter
+    end_of_reply = END_OF_REPLY.encode("utf-8") + b"\n"
+    for line in script:
+        start = clock()
+        writer.write(line.encode("utf-8") + b"\n")
+        while (await reader.readline()) not in (end_of_reply, b""):
+            pass
+        latencies.append(clock() - start)
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run_load(
+    connections: int,
+    transactions: int,
+    ops_per_transaction: int,
+    read_ratio: float,
+    zipf_skew: float,
+    host: str,
+    port: int,
+    unix: Optional[str],
+) -> List:
+    """
+    Drive the server with concurrent clients and summarize the results.
+
+    Each client runs its own generated workload, one transaction at a time,
+    waiting for each reply before sending the next command.
+
+    Args:
+        connections: Number of concurrent client connections
+        transactions: Transactions per connection
+        ops_per_transaction: Mean reads and writes per transaction
+        read_ratio: Probability that an operation is a read
+        zipf_skew: Zipf exponent for choosing variables
+        host: TCP address of the server
+        port: TCP port of the server
+        unix: Unix socket path of the server, used instead of TCP if given
+
+    Returns:
+        [connections, commands, commands per second, p50 ms, p95 ms,
+        p99 ms, max ms]
+
+    Side effects:
+        - Opens and closes client connections
+    """
+    scripts = [
+        [
+            line
+            for line in generate_workload(
+                transactions=transactions,
+                concurrency=1,
+                ops_per_transaction=ops_per_transaction,
+                read_ratio=read_ratio,
+                zipf_skew=zipf_skew,
+                seed=client,
+            )
+            if not line.startswith("//")
+        ]
+        for client in range(connections)
+    ]
+    streams = []
+    for _ in range(connections):
+        if unix is not None:
+            streams.append(await asyncio.open_unix_connection(unix))
+        else:
+            streams.append(await asyncio.open_connection(host, port))
+
+    latencies: List[float] = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            run_client(reader, writer, script, latencies)
+            for (reader, writer), script in zip(streams, scripts)
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(fraction: float) -> float:
+        index = min(len(latencies) - 1, int(fraction * len(latencies)))
+        return latencies[index] * 1e3
+
+    return [
+        connections,
+        len(latencies),
+        len(latencies) / elapsed,
+        percentile(0.5),
+        percentile(0.95),
+        percentile(0.99),
+        latencies[-1] * 1e3,
+    ]
+
+
+def parse_args():
+    """
+    Parse command-line arguments for the load generator.
+
+    Returns:
+        argparse.Namespace: Parsed arguments containing the server address
+        (or None to start one in-process), the connection counts to try and
+        the workload parameters
+
+    Side effects:
+        - May exit the program if invalid arguments are provided (handled by argparse)
+    """
+    parser = argparse.ArgumentParser(
+        description="Measure RepCRec server latency and throughput"
+    )
+    parser.add_argument(
+        "--connect",
+        metavar="HOST:PORT",
+        default=None,
+        help="Server to load (default: start one in-process on a free port)",
+    )
+    parser.add_argument("--unix", default=None, help="Unix socket of the server")
+    parser.add_argument(
+        "--connections",
+        type=int,
+        nargs="+",
+        default=[1, 4, 16, 64],
+        help="Concurrent connection counts to try",
+    )
+    parser.add_argument(
+        "--transactions", type=int, default=200, help="Transactions per connection"
+    )
+    parser.add_argument("--ops-per-transaction", type=int, default=4)
+    parser.add_argument("--read-ratio", type=float, default=0.5)
+    parser.add_argument("--zipf-skew", type=float, default=0.0)
+    return parser.parse_args()
+
+
+async def measure(args) -> List[List]:
+    """
+    Run the load at every requested connection count.
+
+    Args:
+        args: Parsed command-line arguments
+
+    Returns:
+        One run_load row per connection count
+
+    Side effects:
+        - May start and stop an in-process server
+    """
+    listener = None
+    host, port, unix = "127.0.0.1", 0, args.unix
+    if args.connect is not None:
+        host, _, port = args.connect.rpartition(":")
+        port = int(port)
+    elif unix is None:
+        listener = await TransactionServer().start(host, 0)
+        port = listener.sockets[0].getsockname()[1]
+
+    rows = []
+    try:
+        for connections in args.connections:
+            rows.append(
+                await run_load(
+                    connections,
+                    args.transactions,
+                    args.ops_per_transaction,
+                    args.read_ratio,
+                    args.zipf_skew,
+                    host,
+                    port,
+                    unix,
+                )
+            )
+    finally:
+        if listener is not None:
+            listener.close()
+            await listener.wait_closed()
+    return rows
+
+
+def main():
+    """
+    Main entry point for the load generator.
+
+    Returns:
+        None
+
+    Side effects:
+        - Loads the server and prints a result table to stdout
+    """
+    rows = asyncio.run(measure(parse_args()))
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "Connections",
+                "Commands",
+                "Commands/s",
+                "p50 ms",
+                "p95 ms",
+                "p99 ms",
+                "Max ms",
+            ],
+            floatfmt=(None, None, ",.0f", ".3f", ".3f", ".3f", ".3f"),
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,32 @@
 import sys
 import argparse
-import re
-from typing import TextIO, Optional, Dict, Any
-from utils import TransactionManager
+import io
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, TextIO, Optional, Tuple
+from commands import (
+    COMMAND_NAMES,
+    OP_BEGIN,
+    OP_BEGIN_RO,
+    OP_DUMP,
+    OP_END,
+    OP_MARK,
+    OP_READ,
+    OP_WRITE,
+    Command,
+    compile_lines,
+    parse_command,
+    read_trace,
+    write_trace,
+)
+from events import BufferedSink, EventSink
+from stats import Stats
+from utils import (
+    Placement,
+    TransactionManager,
+    READ_POLICIES,
+    REPLICATION_RULES,
+    VALIDATION_ENGINES,
+)
 
 
 class RepCRec:
@@ -28,9 +52,9 @@ class RepCRec:
         self.tm = TransactionManager()
         self.active_transactions = set()
 
-    def parse_command(self, line: str) -> Optional[Dict[str, Any]]:
+    def parse_command(self, line: str) -> Optional[Command]:
         """
-        Parse a command line into a structured command dictionary.
+        Parse a command line into a command tuple.
 
         Supported commands:
             - begin(T1): Start a read-write transaction
@@ -46,66 +70,14 @@ class RepCRec:
             line: A string containing a single command
 
         Returns:
-            A dictionary containing the parsed command with keys like:
-                - 'type': Command type (e.g., 'begin', 'read', 'write')
-                - 'tid': Transaction ID (for transaction operations)
-                - 'var': Variable name (for read/write operations)
-                - 'val': Value to write (for write operations)
-                - 'site': Site ID (for fail/recover operations)
-            Returns None if the line is empty, a comment, or invalid.
+            The command as (opcode, tid, var, value, site), see
+            commands.parse_command. Returns None if the line is empty, a
+            comment, or invalid.
 
         Side effects:
-            - Prints error message to stdout if parsing fails
+            None
         """
-        line = line.strip()
-        if not line or line.startswith("//") or line.startswith("==="):
-            return None
-
-        try:
-            # Match begin/beginRO
-            if match := re.match(r"begin\(([T\d]+)\)", line):
-                return {"type": "begin", "tid": match.group(1)}
-            if match := re.match(r"beginRO\(([T\d]+)\)", line):
-                return {"type": "beginRO", "tid": match.group(1)}
-
-            # Match read operation: R(T1,x2)
-            if match := re.match(r"R\(([T\d]+),\s*x(\d+)\)", line):
-                return {
-                    "type": "read",
-                    "tid": match.group(1),
-                    "var": f"x{match.group(2)}",
-                }
-
-            # Match write operation: W(T1,x2,100)
-            if match := re.match(r"W\(([T\d]+),\s*x(\d+),\s*(-?\d+)\)", line):
-                return {
-                    "type": "write",
-                    "tid": match.group(1),
-                    "var": f"x{match.group(2)}",
-                    "val": int(match.group(3)),
-                }
-
-            # Match end operation
-            if match := re.match(r"end\(([T\d]+)\)", line):
-                return {"type": "end", "tid": match.group(1)}
-
-            # Match fail operation
-            if match := re.match(r"fail\((\d+)\)", line):
-                return {"type": "fail", "site": int(match.group(1))}
-
-            # Match recover operation
-            if match := re.match(r"recover\((\d+)\)", line):
-                return {"type": "recover", "site": int(match.group(1))}
-
-            # Match dump operation
-            if line.strip() == "dump()":
-                return {"type": "dump"}
-
-        except Exception as e:
-            print(f"Error parsing command '{line}': {str(e)}")
-            return None
-
-        return None
+        return parse_command(line)
 
     def process_input(self, input_source: TextIO) -> None:
         """
@@ -188,27 +160,22 @@ class RepCRec:
                 except Exception as e:
                     print(f"Error executing command: {str(e)}")
 
-    def execute_command(self, command: dict) -> None:
+    def execute_command(self, command: Command) -> None:
         """
         Execute a parsed command on the transaction manager.
 
-        Dispatches the command to the appropriate transaction manager method
-        based on the command type. Handles transaction lifecycle (begin, end)
-        and delegates read/write operations to the transaction manager.
+        Tracks the transaction lifecycle (begin, end), rejects operations of
+        unknown transactions, and hands the command to the transaction
+        manager's dispatch table.
 
         Args:
-            command: Dictionary containing parsed command with keys:
-                - 'type': Command type (required)
-                - 'tid': Transaction ID (for transaction operations)
-                - 'var': Variable name (for read/write)
-                - 'val': Value (for write)
-                - 'site': Site ID (for fail/recover)
+            command: Command tuple (opcode, tid, var, value, site)
 
         Returns:
             None
 
         Side effects:
-            - Modifies self.active_transactions (adds/removes transaction IDs)
+            - Modifies self.active_transactions (adds/removes transaction numbers)
             - Calls transaction manager methods that modify database state
             - Prints status messages and errors to stdout
             - May abort existing transactions with duplicate IDs
@@ -216,144 +183,553 @@ class RepCRec:
         Raises:
             Exception: If command execution fails (caught and printed)
         """
-        cmd_type = command["type"]
-        tid = command.get("tid")
+        opcode = command[0]
+        tid = command[1]
 
         try:
-            if cmd_type == "begin" or cmd_type == "beginRO":
+            if opcode == OP_BEGIN or opcode == OP_BEGIN_RO:
                 # Clear any existing transaction with this ID
                 if tid in self.active_transactions:
                     self.tm._abort_transaction(self.tm.transactions.get(tid))
                     self.active_transactions.remove(tid)
-
                 self.active_transactions.add(tid)
-                if cmd_type == "begin":
-                    self.tm.begin_transaction(tid)
-                else:
-                    self.tm.begin_read_only_transaction(tid)
 
-            elif cmd_type == "end":
+            elif opcode == OP_READ or opcode == OP_WRITE or opcode == OP_END:
                 if tid not in self.active_transactions:
-                    print(f"Transaction {tid} does not exist")
+                    print(f"Transaction T{tid} does not exist")
                     return
-                transaction = self.tm.transactions.get(tid)
-                if transaction:
-                    if transaction.write_set:
-                        self.tm._commit_transaction(transaction)
-                    else:
-                        print(f"{tid} commits")
-                self.active_transactions.remove(tid)
-                if tid in self.tm.transactions:
-                    del self.tm.transactions[tid]
 
-            elif cmd_type == "fail":
-                site_id = command["site"]
-                self.tm.fail_site(site_id)
-
-            elif cmd_type == "recover":
-                site_id = command["site"]
-                self.tm.recover_site(site_id)
-
-            elif cmd_type == "dump":
-                self.tm.dump()
-
-            else:
-                if tid not in self.active_transactions:
-                    print(f"Transaction {tid} does not exist")
-                    return
-                if cmd_type == "read":
-                    self.tm.read(tid, command["var"])
-                elif cmd_type == "write":
-                    self.tm.write(tid, command["var"], command["val"])
+            self.tm.execute(command)
+            if opcode == OP_END:
+                self.active_transactions.remove(tid)
 
         except Exception as e:
-            print(f"Error executing {cmd_type} command: {str(e)}")
+            print(f"Error executing {COMMAND_NAMES[opcode]} command: {str(e)}")
 
 
-def parse_args():
+def parse_args(argv: Optional[List[str]] = None):
     """
     Parse command-line arguments for the RepCRec system.
 
-    Configures argument parser to accept an optional input file. If no file
-    is provided, the system reads from stdin.
+    Runs a script from a text file, stdin, or a compiled binary trace. When
+    the first argument is "compile", the remaining arguments name a text
+    script and the binary trace to write instead.
+
+    Args:
+        argv: Arguments to parse (default: sys.argv[1:])
 
     Returns:
         argparse.Namespace: Parsed arguments containing:
+            - command: "compile" or "run"
             - input_file: File object for reading commands, or None for stdin
+            - output: Path of the trace to write (compile only)
+            - trace: Path of a compiled trace to replay, or None (run only)
+            - read_policy: Name of the replica selection policy for reads
+              (run only)
+            - jobs: Number of worker processes for test blocks (run only)
+            - quiet: Only print commits, aborts and dumps (run only)
+            - stats: Print instrumentation statistics to stderr (run only)
+            - checkpoint: Checkpoint to start every test from, or None
+              (run only)
+            - save_checkpoint: Path to save the final state to, or None
+              (run only)
+            - sites, variables, replication: Cluster size, variable count
+              and replication rule name (run only)
+            - engine: Name of the commit validation engine (run only)
 
     Side effects:
         - May exit the program if invalid arguments are provided (handled by argparse)
         - Opens the specified file for reading if provided
     """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["compile"]:
+        parser = argparse.ArgumentParser(
+            prog="main.py compile",
+            description="Compile a text script into a binary trace for replay",
+        )
+        parser.add_argument(
+            "input_file",
+            type=argparse.FileType("r"),
+            help="Text script to compile (- for stdin)",
+        )
+        parser.add_argument("output", help="Path of the binary trace to write")
+        args = parser.parse_args(argv[1:])
+        args.command = "compile"
+        return args
+
     parser = argparse.ArgumentParser(
-        description="Replicated Concurrency Control and Recovery System"
+        description="Replicated Concurrency Control and Recovery System",
+        epilog="Use 'main.py compile SCRIPT TRACE' to compile a script "
+        "for --replay.",
     )
-    parser.add_argument(
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument(
         "input_file",
         nargs="?",
         type=argparse.FileType("r"),
         default=None,
         help="Input file containing commands (default: stdin)",
     )
-    return parser.parse_args()
-
-
-def main():
+    source.add_argument(
+        "--replay",
+        dest="trace",
+        metavar="TRACE",
+        default=None,
+        help="Replay a binary trace written by 'main.py compile'",
+    )
+    parser.add_argument(
+        "--read-policy",
+        choices=sorted(READ_POLICIES),
+        default="first",
+        help="Replica selection policy for reads (default: first)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Run independent '// Test' blocks in N worker processes; output "
+        "is identical to a sequential run (default: 1)",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Only print commits, aborts and dumps",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print operation latencies and commit/abort counts to stderr",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        metavar="FILE",
+        default=None,
+        help="Start every test from the state saved in FILE instead of the "
+        "initial state",
+    )
+    parser.add_argument(
+        "--save-checkpoint",
+        metavar="FILE",
+        default=None,
+        help="Save the final state of the last test to FILE",
+    )
+    parser.add_argument(
+        "--sites", type=int, default=10, help="Number of sites (default: 10)"
+    )
+    parser.add_argument(
+        "--variables",
+        type=int,
+        default=20,
+        help="Number of variables x1..xN (default: 20)",
+    )
+    parser.add_argument(
+        "--replication",
+        choices=sorted(REPLICATION_RULES),
+        default="even",
+        help="Replication rule: even variables everywhere and odd ones at one "
+        "site, every variable everywhere, at one site, or at three "
+        "consecutive sites (default: even)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=VALIDATION_ENGINES,
+        default="graph",
+        help="Commit validation: cycle search in the serialization graph, or "
+        "SSI dangerous structure detection (default: graph)",
+    )
+    args = parser.parse_args(argv)
+    if args.sites < 1 or args.variables < 1:
+        parser.error("--sites and --variables must be at least 1")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.jobs > 1 and args.save_checkpoint is not None:
+        parser.error("--save-checkpoint needs --jobs 1")
+    args.command = "run"
+    return args
+
+
+def run_commands(
+    commands: Iterable[Command],
+    markers: List[str],
+    read_policy: type,
+    sink: EventSink,
+    stats: Optional[Stats] = None,
+    checkpoint: Optional[str] = None,
+    save_checkpoint: Optional[str] = None,
+    placement: Optional[Placement] = None,
+    engine: str = "graph",
+) -> None:
     """
-    Main entry point for the RepCRec system.
+    Execute a stream of parsed commands, one fresh TransactionManager per test.
 
-    Processes commands from either a file or stdin, executing them through
-    a TransactionManager. Handles multiple test cases and automatically dumps
-    the final state if no explicit dump() command was issued in a test.
+    Each OP_MARK starts a new test: its marker text is echoed and the
+    transaction manager is replaced. A test that issued no dump() gets a
+    final state dump when it ends.
 
     Args:
-        None (uses command-line arguments via sys.argv)
+        commands: Command tuples from commands.compile_lines or
+            commands.read_trace
+        markers: Marker texts indexed by the site field of OP_MARK tuples
+        read_policy: ReadPolicy subclass to instantiate for each test
+        sink: Event sink shared by every test's transaction manager
+        stats: Statistics shared by every test's transaction manager, or
+            None to run without instrumentation
+        checkpoint: Checkpoint file every test's transaction manager starts
+            from, or None to start from the initial state
+        save_checkpoint: Path to save the last test's final state to, or
+            None
+        placement: Cluster configuration of every test's transaction
+            manager (default: 10 sites, x1..x20)
+        engine: Commit validation engine of every test's transaction
+            manager, one of VALIDATION_ENGINES (default: graph)
 
     Returns:
         None
 
     Side effects:
-        - Reads from file or stdin
         - Creates and manages TransactionManager instances
-        - Prints test markers, command results, and state dumps to stdout
-        - Closes input file if one was opened
-        - Processes all database operations with full side effects
+        - Reports test markers, command results, and state dumps to the sink
+        - Reports a command the transaction manager rejects (such as an
+          unknown variable or a duplicate begin) as an error line, and
+          goes on with the next command
+        - Writes the save_checkpoint file, if given
+        - Flushes the sink when done, even if a command raises
     """
-    args = parse_args()
-    input_source = args.input_file if args.input_file else sys.stdin
+    try:
+        _run_tests(
+            commands,
+            markers,
+            read_policy,
+            sink,
+            stats,
+            checkpoint,
+            save_checkpoint,
+            placement,
+            engine,
+        )
+    finally:
+        sink.flush()
+
+
+def _run_tests(
+    commands: Iterable[Command],
+    markers: List[str],
+    read_policy: type,
+    sink: EventSink,
+    stats: Optional[Stats],
+    checkpoint: Optional[str],
+    save_checkpoint: Optional[str],
+    placement: Optional[Placement],
+    engine: str,
+) -> None:
+    """
+    Body of run_commands, without the final flush.
 
-    tm = TransactionManager()
+    Args:
+        commands: Command tuples from commands.compile_lines or
+            commands.read_trace
+        markers: Marker texts indexed by the site field of OP_MARK tuples
+        read_policy: ReadPolicy subclass to instantiate for each test
+        sink: Event sink shared by every test's transaction manager
+        stats: Statistics shared by every test's transaction manager, or None
+        checkpoint: Checkpoint file to start every test from, or None
+        save_checkpoint: Path to save the last test's final state to, or None
+        placement: Cluster configuration of every test's transaction manager
+        engine: Commit validation engine of every test's transaction manager
+
+    Returns:
+        None
+
+    Side effects:
+        - Same as run_commands, except for the flush
+    """
+    tm = TransactionManager(
+        read_policy=read_policy(),
+        sink=sink,
+        stats=stats,
+        checkpoint=checkpoint,
+        placement=placement,
+        engine=engine,
+    )
     has_dump = False
     in_test = False
 
-    for line in input_source:
-        line = line.strip()
+    for command in commands:
+        opcode = command[0]
 
         # Start of new test
-        if line.startswith("// Test"):
+        if opcode == OP_MARK:
             # If we were in a test and had no dump, dump the final state
             if in_test and not has_dump:
-                print("\nFinal state:")
+                sink.note("\nFinal state:")
                 tm.dump()
 
             # Reset for new test
-            print(f"\n{line}")
-            tm = TransactionManager()
+            sink.note(f"\n{markers[command[4]]}")
+            tm = TransactionManager(
+                read_policy=read_policy(),
+                sink=sink,
+                stats=stats,
+                checkpoint=checkpoint,
+                placement=placement,
+                engine=engine,
+            )
             has_dump = False
             in_test = True
             continue
 
-        # Process the current line if it's not empty or a comment
-        if line and not line.startswith("//"):
-            if line.lower() == "dump()":
-                has_dump = True
-            tm.process_operation(line)
+        if opcode == OP_DUMP:
+            has_dump = True
+        try:
+            tm.execute(command)
+        except ValueError as e:
+            sink.note(f"Error executing {COMMAND_NAMES[opcode]} command: {e}")
 
     # Final dump only at the very end if needed
     if in_test and not has_dump:
-        print("\nFinal state:")
+        sink.note("\nFinal state:")
         tm.dump()
 
+    if save_checkpoint is not None:
+        tm.checkpoint(save_checkpoint)
+
+
+def split_tests(
+    commands: Iterable[Command], markers: List[str]
+) -> Iterator[Tuple[List[Command], List[str]]]:
+    """
+    Split a command stream into independently runnable test blocks.
+
+    Every test starts with a fresh TransactionManager, so each block shares
+    no state with the others. A block begins at an OP_MARK (except for any
+    commands before the first marker) and carries its own marker text,
+    renumbered to index 0.
+
+    Args:
+        commands: Command tuples, as accepted by run_commands
+        markers: Marker texts indexed by the site field of OP_MARK tuples
+
+    Returns:
+        An iterator of (commands, markers) pairs, in input order, each of
+        which run_commands can execute on its own
+
+    Side effects:
+        None
+    """
+    block: List[Command] = []
+    block_markers: List[str] = []
+    for command in commands:
+        if command[0] == OP_MARK:
+            if block:
+                yield block, block_markers
+            block = [(OP_MARK, 0, 0, 0, 0)]
+            block_markers = [markers[command[4]]]
+            continue
+        block.append(command)
+    if block:
+        yield block, block_markers
+
+
+def run_test_block(
+    job: Tuple[
+        List[Command], List[str], str, bool, bool, Optional[str], Placement, str
+    ]
+) -> Tuple[str, Optional[Stats]]:
+    """
+    Run one test block and capture its output.
+
+    Args:
+        job: (commands, markers, read policy name, quiet, stats,
+            checkpoint, placement, engine), as produced by split_tests plus the
+            options selected on the command line
+
+    Returns:
+        Everything the block wrote, exactly as a sequential run writes it,
+        and the block's statistics if stats was requested (else None)
+
+    Side effects:
+        None
+    """
+    (
+        commands,
+        markers,
+        read_policy,
+        quiet,
+        with_stats,
+        checkpoint,
+        placement,
+        engine,
+    ) = job
+    output = io.StringIO()
+    sink = BufferedSink(output, quiet=quiet)
+    stats = Stats() if with_stats else None
+    run_commands(
+        commands,
+        markers,
+        READ_POLICIES[read_policy],
+        sink,
+        stats,
+        checkpoint,
+        placement=placement,
+        engine=engine,
+    )
+    return output.getvalue(), stats
+
+
+def run_parallel(
+    commands: Iterable[Command],
+    markers: List[str],
+    read_policy: str,
+    quiet: bool,
+    stats: Optional[Stats],
+    jobs: int,
+    checkpoint: Optional[str] = None,
+    placement: Optional[Placement] = None,
+    engine: str = "graph",
+) -> None:
+    """
+    Run test blocks across a process pool, printing results in input order.
+
+    Args:
+        commands: Command tuples, as accepted by run_commands
+        markers: Marker texts indexed by the site field of OP_MARK tuples
+        read_policy: Name of the replica selection policy for reads
+        quiet: Only write commits, aborts, dumps and test markers
+        stats: Statistics to merge every block's statistics into, or None
+        jobs: Number of worker processes
+        checkpoint: Checkpoint file every test block starts from, or None
+        placement: Cluster configuration of every test block
+        engine: Commit validation engine of every test block
+
+    Returns:
+        None
+
+    Side effects:
+        - Starts and shuts down worker processes
+        - Writes each block's output to stdout as soon as it and every
+          earlier block have finished
+        - Merges the blocks' statistics into stats
+    """
+    blocks = [
+        (
+            block,
+            block_markers,
+            read_policy,
+            quiet,
+            stats is not None,
+            checkpoint,
+            placement,
+            engine,
+        )
+        for block, block_markers in split_tests(commands, markers)
+    ]
+    chunksize = max(1, len(blocks) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for output, block_stats in pool.map(
+            run_test_block, blocks, chunksize=chunksize
+        ):
+            sys.stdout.write(output)
+            if block_stats is not None:
+                stats.merge(block_stats)
+
+
+def main():
+    """
+    Main entry point for the RepCRec system.
+
+    Processes commands from a text file, stdin, or a compiled binary trace,
+    executing them through a TransactionManager. Handles multiple test cases
+    and automatically dumps the final state if no explicit dump() command was
+    issued in a test. With the "compile" subcommand, writes the binary trace
+    of a text script instead of running it.
+
+    Args:
+        None (uses command-line arguments via sys.argv)
+
+    Returns:
+        None
+
+    Side effects:
+        - Reads from file or stdin, or memory-maps a compiled trace
+        - Writes the compiled trace (compile only)
+        - Exits with an error naming the line if a command's numbers do not
+          fit a trace record (compile only), or the trace cannot be written
+          or read; also exits if the --checkpoint file is not a checkpoint
+        - Prints test markers, command results, and state dumps to stdout
+        - With --jobs N, runs test blocks in N worker processes
+        - With --stats, prints instrumentation statistics to stderr
+        - With --checkpoint, starts every test from the checkpoint; with
+          --save-checkpoint, saves the final state
+        - With --sites, --variables or --replication, runs every test on
+          that cluster configuration
+        - With --engine, validates commits with that engine
+        - Closes input file if one was opened
+        - Processes all database operations with full side effects
+    """
+    args = parse_args()
+
+    if args.command == "compile":
+        markers: List[str] = []
+        with args.input_file as script:
+            try:
+                write_trace(
+                    args.output,
+                    compile_lines(script, markers, check_range=True),
+                    markers,
+                )
+            except (OSError, ValueError) as e:
+                sys.exit(f"Error compiling {script.name}: {e}")
+        return
+
+    if args.trace is not None:
+        try:
+            markers, commands = read_trace(args.trace)
+        except (OSError, ValueError) as e:
+            sys.exit(f"Error replaying {args.trace}: {e}")
+    else:
+        input_source = args.input_file if args.input_file else sys.stdin
+        markers = []
+        commands = compile_lines(input_source, markers)
+
+    stats = Stats() if args.stats else None
+    placement = Placement(
+        args.sites, args.variables, REPLICATION_RULES[args.replication]
+    )
+    try:
+        if args.jobs > 1:
+            run_parallel(
+                commands,
+                markers,
+                args.read_policy,
+                args.quiet,
+                stats,
+                args.jobs,
+                args.checkpoint,
+                placement,
+                args.engine,
+            )
+        else:
+            sink = BufferedSink(sys.stdout, quiet=args.quiet)
+            run_commands(
+                commands,
+                markers,
+                READ_POLICIES[args.read_policy],
+                sink,
+                stats,
+                args.checkpoint,
+                args.save_checkpoint,
+                placement,
+                args.engine,
+            )
+    except ValueError as e:
+        # A bad --checkpoint file
+        source = args.trace or getattr(args.input_file, "name", "<stdin>")
+        sys.exit(f"Error running {source}: {e}")
+
+    if stats is not None:
+        print(stats.format(), file=sys.stderr)
+
     # Close file if we opened one
     if args.input_file:
         args.input_file.close()
@@ -0,0 +1,568 @@
+import argparse
+import asyncio
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+from commands import OP_BEGIN, OP_BEGIN_RO, OP_END, OP_READ, OP_WRITE, parse_command
+from events import EventSink
+from utils import (
+    Placement,
+    Site,
+    TransactionManager,
+    READ_POLICIES,
+    REPLICATION_RULES,
+    VALIDATION_ENGINES,
+)
+from wal import WriteAheadLog
+
+# Line that ends the reply to each command
+END_OF_REPLY = ""
+
+
+class Connection:
+    """
+    One client connection and the transactions it has begun.
+
+    Clients name their transactions freely (every client may have a T1); the
+    server tags each one with a server-wide transaction number, so that all
+    connections can share a single TransactionManager.
+    """
+
+    def __init__(self, number: int, writer: asyncio.StreamWriter):
+        """
+        Create the state for a new connection.
+
+        Args:
+            number: Server-assigned connection number
+            writer: Stream to send replies on
+
+        Side effects:
+            - Initializes instance variables for the connection
+        """
+        self.number = number
+        self.writer = writer
+        # Client transaction number -> server transaction number
+        self.tids: Dict[int, int] = {}
+
+    def send(self, text: str):
+        """
+        Queue one reply line for the client.
+
+        Args:
+            text: Line without a trailing newline
+
+        Returns:
+            None
+
+        Side effects:
+            - Writes to the connection's transport buffer
+        """
+        self.writer.write(text.encode("utf-8") + b"\n")
+
+
+class ConnectionSink(EventSink):
+    """
+    Event sink that routes each message to the connection it concerns.
+
+    Events about a transaction go to the connection that began it, with the
+    transaction renumbered back to the client's own number; this also delivers
+    messages caused by another client's command, such as an operation resumed
+    by a commit. Site and dump events go to the connection whose command
+    caused them.
+    """
+
+    def __init__(self):
+        """
+        Create a sink with no connections.
+
+        Side effects:
+            - Initializes instance variables for the sink
+        """
+        super().__init__()
+        # Connection whose command is being executed
+        self.issuer: Optional[Connection] = None
+        self.target: Optional[Connection] = None
+        # Server transaction number -> (owning connection, client's number)
+        self.owners: Dict[int, Tuple[Connection, int]] = {}
+
+    def _route(self, tid: int) -> int:
+        """
+        Direct the next message to the owner of a transaction.
+
+        Args:
+            tid: Server transaction number
+
+        Returns:
+            The client's number for the transaction
+
+        Side effects:
+            - Sets self.target
+        """
+        owner = self.owners.get(tid)
+        if owner is None:
+            self.target = self.issuer
+            return tid
+        self.target, client_tid = owner
+        return client_tid
+
+    def emit(self, text: str):
+        self.target.send(text)
+
+    def note(self, text: str):
+        self.target = self.issuer
+        super().note(text)
+
+    def begin(self, tid: int, read_only: bool):
+        super().begin(self._route(tid), read_only)
+
+    def read(self, tid: int, var: int, value: int, site_id: Optional[int]):
+        super().read(self._route(tid), var, value, site_id)
+
+    def write(self, tid: int, var: int, value: int, site_ids: List[int]):
+        super().write(self._route(tid), var, value, site_ids)
+
+    def wait(self, tid: int, var: int, reason: str, site_id: int = 0):
+        super().wait(self._route(tid), var, reason, site_id)
+
+    def commit(self, tid: int):
+        super().commit(self._route(tid))
+
+    def abort(self, tid: int, reason: Optional[str] = None):
+        super().abort(self._route(tid), reason)
+
+    def site_failed(self, site_id: int):
+        self.target = self.issuer
+        super().site_failed(site_id)
+
+    def site_recovered(self, site_id: int):
+        self.target = self.issuer
+        super().site_recovered(site_id)
+
+    def dump(self, sites: Dict[int, Site]):
+        self.target = self.issuer
+        super().dump(sites)
+
+
+class TransactionServer:
+    """
+    Serves the command language to many clients over one TransactionManager.
+
+    Every command runs to completion inside the event loop before the next
+    one is read from any connection, so the transaction manager sees a single
+    serialized stream. Each command's reply lines are followed by an empty
+    line.
+    """
+
+    def __init__(
+        self,
+        read_policy: str = "first",
+        wal: Optional[WriteAheadLog] = None,
+        checkpoint: Optional[str] = None,
+        placement: Optional[Placement] = None,
+        engine: str = "graph",
+    ):
+        """
+        Create a server with a fresh transaction manager.
+
+        Args:
+            read_policy: Name of the replica selection policy for reads
+            wal: Write-ahead log to restore the sites from and to log
+                commits to (default: None, state is in memory only)
+            checkpoint: Checkpoint file to restore the sites from before
+                replaying the log; ignored if the file does not exist yet
+                (default: None)
+            placement: Cluster configuration (default: 10 sites, x1..x20)
+            engine: Commit validation engine, one of VALIDATION_ENGINES
+                (default: graph)
+
+        Side effects:
+            - Creates a TransactionManager that reports through a
+              ConnectionSink, loading the checkpoint and replaying the
+              write-ahead log if given
+        """
+        self.sink = ConnectionSink()
+        if checkpoint is not None and not os.path.exists(checkpoint):
+            checkpoint = None
+        self.tm = TransactionManager(
+            read_policy=READ_POLICIES[read_policy](),
+            sink=self.sink,
+            wal=wal,
+            checkpoint=checkpoint,
+            placement=placement,
+            engine=engine,
+        )
+        self.connections = 0
+        # Number new transactions after any restored from the checkpoint or log
+        self.last_tid = self.tm.restored_tid
+
+    def execute(
+        self, connection: Connection, line: str
+    ) -> Optional["asyncio.Future[None]"]:
+        """
+        Run one command line received from a connection.
+
+        Args:
+            connection: Connection the line arrived on
+            line: Command in the command language
+
+        Returns:
+            For end() with a write-ahead log, a future that completes once
+            the commits logged so far, this one included, are durable and
+            acknowledged; the reply must not end before it does. None
+            otherwise.
+
+        Side effects:
+            - Executes the command on the shared transaction manager
+            - Tags transactions begun by the connection, and forgets them on
+              end() once the outcome has been reported
+            - Sends the resulting messages to the connections they concern
+            - Sends an error message instead if the command fails, leaving
+              the connection open
+        """
+        command = parse_command(line)
+        if command is None:
+            line = line.strip()
+            if line and not line.startswith("//"):
+                connection.send(f"Error: cannot parse '{line}'")
+            return
+
+        opcode, client_tid = command[0], command[1]
+        client_name = f"T{client_tid}"
+        tid = 0
+        if opcode == OP_BEGIN or opcode == OP_BEGIN_RO:
+            if client_tid in connection.tids:
+                connection.send(f"Error: transaction {client_name} already exists")
+                return
+            self.last_tid += 1
+            tid = self.last_tid
+            connection.tids[client_tid] = tid
+            self.sink.owners[tid] = (connection, client_tid)
+        elif opcode == OP_READ or opcode == OP_WRITE or opcode == OP_END:
+            tid = connection.tids.get(client_tid, 0)
+            if not tid:
+                connection.send(f"Transaction {client_name} does not exist")
+                return
+
+        self.sink.issuer = connection
+        try:
+            self.tm.execute((opcode, tid, command[2], command[3], command[4]))
+        except Exception as e:
+            # Errors name the server's transaction ID; show the client's
+            message = re.sub(rf"\bT{tid}\b", client_name, str(e))
+            connection.send(f"Error: {message}")
+        if opcode != OP_END:
+            return None
+        wal = self.tm.wal
+        if wal is None:
+            self._forget(connection, client_tid, tid)
+            return None
+        # The commit is reported after its group's fsync, and needs its
+        # owner to be routed; this runs after that report
+        durable = asyncio.get_running_loop().create_future()
+
+        def acknowledged():
+            self._forget(connection, client_tid, tid)
+            if not durable.done():
+                durable.set_result(None)
+
+        wal.after_sync(acknowledged)
+        return durable
+
+    def _forget(self, connection: Connection, client_tid: int, tid: int):
+        """
+        Drop an ended transaction from its connection and the sink.
+
+        Args:
+            connection: Connection that began the transaction
+            client_tid: The client's number for it
+            tid: Server transaction number
+
+        Returns:
+            None
+
+        Side effects:
+            - Removes the transaction from connection.tids and sink.owners
+        """
+        connection.tids.pop(client_tid, None)
+        self.sink.owners.pop(tid, None)
+
+    def disconnect(self, connection: Connection):
+        """
+        Abort the transactions a departing connection left open.
+
+        Args:
+            connection: Connection that closed
+
+        Returns:
+            None
+
+        Side effects:
+            - Aborts the connection's unfinished transactions and forgets them
+        """
+        for tid in connection.tids.values():
+            self.tm.abort_transaction(tid)
+            del self.sink.owners[tid]
+        connection.tids.clear()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serve one client until it disconnects.
+
+        Args:
+            reader: Stream of command lines from the client
+            writer: Stream for replies to the client
+
+        Returns:
+            None
+
+        Side effects:
+            - Executes the client's commands and streams back the replies;
+              the reply to end() waits until its commit is durable, and a
+              failing command gets an error reply
+            - Cleans up the client's transactions when it disconnects
+        """
+        self.connections += 1
+        connection = Connection(self.connections, writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    durable = self.execute(
+                        connection, line.decode("utf-8", "replace")
+                    )
+                    if durable is not None:
+                        await durable
+                except Exception as e:
+                    # One failing command must not drop the connection
+                    connection.send(f"Error: {e}")
+                connection.send(END_OF_REPLY)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.disconnect(connection)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def start(
+        self, host: str = "127.0.0.1", port: int = 7000, unix: Optional[str] = None
+    ) -> asyncio.AbstractServer:
+        """
+        Start listening for clients.
+
+        Args:
+            host: Address to listen on (TCP)
+            port: Port to listen on (TCP); 0 picks a free one
+            unix: Path of a Unix socket to listen on instead of TCP
+
+        Returns:
+            The listening asyncio server
+
+        Side effects:
+            - Opens the listening socket
+        """
+        if unix is not None:
+            return await asyncio.start_unix_server(self.handle, path=unix)
+        return await asyncio.start_server(self.handle, host, port)
+
+
+def parse_args():
+    """
+    Parse command-line arguments for the server.
+
+    Returns:
+        argparse.Namespace: Parsed arguments containing the listening
+        address, the read policy, the cluster configuration, the
+        validation engine, and the durability options
+
+    Side effects:
+        - May exit the program if invalid arguments are provided (handled by argparse)
+    """
+    parser = argparse.ArgumentParser(
+        description="Serve the RepCRec command language over TCP or a Unix socket"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="TCP address")
+    parser.add_argument("--port", type=int, default=7000, help="TCP port")
+    parser.add_argument("--unix", default=None, help="Unix socket path (instead of TCP)")
+    parser.add_argument(
+        "--read-policy",
+        choices=sorted(READ_POLICIES),
+        default="first",
+        help="Replica selection policy for reads (default: first)",
+    )
+    parser.add_argument(
+        "--sites", type=int, default=10, help="Number of sites (default: 10)"
+    )
+    parser.add_argument(
+        "--variables",
+        type=int,
+        default=20,
+        help="Number of variables x1..xN (default: 20)",
+    )
+    parser.add_argument(
+        "--replication",
+        choices=sorted(REPLICATION_RULES),
+        default="even",
+        help="Replication rule (default: even)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=VALIDATION_ENGINES,
+        default="graph",
+        help="Commit validation engine (default: graph)",
+    )
+    parser.add_argument(
+        "--wal",
+        metavar="DIR",
+        default=None,
+        help="Keep per-site write-ahead logs in DIR and restore from them at "
+        "startup",
+    )
+    parser.add_argument(
+        "--group-size",
+        type=int,
+        default=16,
+        help="Commits sharing one fsync at most (default: 16)",
+    )
+    parser.add_argument(
+        "--group-window-ms",
+        type=float,
+        default=5.0,
+        help="Longest a commit waits for its group's fsync (default: 5 ms)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        metavar="FILE",
+        default=None,
+        help="Restore from FILE at startup if it exists, and save a "
+        "checkpoint to it periodically and on shutdown",
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        type=float,
+        default=60.0,
+        help="Seconds between checkpoints (default: 60)",
+    )
+    return parser.parse_args()
+
+
+async def serve(args):
+    """
+    Run the server until it is interrupted.
+
+    Args:
+        args: Parsed command-line arguments
+
+    Returns:
+        None
+
+    Side effects:
+        - Listens for and serves clients
+        - Prints the listening address to stdout
+        - With --wal, restores the sites from the logs, syncs pending
+          commit groups once their window has passed, and syncs and closes
+          the logs on shutdown
+        - With --checkpoint, restores the sites from the checkpoint first,
+          and saves checkpoints periodically and on shutdown, each of which
+          empties the logs
+    """
+    placement = Placement(
+        args.sites, args.variables, REPLICATION_RULES[args.replication]
+    )
+    wal = None
+    if args.wal is not None:
+        wal = WriteAheadLog(
+            args.wal,
+            list(range(1, placement.site_count + 1)),
+            group_size=args.group_size,
+            group_window=args.group_window_ms / 1e3,
+        )
+    server = TransactionServer(
+        args.read_policy, wal, args.checkpoint, placement, args.engine
+    )
+    listener = await server.start(args.host, args.port, args.unix)
+    address = args.unix or "%s:%d" % listener.sockets[0].getsockname()[:2]
+    print(f"Listening on {address}", flush=True)
+    tasks = []
+    if wal is not None:
+        tasks.append(asyncio.create_task(poll_wal(wal)))
+    if args.checkpoint is not None:
+        tasks.append(
+            asyncio.create_task(
+                save_checkpoints(server, args.checkpoint, args.checkpoint_interval)
+            )
+        )
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        for task in tasks:
+            task.cancel()
+        if args.checkpoint is not None:
+            server.tm.checkpoint(args.checkpoint)
+        server.tm.close()
+
+
+async def poll_wal(wal: WriteAheadLog):
+    """
+    Sync commit groups that have waited for their whole window.
+
+    Args:
+        wal: Write-ahead log of the server's transaction manager
+
+    Returns:
+        None (runs until cancelled)
+
+    Side effects:
+        - Calls wal.poll() four times per group window, so that a group is
+          synced, and its commits acknowledged, at most a quarter window
+          late
+    """
+    while True:
+        await asyncio.sleep(wal.group_window / 4)
+        wal.poll()
+
+
+async def save_checkpoints(server: TransactionServer, path: str, interval: float):
+    """
+    Save a checkpoint of the server's state at a fixed interval.
+
+    Args:
+        server: Server whose transaction manager to checkpoint
+        path: Checkpoint file to write
+        interval: Seconds between checkpoints
+
+    Returns:
+        None (runs until cancelled)
+
+    Side effects:
+        - Periodically calls server.tm.checkpoint(path)
+    """
+    while True:
+        await asyncio.sleep(interval)
+        server.tm.checkpoint(path)
+
+
+def main():
+    """
+    Main entry point for the server.
+
+    Returns:
+        None
+
+    Side effects:
+        - Serves clients until interrupted (Ctrl-C)
+    """
+    try:
+        asyncio.run(serve(parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
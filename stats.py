@@ -0,0 +1,279 @@
+import functools
+import time
+from typing import Callable, Dict, List
+from tabulate import tabulate
+
+# Timed operations, in report order
+OPERATIONS = (
+    "read",
+    "write",
+    "commit validation",
+    "cycle detection",
+    "fail",
+    "recover",
+    "dump",
+)
+
+# Why a transaction aborted, as passed to TransactionManager._abort_transaction
+ABORT_FIRST_COMMITTER_WINS = "first-committer-wins"
+ABORT_CYCLE = "cycle"
+ABORT_DANGEROUS_STRUCTURE = "dangerous structure"
+ABORT_SITE_FAILURE = "site failure"
+ABORT_OTHER = "other"
+
+ABORT_REASONS = (
+    ABORT_FIRST_COMMITTER_WINS,
+    ABORT_CYCLE,
+    ABORT_DANGEROUS_STRUCTURE,
+    ABORT_SITE_FAILURE,
+    ABORT_OTHER,
+)
+
+
+class LatencyHistogram:
+    """
+    Latency distribution with power-of-two nanosecond buckets.
+
+    Bucket i counts samples of fewer than 2**i nanoseconds (and at least
+    2**(i-1)), so recording a sample is one bit_length() and one increment,
+    and percentiles are exact to within a factor of two.
+    """
+
+    __slots__ = ("buckets", "count", "total_ns", "max_ns")
+
+    def __init__(self):
+        """
+        Create an empty histogram.
+
+        Side effects:
+            - Initializes instance variables for the histogram
+        """
+        self.buckets: List[int] = [0] * 65
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, elapsed_ns: int):
+        """
+        Add one sample.
+
+        Args:
+            elapsed_ns: Latency in nanoseconds
+
+        Returns:
+            None
+
+        Side effects:
+            - Updates the bucket counts, total and maximum
+        """
+        self.buckets[elapsed_ns.bit_length()] += 1
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+
+    def percentile(self, fraction: float) -> int:
+        """
+        Upper bound of the bucket holding the given percentile.
+
+        Args:
+            fraction: Percentile as a fraction, e.g. 0.99
+
+        Returns:
+            Latency in nanoseconds (0 if the histogram is empty)
+
+        Side effects:
+            None
+        """
+        if not self.count:
+            return 0
+        rank = fraction * self.count
+        seen = 0
+        for bucket, samples in enumerate(self.buckets):
+            seen += samples
+            if samples and seen >= rank:
+                return min(1 << bucket, self.max_ns)
+        return self.max_ns
+
+    def merge(self, other: "LatencyHistogram"):
+        """
+        Add another histogram's samples to this one.
+
+        Args:
+            other: Histogram to merge in
+
+        Returns:
+            None
+
+        Side effects:
+            - Updates this histogram
+        """
+        for bucket, samples in enumerate(other.buckets):
+            self.buckets[bucket] += samples
+        self.count += other.count
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+
+
+class Stats:
+    """
+    Operation latencies and outcome counters for a TransactionManager.
+
+    A TransactionManager only records into a Stats object when one is passed
+    to it; instrumentation then works by wrapping the timed methods, so a
+    manager without one runs the unwrapped code. One Stats object can be
+    shared by several managers to aggregate over a run.
+    """
+
+    def __init__(self):
+        """
+        Create empty statistics.
+
+        Side effects:
+            - Initializes one histogram per operation, zeroed counters and
+              empty per-site read counts
+        """
+        self.latency: Dict[str, LatencyHistogram] = {
+            operation: LatencyHistogram() for operation in OPERATIONS
+        }
+        self.commits = 0
+        self.aborts: Dict[str, int] = {reason: 0 for reason in ABORT_REASONS}
+        # Reads served by each site, keyed by site ID, so that the read
+        # router's load balancing can be checked
+        self.site_reads: Dict[int, int] = {}
+
+    def count_read(self, site_id: int):
+        """
+        Count one read served by a site.
+
+        Args:
+            site_id: Site that served the read
+
+        Returns:
+            None
+
+        Side effects:
+            - Increments self.site_reads[site_id]
+        """
+        self.site_reads[site_id] = self.site_reads.get(site_id, 0) + 1
+
+    def timed(self, operation: str, func: Callable) -> Callable:
+        """
+        Wrap a callable so each call's latency is recorded.
+
+        Args:
+            operation: One of OPERATIONS
+            func: Callable to time
+
+        Returns:
+            A wrapper with the same signature and return value
+
+        Side effects:
+            None until the wrapper is called
+        """
+        histogram = self.latency[operation]
+        clock = time.perf_counter_ns
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.record(clock() - start)
+
+        return wrapper
+
+    def merge(self, other: "Stats"):
+        """
+        Add another Stats object's samples and counters to this one.
+
+        Args:
+            other: Statistics to merge in, e.g. from a worker process
+
+        Returns:
+            None
+
+        Side effects:
+            - Updates this object's histograms and counters
+        """
+        for operation, histogram in other.latency.items():
+            self.latency[operation].merge(histogram)
+        self.commits += other.commits
+        for reason, count in other.aborts.items():
+            self.aborts[reason] = self.aborts.get(reason, 0) + count
+        for site_id, count in other.site_reads.items():
+            self.site_reads[site_id] = self.site_reads.get(site_id, 0) + count
+
+    def snapshot(self) -> Dict:
+        """
+        Summarize the statistics as plain data.
+
+        Returns:
+            A dictionary with:
+                - 'latency': per operation, a dict of count, mean_us,
+                  p50_us, p99_us and max_us
+                - 'commits': number of commits
+                - 'aborts': number of aborts per reason
+                - 'site_reads': number of reads served per site ID, in
+                  site order
+
+        Side effects:
+            None
+        """
+        latency = {}
+        for operation, histogram in self.latency.items():
+            count = histogram.count
+            latency[operation] = {
+                "count": count,
+                "mean_us": histogram.total_ns / count / 1e3 if count else 0.0,
+                "p50_us": histogram.percentile(0.5) / 1e3,
+                "p99_us": histogram.percentile(0.99) / 1e3,
+                "max_us": histogram.max_ns / 1e3,
+            }
+        return {
+            "latency": latency,
+            "commits": self.commits,
+            "aborts": dict(self.aborts),
+            "site_reads": dict(sorted(self.site_reads.items())),
+        }
+
+    def format(self) -> str:
+        """
+        Render the statistics as text tables.
+
+        Returns:
+            Latency table followed by the outcome counters and, if any
+            site served a read, the reads served per site
+
+        Side effects:
+            None
+        """
+        snapshot = self.snapshot()
+        columns = ("count", "mean_us", "p50_us", "p99_us", "max_us")
+        latency_rows = [
+            [operation] + [row[column] for column in columns]
+            for operation, row in snapshot["latency"].items()
+        ]
+        outcome_rows = [["commits", snapshot["commits"]]] + [
+            [f"aborts: {reason}", count]
+            for reason, count in snapshot["aborts"].items()
+        ]
+        return (
+            tabulate(
+                latency_rows,
+                headers=["Operation", "Count", "Mean us", "p50 us", "p99 us", "Max us"],
+                floatfmt=".2f",
+            )
+            + "\n\n"
+            + tabulate(outcome_rows, headers=["Outcome", "Count"])
+            + (
+                "\n\n"
+                + tabulate(
+                    list(snapshot["site_reads"].items()),
+                    headers=["Site", "Reads served"],
+                )
+                if snapshot["site_reads"]
+                else ""
+            )
+        )
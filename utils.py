@@ -1,6 +1,34 @@
-from typing import Dict, Set, Optional, List
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Callable, Deque, Dict, Set, Optional, List, Iterable, Iterator, Tuple, TYPE_CHECKING
 from enum import Enum
-from tabulate import tabulate
+from functools import partial
+from checkpoint import load_checkpoint, write_checkpoint
+from commands import MAX_VALUE, MIN_VALUE, Command, parse_command
+from events import (
+    EventSink,
+    WAIT_NO_VERSION,
+    WAIT_NO_WRITE_SITE,
+    WAIT_QUEUED,
+    WAIT_SITE_DOWN,
+)
+from stats import (
+    ABORT_CYCLE,
+    ABORT_DANGEROUS_STRUCTURE,
+    ABORT_FIRST_COMMITTER_WINS,
+    ABORT_OTHER,
+    ABORT_SITE_FAILURE,
+    Stats,
+)
+
+if TYPE_CHECKING:
+    from wal import SiteLog, WriteAheadLog
+
+
+# Largest transaction number the writer array of a version history holds
+MAX_TID = 2**32 - 1
 
 
 class Version:
@@ -11,13 +39,16 @@ class Version:
     it was committed. This supports multiversion concurrency control.
     """
 
-    def __init__(self, value: int, transaction_id: str, commit_time: float):
+    __slots__ = ("value", "transaction_id", "commit_time")
+
+    def __init__(self, value: int, transaction_id: int, commit_time: float):
         """
         Create a new version of a variable.
         
         Args:
             value: The integer value of this version
-            transaction_id: ID of the transaction that created this version
+            transaction_id: Number of the transaction that created this
+                version (0 for the initial version)
             commit_time: Timestamp when this version was committed
         
         Side effects:
@@ -28,62 +59,484 @@ class Version:
         self.commit_time = commit_time
 
 
+class VersionHistory:
+    """
+    Compact, commit-time ordered version history of one variable at one site.
+    
+    Commit times, values and writer transaction numbers are kept in
+    parallel typed arrays so that a snapshot lookup is a binary search over
+    the commit times instead of a linear walk over Version objects. Version
+    objects are only materialized when a caller indexes or iterates the
+    history.
+    
+    Initial histories (Placement.initial_history) are shared by every site
+    and never modified; a site copies one on its first write (see
+    Site.commit_write).
+    """
+
+    def __init__(self):
+        """
+        Create an empty version history.
+        
+        Side effects:
+            - Allocates empty commit time, value, and writer arrays
+        """
+        self.commit_times = array("d")
+        self.values = array("q")
+        self.writers = array("I")
+
+    def copy(self) -> "VersionHistory":
+        """
+        Copy the history into a new one.
+        
+        Returns:
+            A VersionHistory with the same versions
+        
+        Side effects:
+            None
+        """
+        history = VersionHistory()
+        history.commit_times = array("d", self.commit_times)
+        history.values = array("q", self.values)
+        history.writers = array("I", self.writers)
+        return history
+
+    def __len__(self) -> int:
+        return len(self.commit_times)
+
+    def __getitem__(self, index: int) -> Version:
+        return Version(
+            self.values[index], self.writers[index], self.commit_times[index]
+        )
+
+    def __iter__(self) -> Iterator[Version]:
+        for i in range(len(self.commit_times)):
+            yield self[i]
+
+    def append(self, value: int, transaction_id: int, commit_time: float):
+        """
+        Record a new committed version, keeping the history ordered.
+        
+        Commit times come from the monotonic global clock, so the common
+        case is a plain append. An out-of-order commit is inserted after
+        every version with an equal or earlier commit time.
+        
+        Args:
+            value: The committed value
+            transaction_id: Number of the transaction that wrote the value
+            commit_time: Timestamp of the commit
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Adds the version to the commit time, value, and writer arrays,
+              or to none of them if the value or writer does not fit
+        
+        Raises:
+            ValueError: If the value is outside the 64-bit signed range or
+                the writer number is above MAX_TID
+        """
+        if not MIN_VALUE <= value <= MAX_VALUE or not 0 <= transaction_id <= MAX_TID:
+            raise ValueError(f"Version of T{transaction_id} does not fit: {value}")
+        times = self.commit_times
+        if not times or times[-1] <= commit_time:
+            times.append(commit_time)
+            self.values.append(value)
+            self.writers.append(transaction_id)
+            return
+        index = bisect_right(times, commit_time)
+        times.insert(index, commit_time)
+        self.values.insert(index, value)
+        self.writers.insert(index, transaction_id)
+
+    def latest_at(self, time: float) -> int:
+        """
+        Find the newest version committed at or before a timestamp.
+        
+        Args:
+            time: Inclusive upper bound on the commit time
+        
+        Returns:
+            Index of the matching version, or -1 if every version is newer
+        
+        Side effects:
+            None
+        """
+        return bisect_right(self.commit_times, time) - 1
+
+    def latest_before(self, time: float) -> int:
+        """
+        Find the newest version committed strictly before a timestamp.
+        
+        Args:
+            time: Exclusive upper bound on the commit time
+        
+        Returns:
+            Index of the matching version, or -1 if no version is older
+        
+        Side effects:
+            None
+        """
+        return bisect_left(self.commit_times, time) - 1
+
+    def vacuum(self, horizon: float) -> int:
+        """
+        Drop versions that no snapshot at or after horizon can read.
+        
+        The newest version committed at or before horizon is kept, together
+        with every newer version.
+        
+        Args:
+            horizon: Oldest snapshot time that must stay readable
+        
+        Returns:
+            Number of bytes of array storage released
+        
+        Side effects:
+            - Removes the oldest versions from the commit time, value, and
+              writer arrays
+        """
+        keep = self.latest_at(horizon)
+        if keep <= 0:
+            return 0
+        del self.commit_times[:keep]
+        del self.values[:keep]
+        del self.writers[:keep]
+        return keep * (
+            self.commit_times.itemsize + self.values.itemsize + self.writers.itemsize
+        )
+
+
+def replicate_even(var_num: int, site_count: int) -> List[int]:
+    """
+    Standard replication rule: even variables everywhere, odd ones once.
+    
+    Args:
+        var_num: Variable number (i for xi)
+        site_count: Number of sites in the cluster
+    
+    Returns:
+        Every site for an even variable, site 1 + var_num % site_count for
+        an odd one
+    """
+    if var_num % 2 == 0:
+        return list(range(1, site_count + 1))
+    return [1 + var_num % site_count]
+
+
+def replicate_all(var_num: int, site_count: int) -> List[int]:
+    """
+    Replication rule that places every variable at every site.
+    
+    Args:
+        var_num: Variable number (i for xi)
+        site_count: Number of sites in the cluster
+    
+    Returns:
+        Every site
+    """
+    return list(range(1, site_count + 1))
+
+
+def replicate_none(var_num: int, site_count: int) -> List[int]:
+    """
+    Replication rule that places every variable at a single site.
+    
+    Args:
+        var_num: Variable number (i for xi)
+        site_count: Number of sites in the cluster
+    
+    Returns:
+        Site 1 + var_num % site_count
+    """
+    return [1 + var_num % site_count]
+
+
+def replicate_ring(var_num: int, site_count: int, copies: int = 3) -> List[int]:
+    """
+    Replication rule that places each variable at consecutive sites.
+    
+    Args:
+        var_num: Variable number (i for xi)
+        site_count: Number of sites in the cluster
+        copies: Number of copies of each variable
+    
+    Returns:
+        Sites 1 + (var_num + k) % site_count for k < copies
+    """
+    return sorted({1 + (var_num + k) % site_count for k in range(copies)})
+
+
+REPLICATION_RULES: Dict[str, Callable[[int, int], List[int]]] = {
+    "even": replicate_even,
+    "all": replicate_all,
+    "none": replicate_none,
+    "ring-3": replicate_ring,
+}
+
+
+class Placement:
+    """
+    Cluster configuration: the sites, the variables, and where each lives.
+    
+    Sites are numbered 1..sites and variables x1..x<variables>. A
+    replication rule maps each variable number to the sites holding it, and
+    the result is precomputed once into tables indexed by variable number;
+    equal site lists are stored once. A variable held by more than one site
+    is replicated: a snapshot read only uses a replica that did not fail
+    between the version's commit and the reader's start (see
+    Site.get_committed_version_at).
+    
+    Every variable xi starts with value 10*i, written by T0 at time 0. Its
+    initial version history is built on first use and shared, read-only, by
+    every site that holds it.
+    """
+
+    def __init__(
+        self,
+        sites: int = 10,
+        variables: int = 20,
+        rule: Callable[[int, int], List[int]] = replicate_even,
+    ):
+        """
+        Precompute the placement of every variable.
+        
+        Args:
+            sites: Number of sites
+            variables: Number of variables
+            rule: Replication rule, called as rule(var_num, sites); one of
+                REPLICATION_RULES or any function with that signature
+        
+        Side effects:
+            - Builds the placement tables
+        
+        Raises:
+            ValueError: If there are no sites or variables, or the rule
+                places a variable nowhere or at a site that does not exist
+        """
+        if sites < 1 or variables < 1:
+            raise ValueError("A cluster needs at least one site and one variable")
+        self.site_count = sites
+        self.variable_count = variables
+        # Per variable number (index 0 is unused): holding sites in
+        # ascending order, the same in descending order (the read routing
+        # preference), a bitmask of the holding sites, and whether the
+        # variable is replicated
+        self.sites_of: List[Tuple[int, ...]] = [()]
+        self.read_order: List[Tuple[int, ...]] = [()]
+        self.site_masks: List[int] = [0]
+        self.replicated = bytearray(variables + 1)
+        shared: Dict[Tuple[int, ...], Tuple[Tuple[int, ...], Tuple[int, ...], int]] = {}
+        for var_num in range(1, variables + 1):
+            site_ids = tuple(sorted(set(rule(var_num, sites))))
+            entry = shared.get(site_ids)
+            if entry is None:
+                if not site_ids or site_ids[0] < 1 or site_ids[-1] > sites:
+                    raise ValueError(
+                        f"Replication rule placed x{var_num} at sites {list(site_ids)}"
+                    )
+                mask = 0
+                for site_id in site_ids:
+                    mask |= 1 << site_id
+                entry = shared[site_ids] = (site_ids, site_ids[::-1], mask)
+            self.sites_of.append(entry[0])
+            self.read_order.append(entry[1])
+            self.site_masks.append(entry[2])
+            self.replicated[var_num] = len(site_ids) > 1
+        self._initial: List[Optional[VersionHistory]] = [None] * (variables + 1)
+        self._hosted: Dict[int, List[int]] = {}
+        self._hosted_masks: Dict[int, int] = {}
+
+    def has_variable(self, var: int) -> bool:
+        """
+        Check whether a variable exists in this cluster.
+        
+        Args:
+            var: Variable number (i for xi)
+        
+        Returns:
+            True if var is one of 1..variables
+        """
+        return 0 < var <= self.variable_count
+
+    def hosts(self, site_id: int, var_num: int) -> bool:
+        """
+        Check whether a site holds a variable.
+        
+        Args:
+            site_id: Site ID
+            var_num: Variable number
+        
+        Returns:
+            True if the site holds a copy of the variable
+        """
+        return bool(self.site_masks[var_num] >> site_id & 1)
+
+    def hosted(self, site_id: int) -> List[int]:
+        """
+        List the variables a site holds.
+        
+        Args:
+            site_id: Site ID
+        
+        Returns:
+            Variable numbers in ascending order
+        
+        Side effects:
+            - Caches the list per site
+        """
+        hosted = self._hosted.get(site_id)
+        if hosted is None:
+            masks = self.site_masks
+            hosted = self._hosted[site_id] = [
+                var_num
+                for var_num in range(1, self.variable_count + 1)
+                if masks[var_num] >> site_id & 1
+            ]
+        return hosted
+
+    def hosted_mask(self, site_id: int) -> int:
+        """
+        Bitmask of the variables a site holds.
+        
+        Args:
+            site_id: Site ID
+        
+        Returns:
+            An int with bit i set for every xi the site holds
+        
+        Side effects:
+            - Caches the mask per site
+        """
+        mask = self._hosted_masks.get(site_id)
+        if mask is None:
+            # Set the bits in a byte buffer: or-ing them into an int one at
+            # a time would copy the growing int for every variable
+            bits = bytearray(self.variable_count // 8 + 1)
+            for var_num in self.hosted(site_id):
+                bits[var_num >> 3] |= 1 << (var_num & 7)
+            mask = self._hosted_masks[site_id] = int.from_bytes(bits, "little")
+        return mask
+
+    def initial_value(self, var_num: int) -> int:
+        """
+        Initial value of a variable.
+        
+        Args:
+            var_num: Variable number
+        
+        Returns:
+            10 * var_num
+        """
+        return 10 * var_num
+
+    def initial_history(self, var_num: int) -> "VersionHistory":
+        """
+        Shared initial version history of a variable.
+        
+        The history must not be modified; copy it first.
+        
+        Args:
+            var_num: Variable number
+        
+        Returns:
+            A history holding the initial version, written by T0 at time 0
+        
+        Side effects:
+            - Builds and caches the history on first use
+        """
+        history = self._initial[var_num]
+        if history is None:
+            history = self._initial[var_num] = VersionHistory()
+            history.append(self.initial_value(var_num), 0, 0)
+        return history
+
+
+# Placement used when none is given: 10 sites, x1..x20, replicate_even
+DEFAULT_PLACEMENT = Placement()
+
+
 class Site:
     """
     Represents a database site in a distributed replicated database system.
     
     Each site stores variables and their version histories, tracks its
     operational status (up/down), and manages recovery after failures.
-    Sites store:
+    Which variables a site stores is given by its Placement; by default:
     - Even-numbered variables (x2, x4, ..., x20): replicated across all sites
     - Odd-numbered variables (x1, x3, ..., x19): one per site based on var_num % 10
+    
+    A site only keeps the histories and values of the variables written
+    there. Every other variable it hosts still has its initial state, read
+    from the placement's shared initial histories, and a history is copied
+    on its first write.
+    
+    Variables are identified by number (2 for x2) and writers by
+    transaction number (3 for T3); names are only formed for output.
     """
 
-    def __init__(self, site_id: int):
+    def __init__(self, site_id: int, placement: Optional[Placement] = None):
         """
-        Initialize a database site with all variables and version histories.
+        Initialize a database site with all variables in their initial state.
         
         Args:
-            site_id: Unique identifier for this site (1-10)
+            site_id: Unique identifier for this site (1..placement.site_count)
+            placement: Cluster configuration (default: DEFAULT_PLACEMENT)
         
         Side effects:
             - Sets site_id and initial operational status (up)
-            - Initializes empty data structures for variables and versions
-            - Calls _initialize_variables() to populate initial variable state
+            - Calls _initialize_variables() to start every hosted variable
+              from its initial state
             - Sets last_fail_time and last_recover_time to -1.0
+            - Starts without a write-ahead log
         """
         self.site_id = site_id
+        self.placement = placement or DEFAULT_PLACEMENT
         self.is_up = True
-        self.variables = {}
-        self.version_history: Dict[str, List[Version]] = {}
-        self.readable_after_recovery: Dict[str, bool] = {}
+        # Write-ahead log that commit_write appends to, if durability is on
+        self.log: Optional["SiteLog"] = None
         self.last_fail_time = -1.0
         self.last_recover_time = -1.0
         self._initialize_variables()
 
     def _initialize_variables(self):
         """
-        Initialize all variables at this site with their initial values.
+        Put every variable this site hosts back into its initial state.
         
-        Creates variables x1 through x20, each with initial value 10*i.
-        Sets up version history with initial version from transaction T0 at time 0.
-        All variables are initially marked as readable.
+        Each hosted variable xi starts at 10*i, with the shared initial
+        history holding one version from transaction T0 at time 0.
         
         Returns:
             None
         
         Side effects:
-            - Populates self.variables with initial values
-            - Creates initial version history for each variable
-            - Marks all variables as readable in self.readable_after_recovery
+            - Empties self.variables, the current values of the variables
+              written or restored at this site
+            - Empties self.version_history, the histories of the variables
+              written at this site
+        """
+        self.variables: Dict[int, int] = {}
+        self.version_history: Dict[int, VersionHistory] = {}
+
+    def history(self, var: int) -> Optional[VersionHistory]:
+        """
+        Version history of a variable at this site.
+        
+        Args:
+            var: Variable number
+        
+        Returns:
+            The site's history of var, the shared initial history if var was
+            never written here, or None if the site does not hold var
+        
+        Side effects:
+            None
         """
-        for i in range(1, 21):
-            var = f"x{i}"
-            initial_value = 10 * i
-            self.variables[var] = initial_value
-            init_version = Version(initial_value, "T0", 0)
-            self.version_history[var] = [init_version]
-            self.readable_after_recovery[var] = True
+        history = self.version_history.get(var)
+        if history is None and self.placement.hosts(self.site_id, var):
+            history = self.placement.initial_history(var)
+        return history
 
     def fail(self, global_time: float):
         """
@@ -106,9 +559,11 @@ class Site:
         """
         Recover this site from a failed state.
         
-        After recovery, replicated variables (even-numbered) become temporarily
-        unreadable until a new write is committed. This prevents reading stale
-        data that may have been updated on other sites during the failure.
+        Recovery does not block reads. A snapshot read of a replicated
+        variable only uses this site if it did not fail between the
+        version's commit and the reader's start (see
+        get_committed_version_at), so it never serves what it missed while
+        down.
         
         Args:
             global_time: Timestamp when the site recovers
@@ -119,35 +574,27 @@ class Site:
         Side effects:
             - Sets self.is_up to True
             - Records recovery time in self.last_recover_time
-            - Marks all replicated variables (x2, x4, ..., x20) as unreadable
-            - Restores variable values to last committed version before failure
+            - Restores replicated variable values to the last committed
+              version before failure
         """
         self.is_up = True
         self.last_recover_time = global_time
 
-        # Only replicated variables need special handling
-        for i in range(2, 21, 2):
-            var = f"x{i}"
-            if var in self.version_history:
-                # Mark as unreadable until a new write is committed
-                self.readable_after_recovery[var] = False
-
-                # Keep the last committed value but don't allow reads until new write
-                if self.last_fail_time > -1:
-                    last_commit = next(
-                        (
-                            v
-                            for v in reversed(self.version_history[var])
-                            if v.commit_time < self.last_fail_time
-                        ),
-                        None,
-                    )
-                    if last_commit:
-                        self.variables[var] = last_commit.value
-
-    def get_committed_version_at(self, var: str, start_time: float) -> Optional[int]:
+        # Only replicated variables written here can differ from their
+        # last committed value before the failure
+        if self.last_fail_time > -1:
+            replicated = self.placement.replicated
+            for var, history in self.version_history.items():
+                if replicated[var]:
+                    index = history.latest_before(self.last_fail_time)
+                    if index >= 0:
+                        self.variables[var] = history.values[index]
+
+    def get_committed_version_at(
+        self, var: int, start_time: float
+    ) -> Optional[Version]:
         """
-        Get the committed value of a variable as of a specific timestamp.
+        Get the committed version of a variable as of a specific timestamp.
         
         This method supports multiversion concurrency control by retrieving the
         appropriate version for a read-only transaction that started at start_time.
@@ -155,11 +602,12 @@ class Site:
         the commit and the transaction start to avoid reading stale data.
         
         Args:
-            var: Variable name (e.g., "x1", "x2")
+            var: Variable number
             start_time: Timestamp of the transaction's start
         
         Returns:
-            The integer value of the variable at start_time, or None if:
+            The Version visible at start_time (value, writer, and commit
+            time), or None if:
             - The site is down
             - The variable doesn't exist at this site
             - The site failed between the last commit and start_time (for replicated vars)
@@ -168,23 +616,22 @@ class Site:
         Side effects:
             None
         """
-        if not self.is_up or var not in self.version_history:
+        if not self.is_up:
             return None
 
-        var_num = int(var[1:])
-        versions = self.version_history[var]
-
-        # For replicated variables (even numbered)
-        if var_num % 2 == 0:
-            # For read-only transactions, we need the last committed value before start_time
-            last_commit_before_start = next(
-                (v for v in reversed(versions) if v.commit_time <= start_time), None
-            )
+        versions = self.version_history.get(var)
+        if versions is None:
+            if not self.placement.hosts(self.site_id, var):
+                return None
+            versions = self.placement.initial_history(var)
+        index = versions.latest_at(start_time)
 
+        # For replicated variables
+        if self.placement.replicated[var]:
             # Site must have been up continuously from last commit to transaction start
-            if not last_commit_before_start:
+            if index < 0:
                 return (
-                    versions[0].value
+                    versions[0]
                     if (
                         self.last_fail_time < 0
                         or (
@@ -197,54 +644,52 @@ class Site:
 
             # Check if site failed between commit and transaction start
             if (
-                self.last_fail_time > last_commit_before_start.commit_time
+                self.last_fail_time > versions.commit_times[index]
                 and self.last_fail_time < start_time
             ):
                 return None
 
-            return last_commit_before_start.value
+            return versions[index]
 
-        # For non-replicated variables (odd numbered)
-        return next(
-            (v.value for v in reversed(versions) if v.commit_time <= start_time),
-            versions[0].value,
-        )
+        # For non-replicated variables
+        return versions[max(index, 0)]
 
-    def commit_write(self, var: str, value: int, tid: str, commit_time: float):
+    def commit_write(self, var: int, value: int, tid: int, commit_time: float):
         """
         Commit a write operation by adding a new version to the variable's history.
         
         Args:
-            var: Variable name to write to
+            var: Number of the variable to write to
             value: New value to commit
-            tid: Transaction ID performing the write
+            tid: Number of the transaction performing the write
             commit_time: Timestamp of the commit
         
         Returns:
             None
         
         Side effects:
-            - Adds new Version to self.version_history[var]
-            - Sorts version history by commit time
+            - On the variable's first write here, copies its initial history
+              into self.version_history
+            - Adds new Version to self.version_history[var] in commit time order
             - Updates self.variables[var] to the new value
-            - For replicated variables, marks as readable after recovery
+            - Appends the write to the site's write-ahead log, if it has one
         """
-        versions = self.version_history[var]
-        versions.append(Version(value, tid, commit_time))
-        versions.sort(key=lambda x: x.commit_time)
+        if self.log is not None:
+            self.log.append(var, value)
+        history = self.version_history.get(var)
+        if history is None:
+            history = self.version_history[var] = self.placement.initial_history(
+                var
+            ).copy()
+        history.append(value, tid, commit_time)
         self.variables[var] = value
 
-        var_num = int(var[1:])
-        if var_num % 2 == 0:
-            self.readable_after_recovery[var] = True
-
     def dump(self) -> List[str]:
         """
         Generate a snapshot of current variable states at this site.
         
         Returns a formatted list of variable-value pairs for all variables
-        stored at this site. Even variables are stored at all sites, while
-        odd variables are stored at site (var_num % 10) + 1.
+        stored at this site, as given by its placement.
         
         Returns:
             List of strings in format "x1: 10", "x2: 20", etc., sorted by
@@ -253,24 +698,42 @@ class Site:
         Side effects:
             None
         """
-        # Return current site variable states
         if not self.is_up:
             return []
+        variables = self.variables
+        initial_value = self.placement.initial_value
         result = []
-        # even vars
-        for i in range(2, 21, 2):
-            var = f"x{i}"
-            if var in self.variables:
-                result.append(f"{var}: {self.variables[var]}")
-        # odd vars
-        for i in range(1, 21, 2):
-            correct_site = 1 + (i % 10)
-            if self.site_id == correct_site:
-                var = f"x{i}"
-                if var in self.variables:
-                    result.append(f"{var}: {self.variables[var]}")
-
-        return sorted(result, key=lambda x: int(x.split(":")[0][1:]))
+        for var in self.placement.hosted(self.site_id):
+            result.append(f"x{var}: {variables.get(var, initial_value(var))}")
+        return result
+
+    def vacuum(self, horizon: float, var: Optional[int] = None) -> int:
+        """
+        Discard versions that no current or future snapshot can read.
+        
+        Keeps, per variable, the newest version committed at or before
+        horizon and everything newer. While the site is down the horizon is
+        capped at the failure time, so the version Site.recover restores
+        is always retained.
+        
+        Args:
+            horizon: Oldest start_time of any active transaction
+            var: Number of the variable to vacuum, or None to vacuum every
+                variable
+        
+        Returns:
+            Number of bytes of version storage reclaimed at this site
+        
+        Side effects:
+            - Removes old versions from self.version_history
+        """
+        if not self.is_up:
+            horizon = min(horizon, self.last_fail_time)
+        if var is not None:
+            return self.version_history[var].vacuum(horizon)
+        return sum(
+            history.vacuum(horizon) for history in self.version_history.values()
+        )
 
     def reset(self):
         """
@@ -281,14 +744,9 @@ class Site:
         
         Side effects:
             - Sets is_up to True
-            - Clears all variables and version history
-            - Clears readable_after_recovery tracking
             - Calls _initialize_variables() to restore initial state
         """
         self.is_up = True
-        self.variables = {}
-        self.version_history = {}
-        self.readable_after_recovery = {}
         self._initialize_variables()
 
 
@@ -324,311 +782,2344 @@ class Transaction:
     optimistic concurrency control with first-committer-wins semantics.
     """
 
-    def __init__(self, tid: str, transaction_type: TransactionType, start_time: float):
+    def __init__(self, tid: int, transaction_type: TransactionType, start_time: float):
         """
         Create a new transaction.
         
         Args:
-            tid: Unique transaction identifier (e.g., "T1", "T2")
+            tid: Unique transaction number (1 for T1)
             transaction_type: READ_WRITE or READ_ONLY transaction type
             start_time: Global timestamp when transaction began
         
         Side effects:
             - Initializes transaction with ACTIVE status
-            - Creates empty write cache, read set, and write set
+            - Creates empty write cache, read set, and write set, and empty
+              read and write bitmasks
             - Sets should_abort flag to False
+            - Clears the rw-conflict flags used by the SSI engine
             - Initializes empty dependency set for serialization graph
+            - Initializes empty set of sites its writes were sent to
+            - Initializes an empty queue of blocked operations
         """
         self.tid = tid
         self.type = transaction_type
         self.status = TransactionStatus.ACTIVE
-        self.write_cache: Dict[str, int] = {}
-        self.read_set: Dict[str, float] = {}
-        self.write_set: Set[str] = set()
+        # Keyed by variable number
+        self.write_cache: Dict[int, int] = {}
+        self.read_set: Dict[int, float] = {}
+        self.write_set: Set[int] = set()
+        # The read and write sets as bitmasks (bit i for xi); only kept up
+        # by BitsetConflicts
+        self.read_mask = 0
+        self.write_mask = 0
         self.start_time = start_time
+        self.commit_time: Optional[float] = None
         self.should_abort = False
-        self.dependencies: Set[str] = set()
-
-
-class TransactionManager:
+        # Whether a concurrent transaction has an rw-antidependency on this
+        # one (in_conflict) or this one on a concurrent transaction
+        # (out_conflict), and whether this one must abort because a
+        # committed transaction became the pivot of both; only kept up by
+        # the SSI engine
+        self.in_conflict = False
+        self.out_conflict = False
+        self.dangerous = False
+        self.dependencies: Set[int] = set()
+        self.sites_written: Set[int] = set()
+        self.pending: Deque[tuple] = deque()
+        self.waiting_on: Optional[tuple] = None
+
+
+class SerializationGraph:
     """
-    Manages distributed transactions across multiple replicated database sites.
+    Serialization graph with online, incremental cycle detection.
     
-    Implements optimistic concurrency control with:
-    - Multiversion concurrency control for read-only transactions
-    - First-committer-wins conflict resolution
-    - Serialization graph testing for serializability
-    - Site failure and recovery handling
-    - Available copies replication protocol
+    The graph is kept acyclic at all times: every node carries a position in
+    a topological order, and an edge that would close a cycle is refused
+    instead of inserted. Following Pearce and Kelly, inserting an edge only
+    searches the nodes whose positions lie between its endpoints, and
+    reorders just that region when the edge runs against the current order.
+    Both searches are iterative, so long dependency chains cannot hit the
+    recursion limit.
     """
 
-    def __init__(self):
+    def __init__(self):
+        """
+        Create an empty serialization graph.
+        
+        Side effects:
+            - Initializes empty successor, predecessor, and order maps
+        """
+        self.successors: Dict[int, Set[int]] = {}
+        self.predecessors: Dict[int, Set[int]] = {}
+        self.order: Dict[int, int] = {}
+        self._next_position = 0
+
+    def __contains__(self, node: int) -> bool:
+        return node in self.successors
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.successors)
+
+    def __len__(self) -> int:
+        return len(self.successors)
+
+    def get(self, node: int, default=None):
+        return self.successors.get(node, default)
+
+    def add_node(self, node: int):
+        """
+        Add a node at the end of the topological order if it is new.
+        
+        Args:
+            node: Transaction number to add
+        
+        Returns:
+            None
+        
+        Side effects:
+            - May add node to the successor, predecessor, and order maps
+        """
+        if node not in self.successors:
+            self.successors[node] = set()
+            self.predecessors[node] = set()
+            self.order[node] = self._next_position
+            self._next_position += 1
+
+    def add_edge(self, source: int, target: int) -> bool:
+        """
+        Insert a dependency edge unless it would create a cycle.
+        
+        Args:
+            source: Transaction that must serialize first
+            target: Transaction that must serialize after source
+        
+        Returns:
+            True if the edge is in the graph afterwards, False if it was
+            refused because target already reaches source
+        
+        Side effects:
+            - Adds missing nodes and the edge to the graph
+            - May reorder nodes between the positions of target and source
+        """
+        if source == target:
+            return True
+        self.add_node(source)
+        self.add_node(target)
+        if target in self.successors[source]:
+            return True
+
+        upper = self.order[source]
+        lower = self.order[target]
+        if lower < upper:
+            forward = self._search_forward(target, upper)
+            if forward is None:
+                return False
+            backward = self._search_backward(source, lower)
+            self._reorder(backward, forward)
+
+        self.successors[source].add(target)
+        self.predecessors[target].add(source)
+        return True
+
+    def _search_forward(self, start: int, upper: int) -> Optional[List[int]]:
+        """
+        Collect nodes reachable from start that sit before position upper.
+        
+        Args:
+            start: Node to search from (the target of the new edge)
+            upper: Position of the source of the new edge
+        
+        Returns:
+            The visited nodes, or None if the node at position upper is
+            reachable, meaning the new edge would close a cycle
+        
+        Side effects:
+            None
+        """
+        visited = {start}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for succ in self.successors[node]:
+                position = self.order[succ]
+                if position == upper:
+                    return None
+                if position < upper and succ not in visited:
+                    visited.add(succ)
+                    stack.append(succ)
+        return list(visited)
+
+    def _search_backward(self, start: int, lower: int) -> List[int]:
+        """
+        Collect nodes that reach start and sit after position lower.
+        
+        Args:
+            start: Node to search from (the source of the new edge)
+            lower: Position of the target of the new edge
+        
+        Returns:
+            The visited nodes
+        
+        Side effects:
+            None
+        """
+        visited = {start}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for pred in self.predecessors[node]:
+                if self.order[pred] > lower and pred not in visited:
+                    visited.add(pred)
+                    stack.append(pred)
+        return list(visited)
+
+    def _reorder(self, backward: List[int], forward: List[int]):
+        """
+        Move the backward region ahead of the forward region.
+        
+        Both regions keep their internal relative order and reuse the
+        positions they already occupied, so the rest of the order is untouched.
+        
+        Args:
+            backward: Nodes that reach the source of the new edge
+            forward: Nodes reachable from the target of the new edge
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Reassigns positions in self.order for the affected nodes
+        """
+        order = self.order
+        backward.sort(key=order.__getitem__)
+        forward.sort(key=order.__getitem__)
+        nodes = backward + forward
+        positions = sorted(order[node] for node in nodes)
+        for node, position in zip(nodes, positions):
+            order[node] = position
+
+    def remove_node(self, node: int):
+        """
+        Remove a node and all of its edges.
+        
+        Args:
+            node: Transaction number to remove
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Deletes the node from the successor, predecessor, and order maps
+            - Deletes every edge into or out of the node
+        """
+        if node not in self.successors:
+            return
+        for succ in self.successors.pop(node):
+            self.predecessors[succ].discard(node)
+        for pred in self.predecessors.pop(node):
+            self.successors[pred].discard(node)
+        del self.order[node]
+
+    def clear(self):
+        """
+        Remove every node and edge.
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Empties the successor, predecessor, and order maps
+        """
+        self.successors.clear()
+        self.predecessors.clear()
+        self.order.clear()
+        self._next_position = 0
+
+
+class WriterIndex:
+    """
+    Committed writers of each variable, ordered by commit time.
+    
+    Answers "has anyone committed x after time t" and "who committed x
+    before time t" with a binary search instead of a scan over every
+    transaction. Commit times come from the monotonic global clock, so
+    entries are normally appended. Entries are kept in lists indexed by
+    variable number; a variable nobody has committed holds None.
+    """
+
+    def __init__(self, variables: int = 20):
+        """
+        Create an empty writer index.
+        
+        Args:
+            variables: Number of variables (x1..x<variables>) to index
+        
+        Side effects:
+            - Initializes the per-variable commit time and writer lists
+        """
+        self.commit_times: List[Optional[List[float]]] = [None] * (variables + 1)
+        self.writers: List[Optional[List[int]]] = [None] * (variables + 1)
+
+    def add(self, var: int, commit_time: float, tid: int):
+        """
+        Record that a transaction committed a write to a variable.
+        
+        Args:
+            var: Number of the variable that was written
+            commit_time: Commit time of the writing transaction
+            tid: Number of the writing transaction
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Inserts the writer into the variable's lists in commit time order
+        """
+        times = self.commit_times[var]
+        if times is None:
+            self.commit_times[var] = [commit_time]
+            self.writers[var] = [tid]
+            return
+        writers = self.writers[var]
+        if times[-1] <= commit_time:
+            times.append(commit_time)
+            writers.append(tid)
+        else:
+            index = bisect_right(times, commit_time)
+            times.insert(index, commit_time)
+            writers.insert(index, tid)
+
+    def discard(self, var: int, commit_time: float, tid: int):
+        """
+        Remove a writer from a variable's index.
+        
+        Args:
+            var: Number of the variable that was written
+            commit_time: Commit time of the writing transaction
+            tid: Number of the writing transaction
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Deletes the matching entry, and the variable's lists once
+              they are empty
+        """
+        times = self.commit_times[var]
+        if not times:
+            return
+        writers = self.writers[var]
+        index = bisect_left(times, commit_time)
+        while index < len(times) and times[index] == commit_time:
+            if writers[index] == tid:
+                del times[index]
+                del writers[index]
+                break
+            index += 1
+        if not times:
+            self.commit_times[var] = None
+            self.writers[var] = None
+
+    def committed_after(self, var: int, time: float) -> bool:
+        """
+        Check whether any writer of a variable committed after a timestamp.
+        
+        Args:
+            var: Number of the variable to check
+            time: Exclusive lower bound on the commit time
+        
+        Returns:
+            True if some indexed writer committed var after time
+        
+        Side effects:
+            None
+        """
+        times = self.commit_times[var]
+        return bool(times) and times[-1] > time
+
+    def writers_before(self, var: int, time: float) -> List[int]:
+        """
+        List the writers of a variable that committed before a timestamp.
+        
+        Args:
+            var: Number of the variable to look up
+            time: Exclusive upper bound on the commit time
+        
+        Returns:
+            Writer transaction numbers in commit time order
+        
+        Side effects:
+            None
+        """
+        times = self.commit_times[var]
+        if not times:
+            return []
+        return self.writers[var][: bisect_left(times, time)]
+
+    def writers_after(self, var: int, time: float) -> List[int]:
+        """
+        List the writers of a variable that committed after a timestamp.
+        
+        Args:
+            var: Number of the variable to look up
+            time: Exclusive lower bound on the commit time
+        
+        Returns:
+            Writer transaction numbers in commit time order
+        
+        Side effects:
+            None
+        """
+        times = self.commit_times[var]
+        if not times:
+            return []
+        return self.writers[var][bisect_right(times, time) :]
+
+    def clear(self):
+        """
+        Remove every entry.
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Resets every variable's commit time and writer lists to None
+        """
+        count = len(self.commit_times)
+        self.commit_times = [None] * count
+        self.writers = [None] * count
+
+
+class ConflictIndex(ABC):
+    """
+    Finds the transactions a committing transaction conflicts with.
+    
+    The transaction manager reports every read, write, commit, abort and
+    retirement, and asks at commit time for the first-committer-wins
+    verdict and for the transactions it has rw and ww dependencies with.
+    Implementations differ only in how the read and write sets are
+    represented; see CONFLICT_INDEXES. Every method is abstract, so a
+    subclass that misses one cannot be instantiated.
+    """
+
+    @abstractmethod
+    def add_read(self, transaction: Transaction, var: int):
+        """
+        Record that a transaction read a variable.
+        
+        Args:
+            transaction: Transaction that read
+            var: Number of the variable read
+        
+        Returns:
+            None
+        """
+
+    @abstractmethod
+    def add_write(self, transaction: Transaction, var: int, site_ids: List[int]):
+        """
+        Record that a transaction sent a write to some sites.
+        
+        Args:
+            transaction: Transaction that wrote
+            var: Number of the variable written
+            site_ids: Sites the write will be applied to at commit
+        
+        Returns:
+            None
+        """
+
+    @abstractmethod
+    def commit(self, transaction: Transaction):
+        """
+        Record that a transaction committed.
+        
+        Called before transaction.sites_written is cleared.
+        
+        Args:
+            transaction: Transaction that committed, with its commit time set
+        
+        Returns:
+            None
+        """
+
+    @abstractmethod
+    def abort(self, transaction: Transaction):
+        """
+        Forget an aborted transaction's reads and writes.
+        
+        Called before transaction.sites_written is cleared.
+        
+        Args:
+            transaction: Transaction that aborted
+        
+        Returns:
+            None
+        """
+
+    @abstractmethod
+    def retire(self, transaction: Transaction):
+        """
+        Forget a retired committed transaction's reads and writes.
+        
+        Args:
+            transaction: Transaction being retired
+        
+        Returns:
+            None
+        """
+
+    @abstractmethod
+    def first_committer_conflict(self, transaction: Transaction) -> bool:
+        """
+        Check whether a variable the transaction wrote was committed by
+        another transaction after it started.
+        
+        Args:
+            transaction: Transaction about to commit
+        
+        Returns:
+            True if first-committer-wins forbids the commit
+        """
+
+    @abstractmethod
+    def overwriters(self, transaction: Transaction) -> Iterable[int]:
+        """
+        List the committed transactions that overwrote a version the
+        transaction read (its outgoing rw dependencies).
+        
+        Args:
+            transaction: Transaction about to commit
+        
+        Returns:
+            Transaction numbers, possibly repeated
+        """
+
+    @abstractmethod
+    def readers_of_writes(self, transaction: Transaction) -> Iterable[int]:
+        """
+        List the live transactions that read a variable the transaction
+        wrote (its incoming rw dependencies).
+        
+        Args:
+            transaction: Transaction about to commit
+        
+        Returns:
+            Transaction numbers, possibly repeated and possibly including
+            the transaction itself
+        """
+
+    @abstractmethod
+    def earlier_writers(self, transaction: Transaction) -> Iterable[int]:
+        """
+        List the committed transactions that wrote a variable the
+        transaction wrote and committed before it started (its incoming
+        ww dependencies).
+        
+        Args:
+            transaction: Transaction about to commit
+        
+        Returns:
+            Transaction numbers, possibly repeated
+        """
+
+    @abstractmethod
+    def writers_after(self, var: int, time: float) -> Iterable[int]:
+        """
+        List the unretired committed writers of a variable that committed
+        after a timestamp.
+        
+        Args:
+            var: Number of the variable to look up
+            time: Exclusive lower bound on the commit time
+        
+        Returns:
+            Transaction numbers
+        """
+
+    @abstractmethod
+    def readers_of(self, var: int) -> Iterable[int]:
+        """
+        List the live transactions that read a variable.
+        
+        Args:
+            var: Number of the variable to look up
+        
+        Returns:
+            Transaction numbers, active and committed alike
+        """
+
+    @abstractmethod
+    def take_site_writers(self, site_id: int) -> List[int]:
+        """
+        List the active transactions that sent a write to a site, and stop
+        tracking those writes for the site.
+        
+        Args:
+            site_id: Site that failed
+        
+        Returns:
+            Transaction numbers
+        """
+
+    @abstractmethod
+    def clear(self):
+        """
+        Forget every transaction.
+        
+        Returns:
+            None
+        """
+
+
+class IndexedConflicts(ConflictIndex):
+    """
+    Conflict index over per-variable and per-site indexes.
+    
+    Keeps the committed writers of each variable (a WriterIndex), the live
+    readers of each variable, and the active writers to each site. Each
+    question is answered by looking up the variables in the transaction's
+    own read or write set, so the cost grows with the size of that set and
+    not with the number of concurrent transactions.
+    """
+
+    def __init__(self, manager: "TransactionManager"):
+        """
+        Create empty indexes sized for a manager's placement.
+        
+        Args:
+            manager: Transaction manager the index serves
+        
+        Side effects:
+            - Initializes the committed writer, reader and site writer indexes
+        """
+        placement = manager.placement
+        self.committed_writers = WriterIndex(placement.variable_count)
+        # Non-aborted, unretired readers of each variable, in read order,
+        # indexed by variable number (None if it has none)
+        self.readers: List[Optional[Dict[int, None]]] = [None] * (
+            placement.variable_count + 1
+        )
+        # Active transactions that sent a write to each site, in write order,
+        # indexed by site ID (index 0 is unused)
+        self.site_writers: List[Dict[int, None]] = [
+            {} for _ in range(placement.site_count + 1)
+        ]
+
+    def add_read(self, transaction: Transaction, var: int):
+        """
+        Record a read in the variable's reader index.
+        
+        Args:
+            transaction: Transaction that read
+            var: Number of the variable read
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Adds the transaction to self.readers[var]
+        """
+        readers = self.readers[var]
+        if readers is None:
+            readers = self.readers[var] = {}
+        readers[transaction.tid] = None
+
+    def add_write(self, transaction: Transaction, var: int, site_ids: List[int]):
+        """
+        Record the sites a write was sent to.
+        
+        Args:
+            transaction: Transaction that wrote
+            var: Number of the variable written
+            site_ids: Sites the write will be applied to at commit
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Adds the transaction to the site writer index of each site
+        """
+        site_writers = self.site_writers
+        tid = transaction.tid
+        for site_id in site_ids:
+            site_writers[site_id][tid] = None
+
+    def _forget_sites(self, transaction: Transaction):
+        """
+        Remove a transaction from the site writer index.
+        
+        Args:
+            transaction: Transaction whose sites_written to forget
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Removes it from self.site_writers of every site it wrote to
+        """
+        for site_id in transaction.sites_written:
+            self.site_writers[site_id].pop(transaction.tid, None)
+
+    def _forget_reads(self, transaction: Transaction):
+        """
+        Remove a transaction from the reader index.
+        
+        Args:
+            transaction: Transaction whose read_set to forget
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Removes it from self.readers of every variable it read, and drops
+              the variables left without readers
+        """
+        for var in transaction.read_set:
+            readers = self.readers[var]
+            if readers is not None:
+                readers.pop(transaction.tid, None)
+                if not readers:
+                    self.readers[var] = None
+
+    def commit(self, transaction: Transaction):
+        """
+        Move a committed transaction's writes to the committed writer index.
+        
+        Args:
+            transaction: Transaction that committed, with its commit time set
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Removes it from the site writer index
+            - Adds its writes to self.committed_writers
+        """
+        self._forget_sites(transaction)
+        for var in transaction.write_set:
+            self.committed_writers.add(var, transaction.commit_time, transaction.tid)
+
+    def abort(self, transaction: Transaction):
+        """
+        Forget an aborted transaction's reads and writes.
+        
+        Args:
+            transaction: Transaction that aborted
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Removes it from the site writer and reader indexes
+        """
+        self._forget_sites(transaction)
+        self._forget_reads(transaction)
+
+    def retire(self, transaction: Transaction):
+        """
+        Forget a retired committed transaction's reads and writes.
+        
+        Args:
+            transaction: Transaction being retired
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Removes its writes from self.committed_writers
+            - Removes it from the reader index
+        """
+        for var in transaction.write_set:
+            self.committed_writers.discard(
+                var, transaction.commit_time, transaction.tid
+            )
+        self._forget_reads(transaction)
+
+    def first_committer_conflict(self, transaction: Transaction) -> bool:
+        """
+        Check each written variable for a commit after the transaction started.
+        
+        Args:
+            transaction: Transaction about to commit
+        
+        Returns:
+            True if first-committer-wins forbids the commit
+        
+        Side effects:
+            None
+        """
+        committed_after = self.committed_writers.committed_after
+        start_time = transaction.start_time
+        return any(committed_after(var, start_time) for var in transaction.write_set)
+
+    def overwriters(self, transaction: Transaction) -> Iterable[int]:
+        """
+        List the committed writers of each variable read after the version read.
+        
+        Args:
+            transaction: Transaction about to commit
+        
+        Returns:
+            Transaction numbers, possibly repeated
+        
+        Side effects:
+            None
+        """
+        writers_after = self.committed_writers.writers_after
+        for var, read_time in transaction.read_set.items():
+            yield from writers_after(var, read_time)
+
+    def readers_of_writes(self, transaction: Transaction) -> Iterable[int]:
+        """
+        List the indexed readers of each variable written.
+        
+        Args:
+            transaction: Transaction about to commit
+        
+        Returns:
+            Transaction numbers, possibly repeated and possibly including the
+            transaction itself
+        
+        Side effects:
+            None
+        """
+        readers = self.readers
+        for var in transaction.write_set:
+            yield from readers[var] or ()
+
+    def earlier_writers(self, transaction: Transaction) -> Iterable[int]:
+        """
+        List the committed writers of each variable written that committed
+        before the transaction started.
+        
+        Args:
+            transaction: Transaction about to commit
+        
+        Returns:
+            Transaction numbers, possibly repeated
+        
+        Side effects:
+            None
+        """
+        writers_before = self.committed_writers.writers_before
+        for var in transaction.write_set:
+            yield from writers_before(var, transaction.start_time)
+
+    def writers_after(self, var: int, time: float) -> Iterable[int]:
+        """
+        Look up a variable's committed writers after a timestamp.
+        
+        Args:
+            var: Number of the variable to look up
+            time: Exclusive lower bound on the commit time
+        
+        Returns:
+            Transaction numbers in commit time order
+        
+        Side effects:
+            None
+        """
+        return self.committed_writers.writers_after(var, time)
+
+    def readers_of(self, var: int) -> Iterable[int]:
+        """
+        Look up a variable's live readers.
+        
+        Args:
+            var: Number of the variable to look up
+        
+        Returns:
+            Transaction numbers in read order (the index itself, not a copy)
+        
+        Side effects:
+            None
+        """
+        return self.readers[var] or ()
+
+    def take_site_writers(self, site_id: int) -> List[int]:
+        """
+        Empty a site's writer index and return what it held.
+        
+        Args:
+            site_id: Site that failed
+        
+        Returns:
+            Transaction numbers in write order
+        
+        Side effects:
+            - Replaces the site's writer index with an empty one
+        """
+        writers = list(self.site_writers[site_id])
+        self.site_writers[site_id] = {}
+        return writers
+
+    def clear(self):
+        """
+        Empty every index.
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Resets the committed writer, reader and site writer indexes
+        """
+        self.committed_writers.clear()
+        self.readers = [None] * len(self.readers)
+        self.site_writers = [{} for _ in self.site_writers]
+
+
+class BitsetConflicts(ConflictIndex):
+    """
+    Conflict index over bitmask read and write sets.
+    
+    Each transaction carries read_mask and write_mask, with bit i set for
+    xi, and each site a mask of the variables it hosts. Whether two
+    transactions conflict is a single AND of their masks, and so is whether
+    a transaction wrote to a variable a failed site holds. Nothing is
+    indexed: each question scans the manager's live transactions (for the
+    committed ones, only those in the relevant commit time range). That
+    suits many concurrent transactions with large read and write sets over
+    few variables; with many variables every mask update copies a long
+    integer, and the scans grow with the number of concurrent transactions.
+    """
+
+    def __init__(self, manager: "TransactionManager"):
+        """
+        Create a bitset index over a manager's transactions.
+        
+        Args:
+            manager: Transaction manager the index serves; its transactions,
+                active and committed maps are scanned
+        
+        Side effects:
+            - Initializes instance variables for the index
+        """
+        self.manager = manager
+
+    def add_read(self, transaction: Transaction, var: int):
+        """
+        Set the variable's bit in the transaction's read mask.
+        
+        Args:
+            transaction: Transaction that read
+            var: Number of the variable read
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Updates transaction.read_mask
+        """
+        transaction.read_mask |= 1 << var
+
+    def add_write(self, transaction: Transaction, var: int, site_ids: List[int]):
+        """
+        Set the variable's bit in the transaction's write mask.
+        
+        The sites are not recorded: transaction.sites_written holds them.
+        
+        Args:
+            transaction: Transaction that wrote
+            var: Number of the variable written
+            site_ids: Sites the write will be applied to at commit
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Updates transaction.write_mask
+        """
+        transaction.write_mask |= 1 << var
+
+    def commit(self, transaction: Transaction):
+        """
+        Nothing to do: the masks stay on the transaction, which the manager
+        keeps in self.committed until it is retired.
+        
+        Args:
+            transaction: Transaction that committed
+        
+        Returns:
+            None
+        
+        Side effects:
+            None
+        """
+
+    def abort(self, transaction: Transaction):
+        """
+        Clear an aborted transaction's masks.
+        
+        Args:
+            transaction: Transaction that aborted
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Resets transaction.read_mask and transaction.write_mask
+        """
+        transaction.read_mask = 0
+        transaction.write_mask = 0
+
+    def retire(self, transaction: Transaction):
+        """
+        Nothing to do: a retired transaction leaves the manager's maps, which
+        are the only thing scanned.
+        
+        Args:
+            transaction: Transaction being retired
+        
+        Returns:
+            None
+        
+        Side effects:
+            None
+        """
+
+    def first_committer_conflict(self, transaction: Transaction) -> bool:
+        """
+        AND the write mask with those of the transactions committed since the
+        transaction started.
+        
+        Args:
+            transaction: Transaction about to commit
+        
+        Returns:
+            True if first-committer-wins forbids the commit
+        
+        Side effects:
+            None
+        """
+        start_time = transaction.start_time
+        mask = transaction.write_mask
+        # Newest first: only commits after start_time matter
+        for other in reversed(self.manager.committed.values()):
+            if other.commit_time <= start_time:
+                break
+            if other.write_mask & mask:
+                return True
+        return False
+
+    def overwriters(self, transaction: Transaction) -> Iterable[int]:
+        """
+        Scan the transactions committed after the oldest version read for
+        writes to a variable read, after the version read.
+        
+        Args:
+            transaction: Transaction about to commit
+        
+        Returns:
+            Transaction numbers, newest commit first
+        
+        Side effects:
+            None
+        """
+        mask = transaction.read_mask
+        if not mask:
+            return
+        read_set = transaction.read_set
+        oldest = min(read_set.values())
+        for other in reversed(self.manager.committed.values()):
+            commit_time = other.commit_time
+            if commit_time <= oldest:
+                break
+            overlap = other.write_mask & mask
+            # A shared variable counts if other committed it after the
+            # version the transaction read
+            while overlap:
+                low = overlap & -overlap
+                if read_set[low.bit_length() - 1] < commit_time:
+                    yield other.tid
+                    break
+                overlap ^= low
+
+    def readers_of_writes(self, transaction: Transaction) -> Iterable[int]:
+        """
+        AND the write mask with the read mask of every live transaction.
+        
+        Args:
+            transaction: Transaction about to commit
+        
+        Returns:
+            Transaction numbers, possibly including the transaction itself
+        
+        Side effects:
+            None
+        """
+        mask = transaction.write_mask
+        if mask:
+            for other in self.manager.transactions.values():
+                if other.read_mask & mask:
+                    yield other.tid
+
+    def earlier_writers(self, transaction: Transaction) -> Iterable[int]:
+        """
+        AND the write mask with those of the transactions committed before the
+        transaction started.
+        
+        Args:
+            transaction: Transaction about to commit
+        
+        Returns:
+            Transaction numbers in commit order
+        
+        Side effects:
+            None
+        """
+        start_time = transaction.start_time
+        mask = transaction.write_mask
+        for other in self.manager.committed.values():
+            if other.commit_time >= start_time:
+                break
+            if other.write_mask & mask:
+                yield other.tid
+
+    def writers_after(self, var: int, time: float) -> Iterable[int]:
+        """
+        Scan the transactions committed after a timestamp for the variable's bit.
+        
+        Args:
+            var: Number of the variable to look up
+            time: Exclusive lower bound on the commit time
+        
+        Returns:
+            Transaction numbers, newest commit first
+        
+        Side effects:
+            None
+        """
+        bit = 1 << var
+        for other in reversed(self.manager.committed.values()):
+            if other.commit_time <= time:
+                break
+            if other.write_mask & bit:
+                yield other.tid
+
+    def readers_of(self, var: int) -> Iterable[int]:
+        """
+        Scan every live transaction's read mask for the variable's bit.
+        
+        Args:
+            var: Number of the variable to look up
+        
+        Returns:
+            Transaction numbers
+        
+        Side effects:
+            None
+        """
+        bit = 1 << var
+        for other in self.manager.transactions.values():
+            if other.read_mask & bit:
+                yield other.tid
+
+    def take_site_writers(self, site_id: int) -> List[int]:
+        """
+        AND each active transaction's write mask with the site's hosted mask.
+        
+        Nothing is stored per site, so nothing needs to be forgotten; the
+        caller removes the site from the transactions' sites_written.
+        
+        Args:
+            site_id: Site that failed
+        
+        Returns:
+            Transaction numbers
+        
+        Side effects:
+            None
+        """
+        # The AND finds writes to variables the site holds; sites_written
+        # excludes those sent while the site was down
+        mask = self.manager.placement.hosted_mask(site_id)
+        return [
+            transaction.tid
+            for transaction in self.manager.active.values()
+            if transaction.write_mask & mask and site_id in transaction.sites_written
+        ]
+
+    def clear(self):
+        """
+        Nothing to do: the manager clears its transaction maps itself.
+        
+        Returns:
+            None
+        
+        Side effects:
+            None
+        """
+
+
+# Conflict index implementations, by the name TransactionManager accepts
+CONFLICT_INDEXES = {
+    "index": IndexedConflicts,
+    "bitset": BitsetConflicts,
+}
+
+
+class SSIValidator:
+    """
+    Commit validation by dangerous structures instead of cycle search.
+    
+    Follows Cahill, Röhm and Fekete's serializable snapshot isolation: every
+    cycle in the serialization graph of a snapshot isolation history passes
+    through a pivot, a transaction with an rw-antidependency from one
+    concurrent transaction and another to a concurrent transaction. Each
+    transaction carries an in_conflict and an out_conflict flag, set as the
+    rw-antidependencies appear on reads and writes, and a transaction that
+    would commit with both set is aborted. Validation is therefore a flag
+    test, whatever the number of transactions and edges; in exchange some
+    pivots are aborted that close no cycle.
+    
+    A pivot that has already committed cannot be aborted, so the transaction
+    whose read or write completes the structure is aborted instead: a read
+    at once, a write at commit (through its dangerous flag).
+    """
+
+    def __init__(self, manager: "TransactionManager"):
+        """
+        Create a validator over a manager's transactions.
+        
+        Args:
+            manager: Transaction manager the validator serves; its conflict
+                index supplies the readers and committed writers of each
+                variable
+        
+        Side effects:
+            - Initializes the per-variable active writer lists
+        """
+        self.manager = manager
+        # Active transactions that wrote each variable, in write order,
+        # indexed by variable number (None if it has none)
+        self.writers: List[Optional[Dict[int, None]]] = [None] * (
+            manager.placement.variable_count + 1
+        )
+
+    def on_read(self, transaction: Transaction, var: int, read_time: float) -> bool:
+        """
+        Record the rw-antidependencies created by a read.
+        
+        The reader has one to every transaction that committed var after
+        the version it read, and to every other active writer of var.
+        
+        Args:
+            transaction: Transaction that read
+            var: Number of the variable read
+            read_time: Commit time of the version that was read
+        
+        Returns:
+            False if a committed writer it depends on now has both flags
+            set, so the reader must abort; True otherwise
+        
+        Side effects:
+            - Sets the reader's out_conflict flag and the writers'
+              in_conflict flags
+        """
+        transactions = self.manager.transactions
+        safe = True
+        for writer_tid in self.manager.conflicts.writers_after(var, read_time):
+            writer = transactions[writer_tid]
+            transaction.out_conflict = True
+            writer.in_conflict = True
+            if writer.out_conflict:
+                safe = False
+        tid = transaction.tid
+        for writer_tid in self.writers[var] or ():
+            if writer_tid != tid:
+                transaction.out_conflict = True
+                transactions[writer_tid].in_conflict = True
+        return safe
+
+    def on_write(self, transaction: Transaction, var: int):
+        """
+        Record the rw-antidependencies created by a write.
+        
+        Every live reader of var that is concurrent with the writer (still
+        active, or committed after the writer started) has one to the writer.
+        
+        Args:
+            transaction: Transaction that wrote
+            var: Number of the variable written
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Adds the writer to the variable's active writers
+            - Sets the readers' out_conflict flags and the writer's
+              in_conflict flag
+            - Sets the writer's dangerous flag if one of the readers has
+              committed with its in_conflict flag set
+        """
+        writers = self.writers[var]
+        if writers is None:
+            writers = self.writers[var] = {}
+        tid = transaction.tid
+        if tid in writers:
+            return
+        writers[tid] = None
+        transactions = self.manager.transactions
+        start_time = transaction.start_time
+        for reader_tid in self.manager.conflicts.readers_of(var):
+            if reader_tid == tid:
+                continue
+            reader = transactions[reader_tid]
+            if reader.status == TransactionStatus.COMMITTED:
+                if reader.commit_time <= start_time:
+                    continue
+                if reader.in_conflict:
+                    transaction.dangerous = True
+            reader.out_conflict = True
+            transaction.in_conflict = True
+
+    def validate(self, transaction: Transaction) -> Optional[str]:
+        """
+        Decide whether a transaction's rw-antidependencies allow its commit.
+        
+        Args:
+            transaction: Transaction about to commit, past the other checks
+        
+        Returns:
+            ABORT_DANGEROUS_STRUCTURE if it is a pivot or must abort for a
+            committed one, otherwise None
+        
+        Side effects:
+            None
+        """
+        if transaction.dangerous or (
+            transaction.in_conflict and transaction.out_conflict
+        ):
+            return ABORT_DANGEROUS_STRUCTURE
+        return None
+
+    def forget(self, transaction: Transaction):
+        """
+        Stop tracking a transaction's writes once it commits or aborts.
+        
+        Called before transaction.write_set is cleared. Committed writers
+        are found through the conflict index from then on.
+        
+        Args:
+            transaction: Transaction that committed or aborted
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Removes it from the active writers of the variables it wrote
+        """
+        tid = transaction.tid
+        for var in transaction.write_set:
+            writers = self.writers[var]
+            if writers is not None:
+                writers.pop(tid, None)
+                if not writers:
+                    self.writers[var] = None
+
+    def clear(self):
+        """
+        Forget every transaction.
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Resets every variable's active writers to None
+        """
+        self.writers = [None] * len(self.writers)
+
+
+# Commit validation engines, by the name TransactionManager accepts: "graph"
+# searches the serialization graph for cycles, "ssi" uses SSIValidator
+VALIDATION_ENGINES = ("graph", "ssi")
+
+
+class ReadPolicy(ABC):
+    """
+    Decides in which order the eligible replicas of a variable are probed.
+    
+    The router passes the eligible site IDs in its preference order
+    (highest site ID first); a policy returns them in the order to try.
+    Subclasses must implement order().
+    """
+
+    @abstractmethod
+    def order(self, candidates: List[int], router: "ReadRouter") -> List[int]:
+        """
+        Order eligible replicas for probing.
+        
+        Args:
+            candidates: Eligible site IDs in the router's preference order
+            router: The router asking, for access to per-site read counts
+        
+        Returns:
+            The site IDs in the order they should be probed
+        
+        Side effects:
+            May update policy-internal state
+        """
+
+
+class FirstEligiblePolicy(ReadPolicy):
+    """
+    Always try replicas in preference order, highest site ID first.
+    """
+
+    def order(self, candidates: List[int], router: "ReadRouter") -> List[int]:
+        """
+        Keep the router's preference order.
+        
+        Args:
+            candidates: Eligible site IDs in the router's preference order
+            router: The router asking (unused)
+        
+        Returns:
+            candidates, unchanged
+        
+        Side effects:
+            None
+        """
+        return candidates
+
+
+class RoundRobinPolicy(ReadPolicy):
+    """
+    Rotate the first replica tried on every read.
+    """
+
+    def __init__(self):
+        """
+        Create a policy that starts with the first candidate.
+        
+        Side effects:
+            - Initializes the turn counter
+        """
+        self.turn = 0
+
+    def order(self, candidates: List[int], router: "ReadRouter") -> List[int]:
+        """
+        Rotate the candidates by the number of reads ordered so far.
+        
+        Args:
+            candidates: Eligible site IDs in the router's preference order
+            router: The router asking (unused)
+        
+        Returns:
+            The site IDs, starting at the current turn and wrapping around
+        
+        Side effects:
+            - Advances the turn counter
+        """
+        start = self.turn % len(candidates)
+        self.turn += 1
+        return candidates[start:] + candidates[:start]
+
+
+class LeastLoadedPolicy(ReadPolicy):
+    """
+    Try the replica that has served the fewest reads first.
+    """
+
+    def order(self, candidates: List[int], router: "ReadRouter") -> List[int]:
+        """
+        Sort the candidates by the reads each site has served.
+        
+        Args:
+            candidates: Eligible site IDs in the router's preference order
+            router: The router asking, whose reads counts are used
+        
+        Returns:
+            The site IDs, fewest reads first; ties keep preference order
+        
+        Side effects:
+            None
+        """
+        return sorted(candidates, key=router.reads.__getitem__)
+
+
+READ_POLICIES = {
+    "first": FirstEligiblePolicy,
+    "round-robin": RoundRobinPolicy,
+    "least-loaded": LeastLoadedPolicy,
+}
+
+
+class ReadRouter:
+    """
+    Routes snapshot reads to a single replica.
+    
+    Keeps an up/down bitmap of the sites plus when each site last failed
+    and since when it has been continuously up. A read only considers
+    replicas that are up and were not down at the reader's start time,
+    probes them in the order chosen by a ReadPolicy, and stops at the
+    first one that can serve the snapshot.
+    """
+
+    def __init__(
+        self,
+        sites: Dict[int, Site],
+        policy: ReadPolicy,
+        placement: Optional[Placement] = None,
+    ):
+        """
+        Create a router over a set of sites.
+        
+        Args:
+            sites: Site objects keyed by site ID
+            policy: Policy that orders eligible replicas
+            placement: Placement of the variables over the sites
+                (default: DEFAULT_PLACEMENT)
+        
+        Side effects:
+            - Initializes the availability bitmap from the sites' status
+            - Initializes per-site up-since times, failure times, and read counts
+        """
+        self.sites = sites
+        self.policy = policy
+        self.placement = placement or DEFAULT_PLACEMENT
+        self.up_mask = 0
+        self.up_since: Dict[int, float] = {}
+        self.failed_at: Dict[int, float] = {}
+        self.reads: Dict[int, int] = {}
+        for site_id, site in sites.items():
+            if site.is_up:
+                self.up_mask |= 1 << site_id
+            self.up_since[site_id] = max(site.last_recover_time, 0.0)
+            self.failed_at[site_id] = site.last_fail_time
+            self.reads[site_id] = 0
+
+    def site_failed(self, site_id: int, global_time: float):
+        """
+        Mark a site as down.
+        
+        Args:
+            site_id: ID of the failed site
+            global_time: Timestamp of the failure
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Clears the site's bit in the availability bitmap
+            - Records the failure time
+        """
+        self.up_mask &= ~(1 << site_id)
+        self.failed_at[site_id] = global_time
+
+    def site_recovered(self, site_id: int, global_time: float):
+        """
+        Mark a site as up again.
+        
+        Args:
+            site_id: ID of the recovered site
+            global_time: Timestamp of the recovery
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Sets the site's bit in the availability bitmap
+            - Records the start of the site's new up period
+        """
+        self.up_mask |= 1 << site_id
+        self.up_since[site_id] = global_time
+
+    def replicas(self, var: int) -> List[int]:
+        """
+        List the sites holding a variable in preference order.
+        
+        Args:
+            var: Variable number
+        
+        Returns:
+            Site IDs holding var, highest site ID first, from the
+            precomputed placement table
+        
+        Side effects:
+            None
+        """
+        return self.placement.read_order[var]
+
+    def read(self, var: int, start_time: float) -> Optional[tuple]:
+        """
+        Read the version of a variable visible at a snapshot from one replica.
+        
+        A replica is eligible if its site is up and, for replicated
+        variables, the site was not down at start_time (a site that was down
+        then cannot have been up since its last commit before start_time).
+        The policy orders the eligible replicas; later ones are only probed
+        if an earlier one cannot serve the snapshot.
+        
+        Args:
+            var: Variable number
+            start_time: Snapshot timestamp of the reading transaction
+        
+        Returns:
+            (Version, site ID) of the serving replica, or None if no
+            replica can serve the snapshot
+        
+        Side effects:
+            - Increments the read count of the serving site
+            - May update policy-internal state
+        """
+        up_mask = self.up_mask
+        replicas = self.replicas(var)
+        if len(replicas) > 1:
+            candidates = [
+                site_id
+                for site_id in replicas
+                if up_mask >> site_id & 1
+                and not (
+                    self.failed_at[site_id] < start_time < self.up_since[site_id]
+                )
+            ]
+        else:
+            candidates = [site_id for site_id in replicas if up_mask >> site_id & 1]
+        if not candidates:
+            return None
+
+        for site_id in self.policy.order(candidates, self):
+            version = self.sites[site_id].get_committed_version_at(var, start_time)
+            if version is not None:
+                self.reads[site_id] += 1
+                return version, site_id
+        return None
+
+
+class TransactionManager:
+    """
+    Manages distributed transactions across multiple replicated database sites.
+    
+    Implements optimistic concurrency control with:
+    - Multiversion concurrency control for read-only transactions
+    - First-committer-wins conflict resolution
+    - Serialization graph testing, or dangerous structure detection (SSI),
+      for serializability
+    - Site failure and recovery handling
+    - Available copies replication protocol
+    """
+
+    def __init__(
+        self,
+        vacuum_interval: int = 0,
+        vacuum_threshold: int = 64,
+        read_policy: Optional[ReadPolicy] = None,
+        sink: Optional[EventSink] = None,
+        stats: Optional[Stats] = None,
+        wal: Optional["WriteAheadLog"] = None,
+        checkpoint: Optional[str] = None,
+        placement: Optional[Placement] = None,
+        conflicts: str = "index",
+        engine: str = "graph",
+    ):
+        """
+        Initialize the transaction manager and its database sites.
+        
+        Creates sites numbered 1..placement.site_count (1-10 by default),
+        each initially up and containing appropriate variables based on the
+        replication rule.
+        
+        Args:
+            vacuum_interval: Vacuum every site after this many commits
+                (0 disables periodic vacuuming)
+            vacuum_threshold: Vacuum a variable's history at a site once it
+                holds more than this many versions (0 disables it)
+            read_policy: Replica selection policy for reads
+                (default: FirstEligiblePolicy)
+            sink: Receiver of begin/read/write/commit/abort/site/dump
+                events (default: EventSink, which prints them)
+            stats: Statistics to record operation latencies and outcomes
+                into (default: None, no instrumentation)
+            wal: Write-ahead log to rebuild the sites from and to log
+                committed writes to; commits are reported to the sink once
+                the log has made them durable (default: None, state is in
+                memory only)
+            checkpoint: Checkpoint file to start from instead of the
+                initial state, and to return to on reset_state()
+                (default: None)
+            placement: Number of sites and variables and where each variable
+                is stored (default: DEFAULT_PLACEMENT, 10 sites and x1..x20)
+            conflicts: How read and write sets are checked for conflicts, a
+                key of CONFLICT_INDEXES: "index" (per-variable indexes) or
+                "bitset" (bitmasks, compared with AND)
+            engine: How commits are validated for serializability, one of
+                VALIDATION_ENGINES: "graph" (cycle search in the
+                serialization graph) or "ssi" (rw-conflict flags, see
+                SSIValidator)
+        
+        Side effects:
+            - Creates one Site object per site in self.sites dictionary
+            - Creates a ReadRouter over the sites
+            - Initializes empty transaction tracking dictionaries
+            - Sets global_time to 0.0
+            - Initializes empty serialization graph, conflict index, and
+              wait queues, and with the ssi engine an SSIValidator
+            - Initializes vacuum settings and per-site reclaimed byte counters
+            - With stats, wraps the timed methods to record their latency
+            - With checkpoint, restores the sites and the clock from it
+            - With wal, replays the logged writes into the sites and starts
+              the clock after the last logged commit; with a checkpoint too,
+              only writes committed after the checkpoint are replayed
+        
+        Raises:
+            ValueError: If engine is not one of VALIDATION_ENGINES
+        """
+        if engine not in VALIDATION_ENGINES:
+            raise ValueError(f"Unknown validation engine {engine}")
+        self.placement = placement or DEFAULT_PLACEMENT
+        self.sites: Dict[int, Site] = {
+            i: Site(i, self.placement)
+            for i in range(1, self.placement.site_count + 1)
+        }
+        self.checkpoint_path = checkpoint
+        self.global_time = 0.0
+        # Highest transaction number found in the checkpoint and log, so that
+        # callers can number new transactions after the restored ones
+        self.restored_tid = 0
+        if checkpoint is not None:
+            self.global_time, self.restored_tid = load_checkpoint(
+                checkpoint, self.sites
+            )
+        self.router = ReadRouter(
+            self.sites, read_policy or FirstEligiblePolicy(), self.placement
+        )
+        # Transactions are keyed by number (T3 is 3), variables by number
+        self.transactions: Dict[int, Transaction] = {}
+        # Active transactions in start order, so the first one is the oldest
+        self.active: Dict[int, Transaction] = {}
+        # Committed transactions that are not yet retired, in commit order
+        self.committed: Dict[int, Transaction] = {}
+        # Retired aborted transactions whose end() has not been seen yet
+        self.aborted: Set[int] = set()
+        # Numbers of retired transactions, which begin() refuses to reuse:
+        # committed ones retired by _collect_garbage and aborted ones whose
+        # end() was seen. Every number up to retired_tid is retired; the set
+        # only holds those above it, so it stays as small as the gaps in the
+        # numbering rather than growing with the history
+        self.retired_tid = 0
+        self.retired: Set[int] = set()
+        self.serial_graph = SerializationGraph()
+        self.conflicts: ConflictIndex = CONFLICT_INDEXES[conflicts](self)
+        self.engine = engine
+        self.ssi: Optional[SSIValidator] = (
+            SSIValidator(self) if engine == "ssi" else None
+        )
+        # Transactions parked on a down site or on a variable, in arrival order
+        self.site_waiters: Dict[int, Deque[Transaction]] = {}
+        self.var_waiters: Dict[int, Deque[Transaction]] = {}
+        self.vacuum_interval = vacuum_interval
+        self.vacuum_threshold = vacuum_threshold
+        self.commits_since_vacuum = 0
+        self.reclaimed_bytes: Dict[int, int] = {site_id: 0 for site_id in self.sites}
+        self.sink = sink or EventSink()
+        self.wal = wal
+        if wal is not None:
+            self.global_time = max(
+                self.global_time, wal.replay(self.sites, after=self.global_time)
+            )
+            self.restored_tid = max(self.restored_tid, wal.last_tid)
+            wal.attach(self.sites)
+        # Versions committed up to now were restored: their writers are not
+        # this manager's transactions, even where the names coincide
+        self.restored_time = self.global_time
+        self.instrumentation = stats
+        if stats is not None:
+            self._instrument(stats)
+
+    def _instrument(self, stats: Stats):
+        """
+        Record the latency of the timed operations into stats.
+
+        The timed methods are replaced by timing wrappers on this instance
+        only, so an uninstrumented manager pays nothing for them.
+
+        Args:
+            stats: Statistics to record into
+
+        Returns:
+            None
+
+        Side effects:
+            - Shadows read, write, _validate_commit, fail_site, recover_site
+              and dump with instance attributes, and the serialization
+              graph's add_edge likewise
+        """
+        self.read = stats.timed("read", self.read)
+        self.write = stats.timed("write", self.write)
+        self._validate_commit = stats.timed(
+            "commit validation", self._validate_commit
+        )
+        self.serial_graph.add_edge = stats.timed(
+            "cycle detection", self.serial_graph.add_edge
+        )
+        self.fail_site = stats.timed("fail", self.fail_site)
+        self.recover_site = stats.timed("recover", self.recover_site)
+        self.dump = stats.timed("dump", self.dump)
+
+    def stats(self) -> Dict:
+        """
+        Summarize the recorded operation latencies and outcomes.
+
+        Returns:
+            Stats.snapshot() of the statistics passed to the constructor:
+            latency count/mean/p50/p99/max per operation, the number of
+            commits, the number of aborts per reason and the number of
+            reads each site served. Empty if the manager was created
+            without statistics.
+
+        Side effects:
+            None
+        """
+        if self.instrumentation is None:
+            return {}
+        return self.instrumentation.snapshot()
+
+    def begin_transaction(self, tid: int):
+        """
+        Start a new read-write transaction.
+        
+        Args:
+            tid: Unique transaction number (1 for T1)
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Increments global_time
+            - Creates new Transaction object in self.transactions and self.active
+            - Reports the begin to the event sink
+        
+        Raises:
+            ValueError: If transaction with this ID already exists or was
+                retired, or the number is above MAX_TID
+        """
+        if tid > MAX_TID:
+            raise ValueError(f"Transaction number T{tid} is out of range")
+        if (
+            tid in self.transactions
+            or tid in self.aborted
+            or tid <= self.retired_tid
+            or tid in self.retired
+        ):
+            raise ValueError(f"Transaction T{tid} already exists")
+        self.global_time += 1
+        transaction = Transaction(tid, TransactionType.READ_WRITE, self.global_time)
+        self.transactions[tid] = transaction
+        self.active[tid] = transaction
+        self.sink.begin(tid, False)
+
+    def begin_read_only_transaction(self, tid: int):
+        """
+        Start a new read-only transaction.
+        
+        Read-only transactions use multiversion concurrency control to read
+        a consistent snapshot of the database as of their start time.
+        
+        Args:
+            tid: Unique transaction number (1 for T1)
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Increments global_time
+            - Creates new READ_ONLY Transaction object in self.transactions and self.active
+            - Reports the begin to the event sink
+        
+        Raises:
+            ValueError: If transaction with this ID already exists or was
+                retired, or the number is above MAX_TID
+        """
+        if tid > MAX_TID:
+            raise ValueError(f"Transaction number T{tid} is out of range")
+        if (
+            tid in self.transactions
+            or tid in self.aborted
+            or tid <= self.retired_tid
+            or tid in self.retired
+        ):
+            raise ValueError(f"Transaction T{tid} already exists")
+        self.global_time += 1
+        transaction = Transaction(tid, TransactionType.READ_ONLY, self.global_time)
+        self.transactions[tid] = transaction
+        self.active[tid] = transaction
+        self.sink.begin(tid, True)
+
+    def read(self, tid: int, var: int):
+        """
+        Execute a read operation for a transaction.
+        
+        For read-write transactions, reads from the write cache if available,
+        otherwise reads the most recent committed version from an available site
+        chosen by the read router.
+        For read-only transactions, reads the appropriate snapshot version.
+        If the read cannot be served yet, it is parked and resumed
+        automatically once a recovery makes it serviceable.
+        
+        Args:
+            tid: Number of the transaction performing the read
+            var: Number of the variable to read (2 for x2)
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Updates transaction's read_set with variable and commit time
+            - Reports the read result or wait to the event sink
+            - Counts the read for the site that served it, when
+              instrumentation is on
+            - Updates serialization graph with read dependencies (graph
+              engine) or the rw-conflict flags (ssi engine)
+            - May abort transaction if a cycle or dangerous structure is
+              detected
+            - May park the read in a wait queue
+        
+        Raises:
+            ValueError: If the variable does not exist
+        """
+        if not self.placement.has_variable(var):
+            raise ValueError(f"Variable x{var} does not exist")
+        transaction = self.transactions.get(tid)
+        if not transaction or transaction.status != TransactionStatus.ACTIVE:
+            return
+        self._submit(transaction, ("R", var))
+
+    def _try_read(self, transaction: Transaction, var: int) -> Optional[tuple]:
+        """
+        Attempt a read without waiting.
+        
+        Args:
+            transaction: Transaction performing the read
+            var: Number of the variable to read
+        
+        Returns:
+            None if the read was served, otherwise the wait queue key to
+            park it under: ("site", site_id) when the only site holding var
+            is down, ("var", var) when no replica can serve the snapshot
+        
+        Side effects:
+            - On success, same as read()
+        """
+        tid = transaction.tid
+
+        # Return cached value if transaction has written to this variable
+        if var in transaction.write_cache:
+            val = transaction.write_cache[var]
+            self.sink.read(tid, var, val, None)
+            self._record_read(transaction, var, transaction.start_time)
+            return None
+
+        replicas = self.placement.sites_of[var]
+        # For non-replicated variables, check if home site is up
+        if len(replicas) == 1 and not self.sites[replicas[0]].is_up:
+            return ("site", replicas[0])
+
+        # Route the read to one replica that can serve the snapshot
+        routed = self.router.read(var, transaction.start_time)
+        if not routed:
+            return ("var", var)
+
+        version, site_id = routed
+        if self.instrumentation is not None:
+            self.instrumentation.count_read(site_id)
+        self.sink.read(tid, var, version.value, site_id)
+        self._record_read(transaction, var, version.commit_time)
+        if self.ssi is not None:
+            if not self.ssi.on_read(transaction, var, version.commit_time):
+                self._abort_transaction(transaction, ABORT_DANGEROUS_STRUCTURE)
+                self.sink.abort(tid, "dangerous structure")
+        elif version.commit_time > self.restored_time:
+            self._update_serial_graph_on_read(tid, version.transaction_id)
+        return None
+
+    def _record_read(self, transaction: Transaction, var: int, commit_time: float):
+        """
+        Record that a transaction read a version of a variable.
+        
+        Args:
+            transaction: Transaction that performed the read
+            var: Number of the variable that was read
+            commit_time: Commit time of the version that was read
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Updates transaction's read_set
+            - Records the read in the conflict index
+        """
+        transaction.read_set[var] = commit_time
+        self.conflicts.add_read(transaction, var)
+
+    def write(self, tid: int, var: int, val: int):
+        """
+        Execute a write operation for a transaction.
+        
+        Writes are buffered in the transaction's write cache until commit.
+        For replicated variables, writes go to all available sites. For
+        non-replicated variables, writes go to the home site if available.
+        If no site can take the write yet, it is parked and resumed
+        automatically once a recovery makes it serviceable.
+        
+        Args:
+            tid: Number of the transaction performing the write
+            var: Number of the variable to write
+            val: Value to write
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Adds value to transaction's write_cache
+            - Adds variable to transaction's write_set
+            - Records the write and its target sites in the conflict index
+            - Reports the write and its target sites to the event sink
+            - Reports a wait if no sites are available
+            - May park the write in a wait queue
+        
+        Raises:
+            ValueError: If a read-only transaction attempts to write, the
+                variable does not exist, or the value is outside the 64-bit
+                signed range
+        """
+        if not self.placement.has_variable(var):
+            raise ValueError(f"Variable x{var} does not exist")
+        if not MIN_VALUE <= val <= MAX_VALUE:
+            raise ValueError(f"Value {val} is out of range")
+        transaction = self.transactions.get(tid)
+        if not transaction or transaction.status != TransactionStatus.ACTIVE:
+            return
+        if transaction.type == TransactionType.READ_ONLY:
+            raise ValueError(f"Read-only transaction T{tid} cannot write")
+        self._submit(transaction, ("W", var, val))
+
+    def _try_write(
+        self, transaction: Transaction, var: int, val: int
+    ) -> Optional[tuple]:
+        """
+        Attempt a write without waiting.
+        
+        Args:
+            transaction: Transaction performing the write
+            var: Number of the variable to write
+            val: Value to write
+        
+        Returns:
+            None if the write was buffered, otherwise the wait queue key to
+            park it under: ("site", site_id) for a non-replicated variable
+            whose home site is down, ("var", var) when every site is down
+        
+        Side effects:
+            - On success, same as write()
+        """
+        tid = transaction.tid
+
+        # Track which sites will receive this write
+        replicas = self.placement.sites_of[var]
+        target_sites = []
+        if len(replicas) > 1:  # Replicated variable
+            sites = self.sites
+            target_sites = [site_id for site_id in replicas if sites[site_id].is_up]
+            if not target_sites:
+                return ("var", var)
+        else:  # Non-replicated variable
+            home_site = replicas[0]
+            if not self.sites[home_site].is_up:
+                return ("site", home_site)
+            target_sites = [home_site]
+
+        transaction.write_cache[var] = val
+        transaction.write_set.add(var)
+        self.conflicts.add_write(transaction, var, target_sites)
+        if self.ssi is not None:
+            self.ssi.on_write(transaction, var)
+        transaction.sites_written.update(target_sites)
+        self.sink.write(tid, var, val, target_sites)
+        return None
+
+    def _submit(self, transaction: Transaction, operation: tuple):
+        """
+        Run a read or write now, or park it if it has to wait.
+        
+        Operations of a transaction run in arrival order: while one of its
+        operations is parked, later ones queue up behind it.
+        
+        Args:
+            transaction: Transaction issuing the operation
+            operation: ("R", var) or ("W", var, val)
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Runs the operation, or appends it to transaction.pending
+            - Reports a wait to the event sink if the operation has to wait
+            - May park the transaction in a wait queue
+        """
+        tid = transaction.tid
+        if transaction.pending:
+            transaction.pending.append(operation)
+            self.sink.wait(tid, operation[1], WAIT_QUEUED)
+            return
+
+        wait = self._attempt(transaction, operation)
+        if wait is None:
+            return
+        transaction.pending.append(operation)
+        self._park(transaction, wait)
+
+        var = operation[1]
+        if operation[0] == "W":
+            self.sink.wait(tid, var, WAIT_NO_WRITE_SITE)
+        elif wait[0] == "site":
+            self.sink.wait(tid, var, WAIT_SITE_DOWN, wait[1])
+        else:
+            self.sink.wait(tid, var, WAIT_NO_VERSION)
+
+    def _attempt(self, transaction: Transaction, operation: tuple) -> Optional[tuple]:
         """
-        Initialize the transaction manager with 10 database sites.
+        Attempt a read or write operation without waiting.
+        
+        Args:
+            transaction: Transaction issuing the operation
+            operation: ("R", var) or ("W", var, val)
         
-        Creates sites numbered 1-10, each initially up and containing
-        appropriate variables based on replication rules.
+        Returns:
+            None if the operation completed, otherwise its wait queue key
         
         Side effects:
-            - Creates 10 Site objects in self.sites dictionary
-            - Initializes empty transaction tracking dictionary
-            - Sets global_time to 0.0
-            - Initializes empty serialization graph
+            - Same as _try_read or _try_write
         """
-        self.sites: Dict[int, Site] = {i: Site(i) for i in range(1, 11)}
-        self.transactions: Dict[str, Transaction] = {}
-        self.global_time = 0.0
-        self.serial_graph: Dict[str, Set[str]] = {}
+        if operation[0] == "R":
+            return self._try_read(transaction, operation[1])
+        return self._try_write(transaction, operation[1], operation[2])
 
-    def begin_transaction(self, tid: str):
+    def _park(self, transaction: Transaction, wait: tuple):
         """
-        Start a new read-write transaction.
+        Put a transaction in the wait queue for its blocked operation.
         
         Args:
-            tid: Unique transaction identifier
+            transaction: Transaction whose first pending operation is blocked
+            wait: ("site", site_id) or ("var", var)
         
         Returns:
             None
         
         Side effects:
-            - Increments global_time
-            - Creates new Transaction object in self.transactions
-            - Prints "begin {tid}" to stdout
-        
-        Raises:
-            ValueError: If transaction with this ID already exists
+            - Appends the transaction to self.site_waiters or self.var_waiters
+            - Sets transaction.waiting_on
         """
-        if tid in self.transactions:
-            raise ValueError(f"Transaction {tid} already exists")
-        self.global_time += 1
-        self.transactions[tid] = Transaction(
-            tid, TransactionType.READ_WRITE, self.global_time
-        )
-        print(f"begin {tid}")
+        transaction.waiting_on = wait
+        if wait[0] == "site":
+            self.site_waiters.setdefault(wait[1], deque()).append(transaction)
+        else:
+            self.var_waiters.setdefault(wait[1], deque()).append(transaction)
 
-    def begin_read_only_transaction(self, tid: str):
+    def _wake(self, queue: Optional[Deque[Transaction]], wait: tuple):
         """
-        Start a new read-only transaction.
+        Resume the transactions parked in one wait queue, in arrival order.
         
-        Read-only transactions use multiversion concurrency control to read
-        a consistent snapshot of the database as of their start time.
+        Each transaction runs its pending operations until one blocks again,
+        in which case it is parked under that operation's key.
         
         Args:
-            tid: Unique transaction identifier
+            queue: The wait queue, already detached from its owner, or None
+            wait: The key the queue was registered under
         
         Returns:
             None
         
         Side effects:
-            - Increments global_time
-            - Creates new READ_ONLY Transaction object in self.transactions
-            - Prints "beginRO {tid}" to stdout
+            - Runs parked operations, with the side effects of read() and write()
+            - May park transactions again
+        """
+        if not queue:
+            return
+        for transaction in queue:
+            # Skip transactions that ended or were re-parked elsewhere
+            if (
+                transaction.status != TransactionStatus.ACTIVE
+                or transaction.waiting_on != wait
+            ):
+                continue
+            transaction.waiting_on = None
+            pending = transaction.pending
+            while pending and transaction.status == TransactionStatus.ACTIVE:
+                operation = pending.popleft()
+                blocked = self._attempt(transaction, operation)
+                if blocked is not None:
+                    pending.appendleft(operation)
+                    self._park(transaction, blocked)
+                    break
+
+    def _drop_pending(self, transaction: Transaction):
+        """
+        Discard a finished transaction's parked operations.
         
-        Raises:
-            ValueError: If transaction with this ID already exists
+        Args:
+            transaction: Transaction that is ending or aborting
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Clears transaction.pending and transaction.waiting_on; stale
+              wait queue entries are skipped when their queue is woken
         """
-        if tid in self.transactions:
-            raise ValueError(f"Transaction {tid} already exists")
-        self.global_time += 1
-        self.transactions[tid] = Transaction(
-            tid, TransactionType.READ_ONLY, self.global_time
-        )
-        print(f"beginRO {tid}")
+        transaction.pending.clear()
+        transaction.waiting_on = None
 
-    def read(self, tid: str, var: str):
+    def end_transaction(self, tid: int):
         """
-        Execute a read operation for a transaction.
+        End a transaction by committing or aborting it.
         
-        For read-write transactions, reads from the write cache if available,
-        otherwise reads the most recent committed version from an available site.
-        For read-only transactions, reads the appropriate snapshot version.
+        Read-only transactions and transactions with empty write sets commit
+        immediately. Transactions with writes undergo validation and conflict
+        detection before committing.
         
         Args:
-            tid: Transaction ID performing the read
-            var: Variable name to read (e.g., "x1", "x2")
+            tid: Number of the transaction to end
         
         Returns:
             None
         
         Side effects:
-            - Updates transaction's read_set with variable and commit time
-            - Prints read result or wait message to stdout
-            - Updates serialization graph with read dependencies
-            - May abort transaction if cycle detected
+            - Calls _commit_transaction or _abort_transaction
+            - Reports the commit or abort to the event sink; with a
+              write-ahead log, a commit only once it is durable
+            - Ignores a repeated end(): each transaction's outcome is
+              reported once, whether or not it has been retired since
+            - May increment global_time
+            - May propagate writes to all appropriate sites
+            - May retire finished transactions below the low watermark
+            - Drops the transaction's operations that are still waiting
         """
         transaction = self.transactions.get(tid)
-        if not transaction or transaction.status != TransactionStatus.ACTIVE:
+        if not transaction:
+            if tid in self.aborted:
+                self._forget_aborted(tid)
+                self.sink.abort(tid)
+            return
+        if transaction.status == TransactionStatus.COMMITTED:
             return
+        # Operations still waiting when the transaction ends are dropped
+        self._drop_pending(transaction)
 
-        # Return cached value if transaction has written to this variable
-        if var in transaction.write_cache:
-            val = transaction.write_cache[var]
-            print(f"{tid} reads {var}: {val} [from write cache]")
-            transaction.read_set[var] = transaction.start_time
+        if transaction.should_abort:
+            self._abort_transaction(transaction, ABORT_SITE_FAILURE)
+            self._forget_aborted(tid)
+            self.sink.abort(tid)
             return
 
-        var_num = int(var[1:])
-        # For non-replicated variables, check if home site is up
-        if var_num % 2 == 1:
-            home_site = 1 + (var_num % 10)
-            if not self.sites[home_site].is_up:
-                print(f"{tid} waits for site {home_site} to recover (contains {var})")
-                return
-
-        # Get available versions from all up sites
-        available_versions = [
-            (val, site_id)
-            for site_id, site in self.sites.items()
-            if (val := site.get_committed_version_at(var, transaction.start_time))
-            is not None
-        ]
+        if not transaction.write_set:
+            transaction.status = TransactionStatus.COMMITTED
+            self.global_time += 1
+            transaction.commit_time = self.global_time
+            self._acknowledge_commit(tid)
+            if self.ssi is None:
+                self._update_serial_graph_on_commit(tid)
+            self._finish_commit(transaction)
+            return
 
-        if available_versions:
-            val, site_id = max(available_versions, key=lambda x: x[1])
-            print(f"{tid} reads {var}: {val} [from site {site_id}]")
-            commit_time = self._find_commit_time_of_value(
-                var, val, transaction.start_time
-            )
-            transaction.read_set[var] = commit_time or 0
-            self._update_serial_graph_on_read(tid, var)
-        else:
-            print(f"{tid} waits - no available version of {var} at any site")
+        self._commit_transaction(transaction)
+        # This end() has been handled, even if validation aborted it
+        self._forget_aborted(tid)
 
-    def _find_commit_time_of_value(
-        self, var: str, val: int, start_time: float
-    ) -> Optional[float]:
+    def _acknowledge_commit(self, tid: int):
         """
-        Find when a specific value of a variable was committed.
+        Report the commit of a transaction that logged no writes.
         
-        Searches all sites to find the most recent commit time for the given
-        value that occurred before or at start_time.
+        With a write-ahead log, the report waits until the commits logged
+        before it are durable, since the transaction may have read their
+        writes.
         
         Args:
-            var: Variable name
-            val: Value to search for
-            start_time: Upper bound on commit time to search
+            tid: Number of the committed transaction
         
         Returns:
-            The commit time when this value was written, or None if not found
+            None
         
         Side effects:
-            None
+            - Reports the commit to the event sink, now or after the next
+              sync of the write-ahead log
         """
-        return max(
-            (
-                version.commit_time
-                for site in self.sites.values()
-                if var in site.version_history
-                for version in site.version_history[var]
-                if version.value == val and version.commit_time <= start_time
-            ),
-            default=None,
-        )
+        if self.wal is None:
+            self.sink.commit(tid)
+        else:
+            self.wal.after_sync(partial(self.sink.commit, tid))
 
-    def write(self, tid: str, var: str, val: int):
+    def _forget_aborted(self, tid: int):
         """
-        Execute a write operation for a transaction.
-        
-        Writes are buffered in the transaction's write cache until commit.
-        For replicated variables, writes go to all available sites. For
-        non-replicated variables, writes go to the home site if available.
+        Retire the number of an aborted transaction whose end() was handled.
         
         Args:
-            tid: Transaction ID performing the write
-            var: Variable name to write
-            val: Value to write
+            tid: Transaction number; ignored unless it is in self.aborted
         
         Returns:
             None
         
         Side effects:
-            - Adds value to transaction's write_cache
-            - Adds variable to transaction's write_set
-            - Prints write operation and target sites to stdout
-            - Prints wait message if no sites available
-        
-        Raises:
-            ValueError: If a read-only transaction attempts to write
+            - Moves the number from self.aborted to the retired numbers
         """
-        transaction = self.transactions.get(tid)
-        if not transaction or transaction.status != TransactionStatus.ACTIVE:
-            return
-        if transaction.type == TransactionType.READ_ONLY:
-            raise ValueError(f"Read-only transaction {tid} cannot write")
-
-        # Track which sites will receive this write
-        var_num = int(var[1:])
-        target_sites = []
-        if var_num % 2 == 0:  # Replicated variable
-            target_sites = [
-                site_id for site_id, site in self.sites.items() if site.is_up
-            ]
-        else:  # Non-replicated variable
-            home_site = 1 + (var_num % 10)
-            if self.sites[home_site].is_up:
-                target_sites = [home_site]
+        if tid in self.aborted:
+            self.aborted.remove(tid)
+            self._retire_number(tid)
 
-        if not target_sites:
-            print(f"{tid} waits - no available sites for writing {var}")
+    def _retire_number(self, tid: int):
+        """
+        Remember that a transaction number was retired.
+        
+        Args:
+            tid: Number of the retired transaction
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Adds the number to self.retired, then folds the numbers that
+              continue self.retired_tid into it
+        """
+        if tid <= self.retired_tid:
             return
+        retired = self.retired
+        retired.add(tid)
+        while self.retired_tid + 1 in retired:
+            self.retired_tid += 1
+            retired.remove(self.retired_tid)
 
-        transaction.write_cache[var] = val
-        transaction.write_set.add(var)
-        print(
-            f"{tid} writes {var}: {val} [to sites {', '.join(map(str, target_sites))}]"
-        )
-
-    def end_transaction(self, tid: str):
+    def abort_transaction(self, tid: int):
         """
-        End a transaction by committing or aborting it.
+        Abort an active transaction without waiting for its end().
         
-        Read-only transactions and transactions with empty write sets commit
-        immediately. Transactions with writes undergo validation and conflict
-        detection before committing.
+        Used when the client that owns a transaction goes away. Nothing is
+        reported, and a later end() for the transaction is not expected.
         
         Args:
-            tid: Transaction ID to end
+            tid: Number of the transaction to abort
         
         Returns:
             None
         
         Side effects:
-            - Calls _commit_transaction or _abort_transaction
-            - Prints commit or abort message to stdout
-            - May increment global_time
-            - May propagate writes to all appropriate sites
+            - Aborts the transaction if it is still active
+            - Retires the transaction's number if it aborted
         """
         transaction = self.transactions.get(tid)
-        if not transaction:
-            return
-        if transaction.status == TransactionStatus.ABORTED:
-            print(f"{tid} aborts")
-            return
-
-        if transaction.should_abort or any(
-            ct is None for ct in transaction.read_set.values()
-        ):
+        if transaction is not None and transaction.status == TransactionStatus.ACTIVE:
             self._abort_transaction(transaction)
-            print(f"{tid} aborts")
-            return
-
-        if not transaction.write_set:
-            transaction.status = TransactionStatus.COMMITTED
-            self.global_time += 1
-            print(f"{tid} commits")
-            self._update_serial_graph_on_commit(tid)
-            return
-
-        self._commit_transaction(transaction)
+        self._forget_aborted(tid)
 
     def _commit_transaction(self, transaction: Transaction):
         """
         Attempt to commit a transaction with write operations.
         
-        Validates the transaction by checking:
+        Validates the transaction (see _validate_commit) by checking:
         1. All written-to sites are still up
         2. No first-committer-wins conflicts exist
-        3. No serialization cycles would be created
+        3. No serialization cycles would be created (graph engine), or it
+           is not part of a dangerous structure (ssi engine)
         
         If validation succeeds, writes are propagated to all appropriate sites.
         
@@ -642,42 +3133,20 @@ class TransactionManager:
             - Updates serialization graph
             - May detect cycle and abort transaction
             - On success: increments global_time, propagates writes to sites,
-              marks transaction as COMMITTED, prints commit message
-            - On failure: aborts transaction and prints abort message
+              marks transaction as COMMITTED, reports the commit (with a
+              write-ahead log, once its group is synced)
+            - On failure: aborts transaction and reports the abort
         """
         tid = transaction.tid
 
-        def should_abort() -> bool:
-            # Check if any site failed after write
-            for var in transaction.write_set:
-                var_num = int(var[1:])
-                if var_num % 2 == 1:  # Non-replicated variable
-                    home = 1 + (var_num % 10)
-                    if not self.sites[home].is_up:
-                        return True
-
-            # Check for read consistency
-            if any(ct is None for ct in transaction.read_set.values()):
-                return True
+        sites_of = self.placement.sites_of
 
-            # Check for first-committer-wins conflicts
-            for var in transaction.write_set:
-                for other_tid, other_txn in self.transactions.items():
-                    if (
-                        other_tid != tid
-                        and var in other_txn.write_set
-                        and other_txn.status == TransactionStatus.COMMITTED
-                        and other_txn.commit_time > transaction.start_time
-                    ):
-                        return True
-            return False
-
-        def get_target_sites(var: str) -> List[Site]:
-            var_num = int(var[1:])
-            if var_num % 2 == 0:
+        def get_target_sites(var: int) -> List[Site]:
+            replicas = sites_of[var]
+            if len(replicas) > 1:
                 return [
                     site
-                    for site in self.sites.values()
+                    for site in map(self.sites.__getitem__, replicas)
                     if site.is_up
                     and (
                         site.last_fail_time == -1.0
@@ -688,40 +3157,209 @@ class TransactionManager:
                     )
                 ]
             else:
-                home = 1 + (var_num % 10)
-                return [self.sites[home]] if self.sites[home].is_up else []
-
-        if should_abort():
-            self._abort_transaction(transaction)
-            print(f"{tid} aborts")
-            return
-
-        self._update_serial_graph_on_commit(tid)
-        self._update_serial_graph_for_ww_conflicts(tid)
+                home = self.sites[replicas[0]]
+                return [home] if home.is_up else []
 
-        if self._detect_cycle():
-            self._abort_transaction(transaction)
-            print(f"{tid} aborts")
+        reason = self._validate_commit(transaction)
+        if reason is not None:
+            self._abort_transaction(transaction, reason)
+            self.sink.abort(tid)
             return
 
         commit_time = self.global_time + 1
+        oversized = []
         for var, val in transaction.write_cache.items():
             for site in get_target_sites(var):
                 site.commit_write(var, val, tid, commit_time)
+                if (
+                    self.vacuum_threshold
+                    and len(site.version_history[var]) > self.vacuum_threshold
+                ):
+                    oversized.append((site, var))
+        if self.wal is not None:
+            # Reported once the commit's group is durable
+            self.wal.commit(tid, commit_time, partial(self.sink.commit, tid))
 
         transaction.status = TransactionStatus.COMMITTED
         transaction.commit_time = commit_time
         self.global_time = commit_time
-        print(f"{tid} commits")
+        if self.wal is None:
+            self.sink.commit(tid)
+        self._finish_commit(transaction)
+
+        if oversized:
+            watermark = self.low_watermark()
+            for site, var in oversized:
+                self.reclaimed_bytes[site.site_id] += site.vacuum(watermark, var)
+
+    def _validate_commit(self, transaction: Transaction) -> Optional[str]:
+        """
+        Decide whether a transaction with writes may commit.
+        
+        Args:
+            transaction: Transaction object about to commit
+        
+        Returns:
+            None if it may commit, otherwise the abort reason:
+            ABORT_SITE_FAILURE if the home site of a non-replicated variable
+            it wrote is down, ABORT_FIRST_COMMITTER_WINS if a variable it
+            wrote was committed by another transaction after it started,
+            ABORT_CYCLE if its commit would close a cycle in the
+            serialization graph, or ABORT_DANGEROUS_STRUCTURE if the ssi
+            engine finds it in a dangerous structure
+        
+        Side effects:
+            - With the graph engine, adds the transaction's rw and ww edges
+              to the serialization graph once the other checks have passed
+        """
+        # Check if any site failed after write
+        sites_of = self.placement.sites_of
+        for var in transaction.write_set:
+            replicas = sites_of[var]
+            if len(replicas) == 1:  # Non-replicated variable
+                if not self.sites[replicas[0]].is_up:
+                    return ABORT_SITE_FAILURE
+
+        # Check for first-committer-wins conflicts
+        if self.conflicts.first_committer_conflict(transaction):
+            return ABORT_FIRST_COMMITTER_WINS
+
+        if self.ssi is not None:
+            return self.ssi.validate(transaction)
+
+        tid = transaction.tid
+        acyclic = self._update_serial_graph_on_commit(tid)
+        if acyclic:
+            acyclic = self._update_serial_graph_for_ww_conflicts(tid)
+        return None if acyclic else ABORT_CYCLE
+
+    def _finish_commit(self, transaction: Transaction):
+        """
+        Move a just-committed transaction out of the active set.
+        
+        Args:
+            transaction: Transaction object that has committed
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Removes the transaction from self.active
+            - Adds the transaction to self.committed and reports the commit
+              to the conflict index (and to the SSI engine)
+            - Clears transaction's sites_written
+            - Retires committed transactions that can no longer matter
+            - Vacuums every site once vacuum_interval commits have passed
+        """
+        self.active.pop(transaction.tid, None)
+        self.conflicts.commit(transaction)
+        if self.ssi is not None:
+            self.ssi.forget(transaction)
+        transaction.sites_written.clear()
+        self.committed[transaction.tid] = transaction
+        if self.instrumentation is not None:
+            self.instrumentation.commits += 1
+        self._collect_garbage()
+
+        self.commits_since_vacuum += 1
+        if self.vacuum_interval and self.commits_since_vacuum >= self.vacuum_interval:
+            self.vacuum()
+
+    def vacuum(self) -> Dict[int, int]:
+        """
+        Discard versions older than the oldest active snapshot at every site.
+        
+        Returns:
+            Bytes reclaimed by this pass, keyed by site ID
+        
+        Side effects:
+            - Removes unreadable versions from every site's version history
+            - Adds the reclaimed bytes to self.reclaimed_bytes
+            - Resets the periodic vacuum counter
+        """
+        watermark = self.low_watermark()
+        reclaimed = {}
+        for site_id, site in self.sites.items():
+            reclaimed[site_id] = site.vacuum(watermark)
+            self.reclaimed_bytes[site_id] += reclaimed[site_id]
+        self.commits_since_vacuum = 0
+        return reclaimed
+
+    def low_watermark(self) -> float:
+        """
+        Return the start time of the oldest active transaction.
+        
+        Every active transaction, and every transaction that begins later,
+        started at or after the low watermark.
+        
+        Returns:
+            The oldest active start_time, or global_time + 1 when no
+            transaction is active
+        
+        Side effects:
+            None
+        """
+        for transaction in self.active.values():
+            return transaction.start_time
+        return self.global_time + 1
+
+    def _collect_garbage(self):
+        """
+        Retire committed transactions that can no longer affect validation.
+        
+        A committed transaction is retired once it committed before the low
+        watermark and has no incoming serialization graph edges:
+        - Every transaction concurrent with it has finished, so it can no
+          longer win a first-committer-wins check or gain an incoming edge
+        - With no incoming edges, no cycle can ever pass through it
+        The ssi engine adds no edges, so there it is retired as soon as it
+        committed before the low watermark.
+        Retiring a transaction can leave its successors without incoming
+        edges, so those are retired in turn.
+        
+        Returns:
+            None
+        
+        Side effects:
+            - Removes retired transactions from self.transactions and
+              self.committed, remembering their numbers as retired
+            - Removes their nodes and edges from self.serial_graph
+            - Removes their reads and writes from the conflict index
+        """
+        watermark = self.low_watermark()
+        predecessors = self.serial_graph.predecessors
+        candidates = []
+        for transaction in self.committed.values():
+            if transaction.commit_time >= watermark:
+                break
+            if not predecessors.get(transaction.tid):
+                candidates.append(transaction)
+
+        while candidates:
+            transaction = candidates.pop()
+            successors = list(self.serial_graph.get(transaction.tid, ()))
+            del self.transactions[transaction.tid]
+            del self.committed[transaction.tid]
+            self._retire_number(transaction.tid)
+            self.serial_graph.remove_node(transaction.tid)
+            self.conflicts.retire(transaction)
+            for succ in successors:
+                other = self.committed.get(succ)
+                if (
+                    other is not None
+                    and other.commit_time < watermark
+                    and not predecessors.get(succ)
+                ):
+                    candidates.append(other)
 
     def _latest_commit_time_before_commit(
-        self, var: str, commit_time: float
+        self, var: int, commit_time: float
     ) -> Optional[float]:
         """
         Find the most recent commit time for a variable before a given time.
         
         Args:
-            var: Variable name
+            var: Variable number
             commit_time: Upper bound (exclusive) on commit times to search
         
         Returns:
@@ -730,23 +3368,24 @@ class TransactionManager:
         Side effects:
             None
         """
-        return max(
-            (
-                version.commit_time
-                for site in self.sites.values()
-                if var in site.version_history
-                for version in site.version_history[var]
-                if version.commit_time < commit_time
-            ),
-            default=None,
-        )
+        latest = None
+        for site in self.sites.values():
+            history = site.history(var)
+            if history is None:
+                continue
+            index = history.latest_before(commit_time)
+            if index >= 0 and (latest is None or history.commit_times[index] > latest):
+                latest = history.commit_times[index]
+        return latest
 
-    def _abort_transaction(self, transaction: Transaction):
+    def _abort_transaction(self, transaction: Transaction, reason: str = ABORT_OTHER):
         """
         Abort a transaction and discard its uncommitted changes.
         
         Args:
             transaction: Transaction object to abort
+            reason: Why it aborts, one of the ABORT_* constants; counted
+                when instrumentation is on
         
         Returns:
             None
@@ -755,8 +3394,29 @@ class TransactionManager:
             - Sets transaction status to ABORTED
             - Clears transaction's write_cache (discards buffered writes)
             - Clears transaction's write_set
+            - Removes the transaction and its edges from the serialization graph
+            - Removes the transaction from the conflict index (and the SSI
+              engine) and clears its sites_written
+            - Drops its parked operations
+            - Retires the transaction, remembering its ID in self.aborted
+              until its end() is seen
+            - May retire committed transactions below the new low watermark
+            - Counts the abort reason if instrumentation is on
         """
+        if self.instrumentation is not None:
+            self.instrumentation.aborts[reason] += 1
         transaction.status = TransactionStatus.ABORTED
+        self._drop_pending(transaction)
+        self.serial_graph.remove_node(transaction.tid)
+        self.conflicts.abort(transaction)
+        if self.ssi is not None:
+            self.ssi.forget(transaction)
+        transaction.sites_written.clear()
+        if self.transactions.get(transaction.tid) is transaction:
+            del self.transactions[transaction.tid]
+            self.active.pop(transaction.tid, None)
+            self.aborted.add(transaction.tid)
+            self._collect_garbage()
         # Clear write cache to discard uncommitted writes
         transaction.write_cache.clear()
         transaction.write_set.clear()
@@ -765,8 +3425,9 @@ class TransactionManager:
         """
         Simulate a site failure.
         
-        Marks the site as down and flags all transactions that wrote to
-        variables at that site for abortion.
+        Marks the site as down and flags for abortion exactly the active
+        transactions that sent a write to this site, as found by the
+        conflict index.
         
         Args:
             site_id: ID of the site to fail (1-10)
@@ -777,32 +3438,30 @@ class TransactionManager:
         Side effects:
             - Increments global_time
             - Calls site.fail() to mark site as down
+            - Marks the site as down in the read router
             - Sets should_abort flag for affected transactions
-            - Prints failure message to stdout
+            - Removes the site from the affected transactions' sites_written
+            - Reports the failure to the event sink
         """
         if site_id not in self.sites:
             return
         self.global_time += 1
         self.sites[site_id].fail(self.global_time)
-        print(f"Site {site_id} fails")
+        self.router.site_failed(site_id, self.global_time)
+        self.sink.site_failed(site_id)
 
-        for tid, transaction in self.transactions.items():
-            if transaction.status != TransactionStatus.ACTIVE:
-                continue
-            for var in transaction.write_set:
-                var_num = int(var[1:])
-                if var_num % 2 == 0 or (
-                    var_num % 2 == 1 and (1 + (var_num % 10)) == site_id
-                ):
-                    transaction.should_abort = True
+        for tid in self.conflicts.take_site_writers(site_id):
+            transaction = self.transactions[tid]
+            transaction.should_abort = True
+            transaction.sites_written.discard(site_id)
 
     def recover_site(self, site_id: int):
         """
         Recover a failed site.
         
-        Brings the site back online. Replicated variables at the site
-        become unreadable until new writes are committed to ensure
-        data consistency.
+        Brings the site back online. Snapshot reads of replicated variables
+        use it only where it did not fail between the version read and the
+        reader's start (see Site.get_committed_version_at).
         
         Args:
             site_id: ID of the site to recover (1-10)
@@ -813,51 +3472,38 @@ class TransactionManager:
         Side effects:
             - Increments global_time
             - Calls site.recover() to mark site as up
-            - Prints recovery message to stdout
+            - Marks the site as up in the read router
+            - Reports the recovery to the event sink
+            - Resumes operations parked on this site or on variables it holds
         """
         if site_id not in self.sites:
             return
         self.global_time += 1
         self.sites[site_id].recover(self.global_time)
-        print(f"Site {site_id} recovers")
+        self.router.site_recovered(site_id, self.global_time)
+        self.sink.site_recovered(site_id)
+
+        # Resume operations waiting on this site, then those waiting on a
+        # variable this site holds
+        self._wake(self.site_waiters.pop(site_id, None), ("site", site_id))
+        hosts = self.placement.hosts
+        for var in [v for v in self.var_waiters if hosts(site_id, v)]:
+            self._wake(self.var_waiters.pop(var), ("var", var))
 
     def dump(self) -> None:
         """
-        Print a formatted table showing the current state of all sites.
+        Report the current state of all sites to the event sink.
         
-        Displays all variables and their current values across all sites.
-        Shows which sites are UP or DOWN and the value of each variable
-        at each site.
+        The sink renders it as a table of every variable's committed value
+        at each site, showing which sites are UP or DOWN.
         
         Returns:
             None
         
         Side effects:
-            - Prints formatted table to stdout using tabulate library
+            - Calls self.sink.dump with the sites
         """
-        active_sites = [site for site in self.sites.values() if site.is_up]
-        all_vars = sorted(
-            {var.split(":")[0] for site in active_sites for var in site.dump()},
-            key=lambda x: int(x[1:]),
-        )
-
-        headers = ["Site", "Status"] + all_vars
-        table_data = []
-
-        for site_id in sorted(self.sites.keys()):
-            site = self.sites[site_id]
-            if not site.is_up:
-                table_data.append([site_id, "DOWN"] + ["" for _ in all_vars])
-                continue
-
-            var_dict = {
-                var.split(":")[0]: var.split(":")[1].strip() for var in site.dump()
-            }
-            row = [site_id, "UP"]
-            row.extend(var_dict.get(var, "") for var in all_vars)
-            table_data.append(row)
-
-        print(tabulate(table_data, headers=headers, tablefmt="grid"))
+        self.sink.dump(self.sites)
 
     def reset_state(self):
         """
@@ -870,16 +3516,76 @@ class TransactionManager:
             None
         
         Side effects:
-            - Clears self.transactions dictionary
-            - Resets global_time to 0.0
-            - Clears serialization graph
-            - Calls reset() on all sites
+            - Clears all transaction tracking state
+            - Resets global_time to 0.0, or to the checkpoint's time
+            - Clears serialization graph, the conflict index, the SSI
+              engine, and the wait queues
+            - Resets vacuum counters
+            - Calls reset() on all sites, or reloads the checkpoint the
+              manager started from, and rebuilds the read router
+            - Empties the write-ahead log, if there is one
         """
         self.transactions.clear()
+        self.active.clear()
+        self.committed.clear()
+        self.aborted.clear()
+        self.retired_tid = 0
+        self.retired.clear()
         self.global_time = 0.0
+        self.restored_time = 0.0
+        self.commits_since_vacuum = 0
+        self.reclaimed_bytes = {site_id: 0 for site_id in self.sites}
         self.serial_graph.clear()
-        for site in self.sites.values():
-            site.reset()
+        self.conflicts.clear()
+        if self.ssi is not None:
+            self.ssi.clear()
+        self.site_waiters.clear()
+        self.var_waiters.clear()
+        if self.checkpoint_path is not None:
+            self.global_time, _ = load_checkpoint(self.checkpoint_path, self.sites)
+            self.restored_time = self.global_time
+        else:
+            for site in self.sites.values():
+                site.reset()
+        self.router = ReadRouter(self.sites, self.router.policy, self.placement)
+        if self.wal is not None:
+            self.wal.truncate()
+
+    def checkpoint(self, path: str):
+        """
+        Save the committed state of every site to a checkpoint file.
+
+        A manager created with checkpoint=path later restores this state
+        with one load. The write-ahead log is emptied once the checkpoint is
+        durable, which bounds the replay after a crash to the commits since
+        the last checkpoint.
+
+        Args:
+            path: File to write
+
+        Returns:
+            None
+
+        Side effects:
+            - Creates or replaces the checkpoint file
+            - Empties the write-ahead log, if there is one
+        """
+        write_checkpoint(path, self.sites, self.global_time)
+        if self.wal is not None:
+            self.wal.truncate()
+
+    def close(self):
+        """
+        Make all committed writes durable and release the write-ahead log.
+
+        Returns:
+            None
+
+        Side effects:
+            - Syncs and closes the write-ahead log, if there is one
+        """
+        if self.wal is not None:
+            self.wal.close()
 
     def process_operation(self, operation: str):
         """
@@ -902,163 +3608,127 @@ class TransactionManager:
             None
         
         Side effects:
-            - Strips comments (text after //)
+            - Ignores blank lines, comments and malformed commands
             - Calls appropriate transaction manager method
             - May modify transaction state, site state, or global time
         """
-        operation = operation.split("//")[0].strip()
-        if not operation:
-            return
+        command = parse_command(operation)
+        if command is not None:
+            self.execute(command)
 
-        def parse_args(op_str: str) -> List[str]:
-            return [arg.strip() for arg in op_str.rstrip(")").split(",")]
-
-        if "(" in operation:
-            op_type, args_str = operation.strip().split("(", 1)
-            op_type = op_type.strip().lower()
-            args = parse_args(args_str)
-
-            operations = {
-                "begin": lambda: self.begin_transaction(args[0]),
-                "beginro": lambda: self.begin_read_only_transaction(args[0]),
-                "w": lambda: self.write(args[0], args[1], int(args[2])),
-                "r": lambda: self.read(args[0], args[1]),
-                "end": lambda: self.end_transaction(args[0]),
-                "dump": self.dump,
-                "fail": lambda: self.fail_site(int(args[0])),
-                "recover": lambda: self.recover_site(int(args[0])),
-            }
-
-            if op_type in operations:
-                operations[op_type]()
-        else:
-            parts = operation.strip().split()
-            if len(parts) == 2:
-                op_type = parts[0].lower()
-                if op_type == "begin":
-                    self.begin_transaction(parts[1])
-                elif op_type == "beginro":
-                    self.begin_read_only_transaction(parts[1])
+    def execute(self, command: Command):
+        """
+        Execute an already parsed command.
+
+        Args:
+            command: Command tuple produced by commands.parse_command
+
+        Returns:
+            None
+
+        Side effects:
+            - Calls the transaction manager method for the command's opcode
+            - May modify transaction state, site state, or global time
+        """
+        self._HANDLERS[command[0]](self, command)
+
+    def _execute_begin(self, command: Command):
+        self.begin_transaction(command[1])
+
+    def _execute_begin_ro(self, command: Command):
+        self.begin_read_only_transaction(command[1])
+
+    def _execute_read(self, command: Command):
+        self.read(command[1], command[2])
+
+    def _execute_write(self, command: Command):
+        self.write(command[1], command[2], command[3])
+
+    def _execute_end(self, command: Command):
+        self.end_transaction(command[1])
 
-    def _update_serial_graph_on_read(self, tid: str, var: str):
+    def _execute_fail(self, command: Command):
+        self.fail_site(command[4])
+
+    def _execute_recover(self, command: Command):
+        self.recover_site(command[4])
+
+    def _execute_dump(self, command: Command):
+        self.dump()
+
+    # Indexed by opcode; built once with the class
+    _HANDLERS = (
+        _execute_begin,
+        _execute_begin_ro,
+        _execute_read,
+        _execute_write,
+        _execute_end,
+        _execute_fail,
+        _execute_recover,
+        _execute_dump,
+    )
+
+    def _update_serial_graph_on_read(self, tid: int, writer_tid: int):
         """
         Update the serialization graph when a transaction reads a variable.
         
-        Creates a read-after-write dependency edge from the writing transaction
-        to the reading transaction. Checks for cycles after adding the edge.
+        Creates a read-after-write dependency edge from the transaction that
+        committed the version that was read to the reading transaction. The
+        edge is refused if it would close a cycle. Writers that have been
+        retired (or the initial T0) can never be part of a cycle and are skipped.
         
         Args:
-            tid: Transaction ID that performed the read
-            var: Variable that was read
+            tid: Number of the transaction that performed the read
+            writer_tid: Number of the transaction that committed the version
+                that was read
         
         Returns:
             None
         
         Side effects:
             - Adds edge to self.serial_graph
-            - May abort transaction if cycle is detected
-            - Prints abort message if cycle detected
+            - Aborts transaction if the edge would close a cycle
+            - Reports the abort if a cycle is detected
         """
-        commit_time = self.transactions[tid].read_set.get(var)
-        if commit_time is None:
-            return
-
-        writer_tid = next(
-            (
-                t_id
-                for t_id, txn in self.transactions.items()
-                if txn.start_time <= commit_time
-                and txn.status == TransactionStatus.COMMITTED
-                and var in txn.write_set
-            ),
-            None,
-        )
-
-        if writer_tid and writer_tid != tid:
-            if writer_tid not in self.serial_graph:
-                self.serial_graph[writer_tid] = set()
-            self.serial_graph[writer_tid].add(tid)
+        if writer_tid != tid and writer_tid in self.transactions:
+            if not self.serial_graph.add_edge(writer_tid, tid):
+                self._abort_transaction(self.transactions[tid], ABORT_CYCLE)
+                self.sink.abort(tid, "serialization cycle")
 
-            if self._detect_cycle():
-                self._abort_transaction(self.transactions[tid])
-                print(f"{tid} aborts due to serialization cycle")
-
-    def _update_serial_graph_on_commit(self, tid: str):
+    def _update_serial_graph_on_commit(self, tid: int) -> bool:
         """
         Update the serialization graph when a transaction commits.
         
         Adds edges for:
-        1. Write-after-read dependencies (this transaction read, another wrote)
+        1. Write-after-read dependencies (this transaction read a version that
+           a committed transaction has since overwritten)
         2. Read-after-write dependencies (this transaction wrote, another read)
         
+        Candidates come from the conflict index, so only transactions that
+        touched the same variables are considered.
+        
         Args:
-            tid: Transaction ID that is committing
+            tid: Number of the transaction that is committing
         
         Returns:
-            None
+            True if every edge was added, False if at least one edge was
+            refused because it would close a cycle
         
         Side effects:
             - Adds edges to self.serial_graph for all relevant dependencies
         """
         transaction = self.transactions[tid]
+        acyclic = True
 
-        for var in transaction.read_set:
-            for other_tid, other_txn in self.transactions.items():
-                if (
-                    other_tid != tid
-                    and var in other_txn.write_set
-                    and other_txn.status == TransactionStatus.COMMITTED
-                ):
-                    if tid not in self.serial_graph:
-                        self.serial_graph[tid] = set()
-                    self.serial_graph[tid].add(other_tid)
-
-        for var in transaction.write_set:
-            for other_tid, other_txn in self.transactions.items():
-                if (
-                    other_tid != tid
-                    and var in other_txn.read_set
-                    and other_txn.status != TransactionStatus.ABORTED
-                ):
-                    if other_tid not in self.serial_graph:
-                        self.serial_graph[other_tid] = set()
-                    self.serial_graph[other_tid].add(tid)
-
-    def _detect_cycle(self) -> bool:
-        """
-        Detect cycles in the serialization graph using depth-first search.
-        
-        A cycle in the serialization graph indicates that the transaction
-        schedule is not serializable, requiring abortion of one or more
-        transactions.
-        
-        Returns:
-            True if a cycle is detected, False otherwise
-        
-        Side effects:
-            None (uses local visited and recursion stack sets)
-        """
-        visited = set()
-        rec_stack = set()
+        for other_tid in self.conflicts.overwriters(transaction):
+            acyclic &= self.serial_graph.add_edge(tid, other_tid)
 
-        def dfs(v: str) -> bool:
-            visited.add(v)
-            rec_stack.add(v)
-            for neighbour in self.serial_graph.get(v, []):
-                if neighbour not in visited:
-                    if dfs(neighbour):
-                        return True
-                elif neighbour in rec_stack:
-                    return True
-            rec_stack.remove(v)
-            return False
+        for other_tid in self.conflicts.readers_of_writes(transaction):
+            acyclic &= self.serial_graph.add_edge(other_tid, tid)
 
-        for node in self.serial_graph:
-            if node not in visited and dfs(node):
-                return True
-        return False
+        return acyclic
 
-    def _update_serial_graph_for_ww_conflicts(self, tid: str):
+    def _update_serial_graph_for_ww_conflicts(self, tid: int) -> bool:
         """
         Update serialization graph for write-write conflicts.
         
@@ -1066,23 +3736,17 @@ class TransactionManager:
         variables to the current transaction, enforcing write ordering.
         
         Args:
-            tid: Transaction ID that is committing with writes
+            tid: Number of the transaction that is committing with writes
         
         Returns:
-            None
+            True if every edge was added, False if at least one edge was
+            refused because it would close a cycle
         
         Side effects:
             - Adds edges to self.serial_graph for write-write dependencies
         """
         transaction = self.transactions[tid]
-        for var in transaction.write_set:
-            for other_tid, other_txn in self.transactions.items():
-                if (
-                    other_tid != tid
-                    and var in other_txn.write_set
-                    and other_txn.status == TransactionStatus.COMMITTED
-                    and other_txn.commit_time < transaction.start_time
-                ):
-                    if other_tid not in self.serial_graph:
-                        self.serial_graph[other_tid] = set()
-                    self.serial_graph[other_tid].add(tid)
\ No newline at end of file
+        acyclic = True
+        for other_tid in self.conflicts.earlier_writers(transaction):
+            acyclic &= self.serial_graph.add_edge(other_tid, tid)
+        return acyclic
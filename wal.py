@@ -0,0 +1,402 @@
+import os
+import struct
+import time
+import zlib
+from typing import Callable, Dict, Iterator, List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from utils import Site
+
+# One batch per committed transaction per site: a header, then its entries.
+# The header holds the transaction number, the entry count, the number of
+# sites the transaction logged a batch to, the commit time and a CRC-32 of
+# the entries; a batch whose entries are missing or do not match the CRC
+# marks the torn end of the log.
+_BATCH = struct.Struct("<IIIdI")
+_ENTRY = struct.Struct("<Iq")
+
+
+class SiteLog:
+    """
+    Append-only log of the committed writes applied to one site.
+
+    Writes are collected while a transaction commits and then sealed into a
+    single batch, so each batch reaches the file with one write() call and a
+    crash leaves at most a torn final batch, which replay discards.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (creating if needed) the log file for appending.
+
+        Args:
+            path: File holding the log
+
+        Side effects:
+            - Opens the file in append mode
+        """
+        self.path = path
+        self.file = open(path, "ab")
+        # (variable number, value) pairs of the transaction being committed
+        self.pending: List[Tuple[int, int]] = []
+        self.dirty = False
+
+    def append(self, var: int, value: int):
+        """
+        Record one write of the transaction being committed.
+
+        Args:
+            var: Variable number (1 for x1)
+            value: Committed value
+
+        Returns:
+            None
+
+        Side effects:
+            - Adds the write to self.pending
+        """
+        self.pending.append((var, value))
+
+    def seal(self, tid: int, commit_time: float, sites: int):
+        """
+        Write the pending writes out as one batch.
+
+        Args:
+            tid: Number of the transaction that committed them
+            commit_time: Their commit time
+            sites: Number of site logs the transaction writes a batch to
+
+        Returns:
+            None
+
+        Side effects:
+            - Writes a batch to the file (not yet fsynced) if any writes are
+              pending, and clears self.pending
+        """
+        if not self.pending:
+            return
+        entries = b"".join(_ENTRY.pack(var, value) for var, value in self.pending)
+        header = _BATCH.pack(
+            tid, len(self.pending), sites, commit_time, zlib.crc32(entries)
+        )
+        self.file.write(header + entries)
+        self.pending.clear()
+        self.dirty = True
+
+    def sync(self):
+        """
+        Make every sealed batch durable.
+
+        Returns:
+            None
+
+        Side effects:
+            - Flushes and fsyncs the file if anything was written since the
+              last sync
+        """
+        if self.dirty:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.dirty = False
+
+    def replay(self) -> Iterator[Tuple[int, int, float, int, List[Tuple[int, int]]]]:
+        """
+        Read back the intact batches, then cut off a torn tail.
+
+        Returns:
+            An iterator over (file offset, transaction number, commit time,
+            number of sites logged to, [(variable number, value)]) in log
+            order
+
+        Side effects:
+            - Once exhausted, truncates the file after the last intact batch
+        """
+        self.file.flush()
+        with open(self.path, "rb") as log:
+            data = log.read()
+        offset = 0
+        while offset + _BATCH.size <= len(data):
+            tid, count, sites, commit_time, crc = _BATCH.unpack_from(data, offset)
+            start = offset + _BATCH.size
+            end = start + count * _ENTRY.size
+            if end > len(data) or zlib.crc32(data[start:end]) != crc:
+                break
+            writes = list(_ENTRY.iter_unpack(data[start:end]))
+            yield offset, tid, commit_time, sites, writes
+            offset = end
+        if offset < len(data):
+            self.file.truncate(offset)
+
+    def truncate(self, offset: int = 0):
+        """
+        Discard the log from an offset on.
+
+        Args:
+            offset: Start of the first batch to discard (default: discard
+                the whole log)
+
+        Returns:
+            None
+
+        Side effects:
+            - Cuts the file at offset and empties self.pending
+        """
+        self.pending.clear()
+        self.file.truncate(offset)
+        self.dirty = True
+
+    def close(self):
+        """
+        Sync and close the log.
+
+        Returns:
+            None
+
+        Side effects:
+            - Fsyncs and closes the file
+        """
+        self.sync()
+        self.file.close()
+
+
+class WriteAheadLog:
+    """
+    Per-site write-ahead logs with group commit.
+
+    Every committed write is appended to the log of each site it is applied
+    to. Instead of an fsync per commit, commits are grouped: the logs are
+    synced once `group_size` commits have accumulated, or once the oldest
+    unsynced commit is `group_window` seconds old (checked on each commit
+    and by poll()). A commit is only acknowledged once its group is synced:
+    the acknowledgement passed to commit() runs after the fsync, so a crash
+    can lose only commits that were never acknowledged. A group size of 1
+    syncs, and acknowledges, every commit at once.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        site_ids: List[int],
+        group_size: int = 16,
+        group_window: float = 0.005,
+    ):
+        """
+        Open (creating if needed) the logs of the given sites.
+
+        Args:
+            directory: Directory holding one site-<id>.log file per site
+            site_ids: Sites to keep logs for
+            group_size: Commits per fsync at most
+            group_window: Seconds an unsynced commit may wait for its group
+
+        Side effects:
+            - Creates the directory and opens the log files
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.logs: Dict[int, SiteLog] = {
+            site_id: SiteLog(os.path.join(directory, f"site-{site_id}.log"))
+            for site_id in site_ids
+        }
+        self.group_size = group_size
+        self.group_window = group_window
+        self.unsynced = 0
+        self.group_started = 0.0
+        self.syncs = 0
+        # Acknowledgements waiting for the pending group's sync, in order
+        self.acknowledgements: List[Callable[[], None]] = []
+        # Highest transaction number seen by replay(), so that callers can
+        # number new transactions after the logged ones
+        self.last_tid = 0
+
+    def replay(self, sites: Dict[int, "Site"], after: float = -1.0) -> float:
+        """
+        Rebuild sites by re-applying their logged writes.
+
+        A transaction's batches reach the site logs with separate writes, so
+        a crash can leave its batch intact in one log and torn in another.
+        Such a commit was never acknowledged; replay stops before the
+        earliest one, on every site, so that a commit is restored on all of
+        its sites or on none, and cuts the logs there.
+
+        Args:
+            sites: Sites by ID, in their initial state or restored from a
+                checkpoint
+            after: Skip batches committed at or before this time, which a
+                checkpoint taken then already holds (default: replay all)
+
+        Returns:
+            The latest commit time found in any log (0.0 if all are empty)
+
+        Side effects:
+            - Commits every complete logged transaction after the given time
+              to its sites
+            - Truncates torn log tails, and every batch from the earliest
+              incomplete transaction on
+            - Sets self.last_tid to the highest logged transaction number
+        """
+        batches = {site_id: list(log.replay()) for site_id, log in self.logs.items()}
+        # Intact batches per transaction, against the number it logged
+        found: Dict[int, int] = {}
+        cutoff = float("inf")
+        for site_batches in batches.values():
+            for _, tid, commit_time, _, _ in site_batches:
+                self.last_tid = max(self.last_tid, tid)
+                if commit_time > after:
+                    found[tid] = found.get(tid, 0) + 1
+        for site_batches in batches.values():
+            for _, tid, commit_time, logged, _ in site_batches:
+                if tid in found and found[tid] < logged:
+                    cutoff = min(cutoff, commit_time)
+
+        latest = 0.0
+        for site_id, site_batches in batches.items():
+            site = sites[site_id]
+            for offset, tid, commit_time, _, writes in site_batches:
+                if commit_time >= cutoff:
+                    self.logs[site_id].truncate(offset)
+                    break
+                if commit_time <= after:
+                    continue
+                for var, value in writes:
+                    site.commit_write(var, value, tid, commit_time)
+                latest = max(latest, commit_time)
+        return latest
+
+    def attach(self, sites: Dict[int, "Site"]):
+        """
+        Start logging the sites' committed writes.
+
+        Args:
+            sites: Sites by ID
+
+        Returns:
+            None
+
+        Side effects:
+            - Sets each site's log attribute
+        """
+        for site_id, log in self.logs.items():
+            sites[site_id].log = log
+
+    def commit(
+        self, tid: int, commit_time: float, acknowledge: Callable[[], None]
+    ):
+        """
+        Seal a transaction's writes and sync if its group is complete.
+
+        Args:
+            tid: Number of the transaction that committed
+            commit_time: Its commit time
+            acknowledge: Called once the transaction's writes are durable
+
+        Returns:
+            None
+
+        Side effects:
+            - Writes the transaction's batches to the site logs
+            - Queues acknowledge until the group is synced
+            - May fsync every site log and run the queued acknowledgements
+        """
+        logs = [log for log in self.logs.values() if log.pending]
+        for log in logs:
+            log.seal(tid, commit_time, len(logs))
+        now = time.monotonic()
+        if not self.unsynced:
+            self.group_started = now
+        self.unsynced += 1
+        self.acknowledgements.append(acknowledge)
+        if (
+            self.unsynced >= self.group_size
+            or now - self.group_started >= self.group_window
+        ):
+            self.sync()
+
+    def after_sync(self, callback: Callable[[], None]):
+        """
+        Run a callback once every commit logged so far is durable.
+
+        Callbacks run in the order they were queued, after the
+        acknowledgements of the commits logged before them.
+
+        Args:
+            callback: Function to call
+
+        Returns:
+            None
+
+        Side effects:
+            - Calls callback now if no commit is waiting for a sync, and
+              otherwise queues it until the pending group is synced
+        """
+        if self.unsynced:
+            self.acknowledgements.append(callback)
+        else:
+            callback()
+
+    def poll(self):
+        """
+        Sync the pending group if it has waited for the whole window.
+
+        Meant to be called periodically by long-running callers, so that a
+        lone commit does not wait for the next one to become durable.
+
+        Returns:
+            None
+
+        Side effects:
+            - May fsync every site log
+        """
+        if self.unsynced and time.monotonic() - self.group_started >= self.group_window:
+            self.sync()
+
+    def sync(self):
+        """
+        Make every committed write durable now, then acknowledge it.
+
+        Returns:
+            None
+
+        Side effects:
+            - Fsyncs every site log that has unsynced batches
+            - Runs and clears the queued acknowledgements
+        """
+        for log in self.logs.values():
+            log.sync()
+        if self.unsynced:
+            self.syncs += 1
+        self.unsynced = 0
+        acknowledgements = self.acknowledgements
+        self.acknowledgements = []
+        for acknowledge in acknowledgements:
+            acknowledge()
+
+    def truncate(self):
+        """
+        Discard every site log.
+
+        Returns:
+            None
+
+        Side effects:
+            - Empties every log file and syncs the result
+            - Runs and clears the queued acknowledgements
+        """
+        for log in self.logs.values():
+            log.truncate()
+        self.sync()
+
+    def close(self):
+        """
+        Sync and close every site log.
+
+        Returns:
+            None
+
+        Side effects:
+            - Fsyncs and closes the log files
+            - Runs and clears the queued acknowledgements
+        """
+        self.sync()
+        for log in self.logs.values():
+            log.close()
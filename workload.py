@@ -0,0 +1,187 @@
+import argparse
+import random
+import sys
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Dict, Iterator, List
+
+
+def generate_workload(
+    transactions: int = 1000,
+    concurrency: int = 10,
+    ops_per_transaction: int = 4,
+    read_ratio: float = 0.5,
+    read_only_share: float = 0.2,
+    zipf_skew: float = 0.0,
+    fail_rate: float = 0.0,
+    downtime: int = 50,
+    variables: int = 20,
+    sites: int = 10,
+    seed: int = 0,
+) -> Iterator[str]:
+    """
+    Generate a random script in the command language.
+
+    Up to `concurrency` transactions are open at once; at each step either a
+    new transaction begins (while fewer are open and some remain to start)
+    or a randomly chosen open transaction issues its next operation, ending
+    once it has issued all of them. Variables are drawn from a Zipf
+    distribution over x1..x{variables}, x1 being the hottest; a skew of 0
+    makes every variable equally likely. Between steps a random up site may
+    fail, and it recovers after roughly `downtime` further steps.
+
+    Args:
+        transactions: Number of transactions to run
+        concurrency: Maximum number of transactions open at the same time
+        ops_per_transaction: Mean number of reads and writes per transaction
+            (each transaction draws uniformly from 1..2*mean-1)
+        read_ratio: Probability that an operation of a read-write
+            transaction is a read
+        read_only_share: Fraction of transactions started with beginRO
+        zipf_skew: Zipf exponent for choosing variables (0 = uniform)
+        fail_rate: Probability of a site failure after each step
+        downtime: Mean number of steps a failed site stays down
+        variables: Number of variables to draw from
+        sites: Number of sites that may fail (at least one is kept up)
+        seed: Seed for the random number generator
+
+    Returns:
+        An iterator over script lines, without trailing newlines. The first
+        line is a comment recording the parameters.
+
+    Side effects:
+        None
+    """
+    rng = random.Random(seed)
+    cumulative = list(
+        accumulate(1.0 / rank**zipf_skew for rank in range(1, variables + 1))
+    )
+    total_weight = cumulative[-1]
+
+    yield (
+        f"// workload transactions={transactions} concurrency={concurrency} "
+        f"ops={ops_per_transaction} read_ratio={read_ratio} "
+        f"read_only={read_only_share} zipf={zipf_skew} fail_rate={fail_rate} "
+        f"downtime={downtime} variables={variables} seed={seed}"
+    )
+
+    # Open transactions: tid number -> [read only, operations left]
+    open_transactions: Dict[int, List] = {}
+    started = 0
+    step = 0
+    # Failed sites and the step at which each recovers
+    down: Dict[int, int] = {}
+    max_ops = max(1, 2 * ops_per_transaction - 1)
+
+    while started < transactions or open_transactions:
+        step += 1
+        if started < transactions and (
+            len(open_transactions) < concurrency
+            and (not open_transactions or rng.random() < 0.5)
+        ):
+            started += 1
+            read_only = rng.random() < read_only_share
+            open_transactions[started] = [read_only, rng.randint(1, max_ops)]
+            yield f"beginRO(T{started})" if read_only else f"begin(T{started})"
+        else:
+            tid = rng.choice(list(open_transactions))
+            state = open_transactions[tid]
+            if state[1] == 0:
+                del open_transactions[tid]
+                yield f"end(T{tid})"
+            else:
+                state[1] -= 1
+                var = 1 + bisect_right(cumulative, rng.random() * total_weight)
+                var = min(var, variables)
+                if state[0] or rng.random() < read_ratio:
+                    yield f"R(T{tid},x{var})"
+                else:
+                    yield f"W(T{tid},x{var},{rng.randint(0, 9999)})"
+
+        for site_id in [s for s, until in down.items() if until <= step]:
+            del down[site_id]
+            yield f"recover({site_id})"
+        if fail_rate and len(down) < sites - 1 and rng.random() < fail_rate:
+            site_id = rng.choice([s for s in range(1, sites + 1) if s not in down])
+            down[site_id] = step + rng.randint(1, max(1, 2 * downtime - 1))
+            yield f"fail({site_id})"
+
+    for site_id in sorted(down):
+        yield f"recover({site_id})"
+
+
+def parse_args():
+    """
+    Parse command-line arguments for the workload generator.
+
+    Returns:
+        argparse.Namespace: Parsed arguments, one per generate_workload
+        parameter, plus the output file
+
+    Side effects:
+        - May exit the program if invalid arguments are provided (handled by argparse)
+        - Opens the output file for writing if provided
+    """
+    parser = argparse.ArgumentParser(
+        description="Generate a random RepCRec script"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=argparse.FileType("w"),
+        default=None,
+        help="File to write the script to (default: stdout)",
+    )
+    parser.add_argument("--transactions", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--ops-per-transaction", type=int, default=4)
+    parser.add_argument("--read-ratio", type=float, default=0.5)
+    parser.add_argument("--read-only-share", type=float, default=0.2)
+    parser.add_argument(
+        "--zipf-skew", type=float, default=0.0, help="0 = uniform key choice"
+    )
+    parser.add_argument(
+        "--fail-rate", type=float, default=0.0, help="Site failures per step"
+    )
+    parser.add_argument(
+        "--downtime", type=int, default=50, help="Mean steps a site stays down"
+    )
+    parser.add_argument("--variables", type=int, default=20)
+    parser.add_argument("--sites", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    """
+    Main entry point for the workload generator.
+
+    Returns:
+        None
+
+    Side effects:
+        - Writes the generated script to the output file or stdout
+    """
+    args = parse_args()
+    output = args.output or sys.stdout
+    lines = generate_workload(
+        transactions=args.transactions,
+        concurrency=args.concurrency,
+        ops_per_transaction=args.ops_per_transaction,
+        read_ratio=args.read_ratio,
+        read_only_share=args.read_only_share,
+        zipf_skew=args.zipf_skew,
+        fail_rate=args.fail_rate,
+        downtime=args.downtime,
+        variables=args.variables,
+        sites=args.sites,
+        seed=args.seed,
+    )
+    for line in lines:
+        output.write(line + "\n")
+    if args.output:
+        args.output.close()
+
+
+if __name__ == "__main__":
+    main()